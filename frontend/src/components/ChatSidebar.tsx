@@ -89,7 +89,9 @@ export default function ChatSidebar() {
                                     : "bg-[#161616] border border-[#222] text-zinc-300"
                                     }`}
                             >
-                                <p className="whitespace-pre-wrap leading-relaxed">{msg.content}</p>
+                                <p className="whitespace-pre-wrap leading-relaxed">
+                                    {msg.content || (msg.streaming ? "…" : "")}
+                                </p>
                                 {msg.citations.length > 0 && (
                                     <div className="flex flex-wrap gap-1.5 mt-2 pt-2 border-t border-[#2a2a2a]">
                                         {msg.citations.map((cite, j) => (
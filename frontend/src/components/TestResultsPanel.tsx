@@ -1,6 +1,6 @@
 "use client";
 
-import { useStore } from "@/lib/store";
+import { useStore, selectTestRun } from "@/lib/store";
 import SectionCard from "./SectionCard";
 import type { TestItemStatus } from "@/lib/types";
 
@@ -26,7 +26,7 @@ const OVERALL_STATUS_COLORS: Record<string, { text: string; bg: string; border:
 };
 
 export default function TestResultsPanel() {
-    const testRun = useStore((s) => s.testRun);
+    const testRun = useStore(selectTestRun);
     const loading = useStore((s) => s.loading);
     const startValidation = useStore((s) => s.startValidation);
     const incident = useStore((s) => s.incident);
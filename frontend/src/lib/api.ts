@@ -1,4 +1,4 @@
-import type { SystemStatus, IncidentCard, TestRun, CopilotAnswer } from "./types";
+import type { SystemStatus, IncidentCard, TestRun } from "./types";
 
 const BASE_URL =
     process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:8000";
@@ -53,11 +53,11 @@ export function getTestRun(run_id: string): Promise<TestRun> {
     return request<TestRun>(`/api/tests/runs/${run_id}`);
 }
 
-export function askCopilot(
+export function askCopilotStream(
     incident_id: string | null,
     question: string
-): Promise<CopilotAnswer> {
-    return request<CopilotAnswer>("/api/copilot/ask", {
+): Promise<{ request_id: string }> {
+    return request<{ request_id: string }>("/api/copilot/ask/stream", {
         method: "POST",
         body: JSON.stringify({ incident_id, question }),
     });
@@ -3,17 +3,70 @@ import type {
     SystemStatus,
     IncidentCard,
     TestRun,
+    TestRunPatch,
     WsMessage,
     ChatMessage,
     CopilotAnswer,
+    CopilotDelta,
 } from "./types";
 import * as api from "./api";
+import { sendWs } from "./ws";
+
+function applyTestRunPatch(run: TestRun, patch: TestRunPatch): TestRun {
+    const byId = new Map(patch.items.map((p) => [p.test_id, p]));
+    const tests = run.tests.map((t) => {
+        const p = byId.get(t.test_id);
+        if (!p) return t;
+        byId.delete(t.test_id);
+        return { ...t, ...p };
+    });
+    for (const p of byId.values()) {
+        tests.push({
+            test_id: p.test_id,
+            name: p.name ?? p.test_id,
+            status: p.status ?? "PENDING",
+            last_update_at: p.last_update_at ?? "",
+            details: p.details ?? null,
+        });
+    }
+    return { ...run, status: patch.status ?? run.status, tests, seq: patch.seq };
+}
+
+// Copilot frames are broadcast to every tab, and can arrive before the POST that
+// started the request returns its request_id. Frames for ids this tab has not seen
+// yet wait here; those belonging to other tabs' questions age out.
+const MAX_EARLY_COPILOT = 32;
+const earlyCopilot = new Map<string, { content: string; answer?: CopilotAnswer }>();
+
+function holdEarlyCopilot(request_id: string): { content: string; answer?: CopilotAnswer } {
+    let early = earlyCopilot.get(request_id);
+    if (!early) {
+        early = { content: "" };
+        earlyCopilot.set(request_id, early);
+        if (earlyCopilot.size > MAX_EARLY_COPILOT) {
+            earlyCopilot.delete(earlyCopilot.keys().next().value as string);
+        }
+    }
+    return early;
+}
+
+function applyCopilotAnswer(msg: ChatMessage, answer: CopilotAnswer): ChatMessage {
+    return {
+        ...msg,
+        content: answer.answer,
+        citations: answer.citations,
+        ts: answer.created_at,
+        streaming: false,
+    };
+}
 
 interface AppState {
     // Data
     systemStatus: SystemStatus | null;
     incident: IncidentCard | null;
-    testRun: TestRun | null;
+    // Every run seen this session, and the latest run of each incident
+    testRuns: Record<string, TestRun>;
+    runByIncident: Record<string, string>;
     wsConnected: boolean;
     loading: { initial: boolean; action: boolean };
     error: string | null;
@@ -30,10 +83,32 @@ interface AppState {
     clearError: () => void;
 }
 
+function withRun(
+    s: Pick<AppState, "testRuns" | "runByIncident">,
+    run: TestRun
+): Pick<AppState, "testRuns" | "runByIncident"> {
+    const latest = s.testRuns[s.runByIncident[run.incident_id]];
+    // A resync of an older run must not replace the incident's newer one
+    const isLatest = !latest || latest.run_id === run.run_id || run.started_at >= latest.started_at;
+    return {
+        testRuns: { ...s.testRuns, [run.run_id]: run },
+        runByIncident: isLatest
+            ? { ...s.runByIncident, [run.incident_id]: run.run_id }
+            : s.runByIncident,
+    };
+}
+
+/** The latest test run of the incident on screen. */
+export function selectTestRun(s: AppState): TestRun | null {
+    if (!s.incident) return null;
+    return s.testRuns[s.runByIncident[s.incident.incident_id]] ?? null;
+}
+
 export const useStore = create<AppState>((set, get) => ({
     systemStatus: null,
     incident: null,
-    testRun: null,
+    testRuns: {},
+    runByIncident: {},
     wsConnected: false,
     loading: { initial: true, action: false },
     error: null,
@@ -78,7 +153,8 @@ export const useStore = create<AppState>((set, get) => ({
             set({
                 systemStatus: status,
                 incident: null,
-                testRun: null,
+                testRuns: {},
+                runByIncident: {},
                 chat: [],
                 loading: { initial: false, action: false },
             });
@@ -97,7 +173,7 @@ export const useStore = create<AppState>((set, get) => ({
             set((s) => ({ loading: { ...s.loading, action: true }, error: null }));
             const testRun = await api.runTests(incident.incident_id);
             set((s) => ({
-                testRun,
+                ...withRun(s, testRun),
                 loading: { ...s.loading, action: false },
             }));
         } catch (e: any) {
@@ -119,16 +195,21 @@ export const useStore = create<AppState>((set, get) => ({
         set((s) => ({ chat: [...s.chat, userMsg] }));
 
         try {
-            const answer: CopilotAnswer = await api.askCopilot(
+            const { request_id } = await api.askCopilotStream(
                 incident?.incident_id ?? null,
                 question
             );
-            const assistantMsg: ChatMessage = {
+            const early = earlyCopilot.get(request_id);
+            earlyCopilot.delete(request_id);
+            let assistantMsg: ChatMessage = {
                 role: "assistant",
-                content: answer.answer,
-                citations: answer.citations,
-                ts: answer.created_at,
+                content: early?.content ?? "",
+                citations: [],
+                ts: new Date().toISOString(),
+                request_id,
+                streaming: true,
             };
+            if (early?.answer) assistantMsg = applyCopilotAnswer(assistantMsg, early.answer);
             set((s) => ({ chat: [...s.chat, assistantMsg] }));
         } catch (e: any) {
             const errorMsg: ChatMessage = {
@@ -162,18 +243,50 @@ export const useStore = create<AppState>((set, get) => ({
                     };
                 });
                 break;
-            case "tests.updated":
-                set({ testRun: msg.payload as TestRun });
+            case "tests.updated": {
+                const run = msg.payload as TestRun;
+                set((s) => withRun(s, run));
                 break;
+            }
+            case "tests.item_updated": {
+                const patch = msg.payload as TestRunPatch;
+                const testRun = get().testRuns[patch.run_id];
+                if (!testRun || patch.seq !== testRun.seq + 1) {
+                    // Missed a patch (or never saw this run) — ask for a full snapshot
+                    sendWs({ type: "tests.resync", run_id: patch.run_id });
+                    break;
+                }
+                set((s) => withRun(s, applyTestRunPatch(testRun, patch)));
+                break;
+            }
+            case "copilot.delta": {
+                const delta = msg.payload as CopilotDelta;
+                if (!get().chat.some((m) => m.request_id === delta.request_id)) {
+                    holdEarlyCopilot(delta.request_id).content += delta.delta;
+                    break;
+                }
+                set((s) => ({
+                    chat: s.chat.map((m) =>
+                        m.request_id === delta.request_id && m.streaming
+                            ? { ...m, content: m.content + delta.delta }
+                            : m
+                    ),
+                }));
+                break;
+            }
             case "copilot.answer": {
                 const answer = msg.payload as CopilotAnswer;
-                const assistantMsg: ChatMessage = {
-                    role: "assistant",
-                    content: answer.answer,
-                    citations: answer.citations,
-                    ts: answer.created_at,
-                };
-                set((s) => ({ chat: [...s.chat, assistantMsg] }));
+                if (!answer.request_id) break;
+                const request_id = answer.request_id;
+                if (!get().chat.some((m) => m.request_id === request_id)) {
+                    holdEarlyCopilot(request_id).answer = answer;
+                    break;
+                }
+                set((s) => ({
+                    chat: s.chat.map((m) =>
+                        m.request_id === request_id ? applyCopilotAnswer(m, answer) : m
+                    ),
+                }));
                 break;
             }
         }
@@ -61,6 +61,28 @@ export type TestRun = {
     last_update_at: string;
     details: string | null;
   }>;
+  seq: number;
+};
+
+export type TestRunPage = {
+  runs: TestRun[];
+  next_cursor: string | null;
+};
+
+export type TestItemPatch = {
+  test_id: string;
+  name?: string;
+  status?: TestItemStatus;
+  last_update_at?: string;
+  details?: string | null;
+};
+
+export type TestRunPatch = {
+  run_id: string;
+  incident_id: string;
+  seq: number;
+  status?: TestRunStatus;
+  items: TestItemPatch[];
 };
 
 export type CopilotAnswer = {
@@ -69,6 +91,14 @@ export type CopilotAnswer = {
   answer: string;
   citations: Array<{ label: string; url: string }>;
   created_at: string;
+  request_id?: string | null;
+};
+
+export type CopilotDelta = {
+  request_id: string;
+  incident_id: string | null;
+  seq: number;
+  delta: string;
 };
 
 export type WsMessageType =
@@ -76,12 +106,17 @@ export type WsMessageType =
   | "incident.created"
   | "plan.generated"
   | "tests.updated"
+  | "tests.item_updated"
+  | "ws.hello"
+  | "ws.lagged"
+  | "copilot.delta"
   | "copilot.answer";
 
 export type WsMessage = {
   type: WsMessageType;
   payload: any;
   ts: string;
+  seq?: number;
 };
 
 export type ChatMessage = {
@@ -89,4 +124,7 @@ export type ChatMessage = {
   content: string;
   citations: Array<{ label: string; url: string }>;
   ts: string;
+  // Streamed copilot answers: the request they belong to, and whether more text is coming
+  request_id?: string;
+  streaming?: boolean;
 };
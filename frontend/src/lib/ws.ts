@@ -10,13 +10,20 @@ let retryCount = 0;
 let retryTimer: ReturnType<typeof setTimeout> | null = null;
 let onMessageCb: WsCallback | null = null;
 let onConnectedCb: ((connected: boolean) => void) | null = null;
+// Last broadcast frame seen, so a reconnect only replays what was missed
+let lastSeq: number | null = null;
+let epoch: string | null = null;
 
 function getWsUrl(): string {
     const backend =
         process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:8000";
     const wsProtocol = backend.startsWith("https") ? "wss" : "ws";
     const host = backend.replace(/^https?:\/\//, "");
-    return `${wsProtocol}://${host}/ws`;
+    const resume =
+        lastSeq !== null && epoch !== null
+            ? `?resume_from=${lastSeq}&epoch=${encodeURIComponent(epoch)}`
+            : "";
+    return `${wsProtocol}://${host}/ws${resume}`;
 }
 
 function connect() {
@@ -33,6 +40,17 @@ function connect() {
     socket.onmessage = (event) => {
         try {
             const msg: WsMessage = JSON.parse(event.data);
+            if (msg.type === "ws.hello") {
+                epoch = msg.payload.epoch;
+                lastSeq = msg.payload.seq;
+                return;
+            }
+            if (msg.type === "ws.lagged") {
+                // The server dropped frames for us; reconnect and resume from lastSeq
+                socket?.close();
+                return;
+            }
+            if (typeof msg.seq === "number") lastSeq = msg.seq;
             onMessageCb?.(msg);
         } catch {
             console.warn("[WS] Failed to parse message", event.data);
@@ -68,11 +86,19 @@ export function connectWs(
     connect();
 }
 
+export function sendWs(msg: Record<string, unknown>) {
+    if (socket?.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify(msg));
+    }
+}
+
 export function disconnectWs() {
     if (retryTimer) clearTimeout(retryTimer);
     retryCount = MAX_RETRIES; // prevent reconnect
     socket?.close();
     socket = null;
+    lastSeq = null;
+    epoch = null;
     onMessageCb = null;
     onConnectedCb = null;
 }
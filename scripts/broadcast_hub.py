@@ -0,0 +1,87 @@
+"""Tiny Redis-protocol pub/sub hub for running several orchestrator workers
+on one host without a Redis server.
+
+Only PUBLISH, SUBSCRIBE, UNSUBSCRIBE, PING and AUTH are implemented, which
+is all RedisBackend needs. Point the workers at it with
+WS_BROADCAST_URL=unix:///tmp/fixloop-bus.sock (or redis://127.0.0.1:6390).
+Only the worker holding STATE_LOCK_PATH owns incident state; the others are
+WebSocket relays.
+
+    python -m scripts.broadcast_hub --unix /tmp/fixloop-bus.sock
+"""
+import argparse
+import asyncio
+import logging
+import os
+from typing import Dict, Set
+
+from src.common.broadcast import read_reply
+
+logger = logging.getLogger(__name__)
+
+subscribers: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+
+
+def _bulk(value: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    channels: Set[bytes] = set()
+    try:
+        while True:
+            command = await read_reply(reader)
+            if not isinstance(command, list) or not command:
+                continue
+            name = command[0].upper()
+            if name == b"PUBLISH" and len(command) == 3:
+                receivers = list(subscribers.get(command[1], ()))
+                frame = b"*3\r\n" + _bulk(b"message") + _bulk(command[1]) + _bulk(command[2])
+                for receiver in receivers:
+                    receiver.write(frame)
+                writer.write(b":%d\r\n" % len(receivers))
+            elif name == b"SUBSCRIBE":
+                for channel in command[1:]:
+                    channels.add(channel)
+                    subscribers.setdefault(channel, set()).add(writer)
+                    writer.write(b"*3\r\n" + _bulk(b"subscribe") + _bulk(channel) + b":%d\r\n" % len(channels))
+            elif name == b"UNSUBSCRIBE":
+                for channel in command[1:] or list(channels):
+                    channels.discard(channel)
+                    subscribers.get(channel, set()).discard(writer)
+                    writer.write(b"*3\r\n" + _bulk(b"unsubscribe") + _bulk(channel) + b":%d\r\n" % len(channels))
+            elif name == b"PING":
+                writer.write(b"+PONG\r\n")
+            elif name == b"AUTH":
+                writer.write(b"+OK\r\n")
+            else:
+                writer.write(b"-ERR unsupported command\r\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        for channel in channels:
+            subscribers.get(channel, set()).discard(writer)
+        writer.close()
+
+
+async def main(args):
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.unlink(args.unix)
+        server = await asyncio.start_unix_server(handle, path=args.unix)
+        logger.info(f"Broadcast hub listening on unix://{args.unix}")
+    else:
+        server = await asyncio.start_server(handle, args.host, args.port)
+        logger.info(f"Broadcast hub listening on redis://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--unix", help="Unix socket path to listen on")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,251 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import logging
+import uuid
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import urlparse, unquote
+
+from src.common.encoding import EncodedEvent, dumps
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[EncodedEvent], None]
+OnSubscribed = Callable[[], None]
+
+
+class BroadcastBackend(ABC):
+    """Carries events between orchestrator processes.
+
+    ``publish`` must never block: the local process always fans out first,
+    and the backend forwards the event to its peers in the background. Events
+    received from peers are handed to ``deliver`` for local fan-out, and
+    ``on_subscribed`` runs each time the backend (re)starts receiving them.
+
+    Only WebSocket events travel over the bus. Incident state, the journal
+    and detection belong to the single stateful worker (see
+    ``src.orchestrator.ownership``); the other processes are relays.
+    """
+
+    name = "base"
+
+    async def start(self, deliver: Deliver, on_subscribed: Optional[OnSubscribed] = None):
+        self._deliver = deliver
+        self._on_subscribed = on_subscribed
+
+    @abstractmethod
+    def publish(self, event: EncodedEvent):
+        """Queue ``event`` for the peers; must not block."""
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class InProcessBackend(BroadcastBackend):
+    """Single-process backend: there are no peers, so publishing is a no-op."""
+
+    name = "memory"
+
+    def publish(self, event: EncodedEvent):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Wire format: one JSON header line, then the already-encoded payload bytes
+# ---------------------------------------------------------------------------
+
+def encode_wire(origin: str, event: EncodedEvent) -> bytes:
+    header = dumps({
+        "origin": origin,
+        "type": event.type,
+        "ts": event.ts,
+        "incident_id": event.incident_id,
+    })
+    return header + b"\n" + event.payload
+
+
+def decode_wire(data: bytes) -> Tuple[str, EncodedEvent]:
+    header, _, payload = data.partition(b"\n")
+    meta = json.loads(header)
+    event = EncodedEvent(meta["type"], payload, meta["ts"], meta.get("incident_id"))
+    return meta.get("origin", ""), event
+
+
+# ---------------------------------------------------------------------------
+# Minimal RESP (Redis protocol) helpers
+# ---------------------------------------------------------------------------
+
+def encode_command(*parts) -> bytes:
+    out = [b"*%d\r\n" % len(parts)]
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(part), part))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise ConnectionError(f"Server error: {rest.decode()}")
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(rest)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"Unexpected reply: {line[:50]!r}")
+
+
+class RedisBackend(BroadcastBackend):
+    """Shares events through Redis pub/sub (or anything speaking the same protocol).
+
+    Supports ``redis://[:password@]host:port`` and ``unix:///path/to.sock``.
+    One connection publishes (pipelined, from a bounded queue), a second one
+    holds the subscription. Both reconnect with backoff; events that cannot be
+    forwarded while the bus is down are dropped once the queue is full, since
+    local clients have already received them.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str, max_pending: int = 4096):
+        self.url = url
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._pending: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._tasks: List[asyncio.Task] = []
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.connected = False
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        parsed = urlparse(self.url)
+        if parsed.scheme == "unix":
+            reader, writer = await asyncio.open_unix_connection(unquote(parsed.path))
+        else:
+            reader, writer = await asyncio.open_connection(parsed.hostname or "localhost", parsed.port or 6379)
+        if parsed.password:
+            writer.write(encode_command("AUTH", unquote(parsed.password)))
+            await writer.drain()
+            await read_reply(reader)
+        return reader, writer
+
+    async def start(self, deliver: Deliver, on_subscribed: Optional[OnSubscribed] = None):
+        await super().start(deliver, on_subscribed)
+        self._tasks = [
+            asyncio.create_task(self._publish_loop()),
+            asyncio.create_task(self._subscribe_loop()),
+        ]
+        logger.info(f"Broadcast bus using {self.url} channel {self.channel}")
+
+    def publish(self, event: EncodedEvent):
+        try:
+            self._pending.put_nowait(encode_wire(self.origin, event))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _publish_loop(self):
+        backoff = 0.5
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                backoff = 0.5
+                while True:
+                    batch = [await self._pending.get()]
+                    while not self._pending.empty() and len(batch) < 256:
+                        batch.append(self._pending.get_nowait())
+                    writer.write(b"".join(encode_command("PUBLISH", self.channel, d) for d in batch))
+                    await writer.drain()
+                    for _ in batch:
+                        await read_reply(reader)
+                    self.published += len(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Broadcast publisher disconnected: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+            finally:
+                if writer:
+                    writer.close()
+
+    async def _subscribe_loop(self):
+        backoff = 0.5
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                writer.write(encode_command("SUBSCRIBE", self.channel))
+                await writer.drain()
+                await read_reply(reader)
+                self.connected = True
+                backoff = 0.5
+                if self._on_subscribed is not None:
+                    self._on_subscribed()
+                while True:
+                    reply = await read_reply(reader)
+                    if not isinstance(reply, list) or len(reply) != 3 or reply[0] != b"message":
+                        continue
+                    origin, event = decode_wire(reply[2])
+                    if origin == self.origin:
+                        continue
+                    self.received += 1
+                    self._deliver(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.connected = False
+                logger.warning(f"Broadcast subscriber disconnected: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+            finally:
+                if writer:
+                    writer.close()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.connected = False
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "connected": self.connected,
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+            "pending": self._pending.qsize(),
+        }
+
+
+def create_backend(url: Optional[str], channel: str) -> BroadcastBackend:
+    if not url or url.startswith("memory"):
+        return InProcessBackend()
+    if url.startswith(("redis://", "unix://")):
+        return RedisBackend(url, channel)
+    logger.warning(f"Unknown broadcast backend URL {url!r}, using in-process")
+    return InProcessBackend()
@@ -17,6 +17,31 @@ DD_APP_KEY = os.getenv("DD_APP_KEY", "")
 DD_SITE = os.getenv("DD_SITE", "datadoghq.com")
 DD_SERVICE = os.getenv("DD_SERVICE", "demo-checkout")
 DD_ENV = os.getenv("DD_ENV", "hackathon")
+DD_SERVICES = [s.strip() for s in os.getenv("DD_SERVICES", DD_SERVICE).split(",") if s.strip()]
+DETECTION_THRESHOLD = float(os.getenv("DETECTION_THRESHOLD", "0.05"))
+DETECTION_MIN_INTERVAL = float(os.getenv("DETECTION_MIN_INTERVAL", "2"))
+DETECTION_BASE_INTERVAL = float(os.getenv("DETECTION_BASE_INTERVAL", "5"))
+DETECTION_MAX_INTERVAL = float(os.getenv("DETECTION_MAX_INTERVAL", "60"))
+DETECTION_CONCURRENCY = int(os.getenv("DETECTION_CONCURRENCY", "4"))
+DETECTION_BATCH_SIZE = int(os.getenv("DETECTION_BATCH_SIZE", "50"))
+ANOMALY_LOOKBACK_S = int(os.getenv("ANOMALY_LOOKBACK_S", "3600"))
+ANOMALY_ROLLUP_S = int(os.getenv("ANOMALY_ROLLUP_S", "30"))
+ANOMALY_WINDOW = int(os.getenv("ANOMALY_WINDOW", "360"))
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.3"))
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "4"))
+ANOMALY_SHORT_POINTS = int(os.getenv("ANOMALY_SHORT_POINTS", "4"))
+ANOMALY_LONG_POINTS = int(os.getenv("ANOMALY_LONG_POINTS", "30"))
+ANOMALY_BURN_SHORT = float(os.getenv("ANOMALY_BURN_SHORT", "1.0"))
+ANOMALY_BURN_LONG = float(os.getenv("ANOMALY_BURN_LONG", "0.5"))
+ANOMALY_LATENCY_FLOOR_MS = float(os.getenv("ANOMALY_LATENCY_FLOOR_MS", "1000"))
+CORRELATION_WINDOW_S = float(os.getenv("CORRELATION_WINDOW_S", "900"))
+CORRELATION_BUCKET_S = float(os.getenv("CORRELATION_BUCKET_S", "60"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1024"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+WEBHOOK_DEDUPE_TTL_S = float(os.getenv("WEBHOOK_DEDUPE_TTL_S", "300"))
+DD_METRICS_FLUSH_INTERVAL = float(os.getenv("DD_METRICS_FLUSH_INTERVAL", "10"))
+DD_METRICS_MAX_CONTEXTS = int(os.getenv("DD_METRICS_MAX_CONTEXTS", "10000"))
+DD_METRICS_MAX_PENDING_BYTES = int(os.getenv("DD_METRICS_MAX_PENDING_BYTES", str(4 * 1024 * 1024)))
 DATADOG_MCP_URL = os.getenv("DATADOG_MCP_URL", "")
 DATADOG_MCP_AUTH = os.getenv("DATADOG_MCP_AUTH", "")
 
@@ -24,3 +49,44 @@ TESTSPRITE_MCP_URL = os.getenv("TESTSPRITE_MCP_URL", "")
 TESTSPRITE_MCP_AUTH = os.getenv("TESTSPRITE_MCP_AUTH", "")
 TESTSPRITE_API_KEY = os.getenv("TESTSPRITE_API_KEY", "")
 TESTSPRITE_BASE_URL = os.getenv("TESTSPRITE_BASE_URL", "")
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "drop_oldest")
+WS_TESTS_DELTA = os.getenv("WS_TESTS_DELTA", "true").lower() == "true"
+WS_REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "1024"))
+WS_BROADCAST_URL = os.getenv("WS_BROADCAST_URL", "")
+WS_BROADCAST_CHANNEL = os.getenv("WS_BROADCAST_CHANNEL", "fixloop:events")
+
+STATE_LOCK_PATH = os.getenv("STATE_LOCK_PATH", ".fixloop/state.lock")
+STATE_OWNER_SOCKET = os.getenv("STATE_OWNER_SOCKET", ".fixloop/owner.sock")
+
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", ".fixloop/journal.db")
+JOURNAL_SNAPSHOT_EVERY = int(os.getenv("JOURNAL_SNAPSHOT_EVERY", "500"))
+
+RUN_HISTORY_PATH = os.getenv("RUN_HISTORY_PATH", ".fixloop/runs.db")
+RUN_HISTORY_MEMORY_BYTES = int(os.getenv("RUN_HISTORY_MEMORY_BYTES", str(8 * 1024 * 1024)))
+RUN_HISTORY_MAX_AGE_S = float(os.getenv("RUN_HISTORY_MAX_AGE_S", "3600"))
+RUN_HISTORY_RETENTION_DAYS = float(os.getenv("RUN_HISTORY_RETENTION_DAYS", "30"))
+
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", ".fixloop/plans.db")
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "256"))
+PLAN_CACHE_TTL_S = float(os.getenv("PLAN_CACHE_TTL_S", "3600"))
+PLAN_CACHE_MAX_STALE_S = float(os.getenv("PLAN_CACHE_MAX_STALE_S", "86400"))
+PLAN_DEADLINE_S = float(os.getenv("PLAN_DEADLINE_S", "15"))
+PLAN_HEDGE_DELAY_S = float(os.getenv("PLAN_HEDGE_DELAY_S", "2"))
+PLAN_SPECULATE_AT = float(os.getenv("PLAN_SPECULATE_AT", "0.5"))
+PLAN_SPECULATE_CANCEL_AT = float(os.getenv("PLAN_SPECULATE_CANCEL_AT", "0.25"))
+PLAN_SPECULATION_TTL_S = float(os.getenv("PLAN_SPECULATION_TTL_S", "900"))
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_MAX_QUEUE_PLAN = int(os.getenv("LLM_MAX_QUEUE_PLAN", "16"))
+LLM_MAX_QUEUE_COPILOT = int(os.getenv("LLM_MAX_QUEUE_COPILOT", "32"))
+LLM_MAX_QUEUE_SPECULATIVE = int(os.getenv("LLM_MAX_QUEUE_SPECULATIVE", "4"))
+
+COPILOT_CACHE_MAX_ENTRIES = int(os.getenv("COPILOT_CACHE_MAX_ENTRIES", "512"))
+COPILOT_CACHE_TTL_S = float(os.getenv("COPILOT_CACHE_TTL_S", "300"))
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "false").lower() == "true"
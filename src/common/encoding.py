@@ -0,0 +1,80 @@
+from typing import Any, Dict, Optional, Tuple
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode a model, dict or list to compact JSON bytes using pydantic-core's Rust encoder."""
+    return to_json(obj)
+
+
+class EncodedEvent:
+    """A WebSocket event whose JSON frame is built once and shared by every consumer.
+
+    ``incident_id`` is routing metadata only (it is not added to the frame);
+    None means the event is not scoped to an incident.
+    """
+
+    __slots__ = ("type", "payload", "ts", "incident_id", "_body", "_text")
+
+    def __init__(self, type: str, payload: bytes, ts: str, incident_id: Optional[str] = None):
+        self.type = type
+        self.payload = payload
+        self.ts = ts
+        self.incident_id = incident_id
+        self._body: Optional[bytes] = None
+        self._text: Optional[str] = None
+
+    def _envelope(self, prefix: bytes) -> bytes:
+        return b"".join((
+            prefix, b'"type":', dumps(self.type),
+            b',"payload":', self.payload,
+            b',"ts":', dumps(self.ts),
+            b"}",
+        ))
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = self._envelope(b"{")
+        return self._body
+
+    def frame(self, seq: int) -> str:
+        """The envelope text stamped with a broadcast sequence number."""
+        return self._envelope(b'{"seq":%d,' % seq).decode()
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.body.decode()
+        return self._text
+
+
+class SnapshotCache:
+    """Keeps the encoded bytes of the latest version of each named snapshot.
+
+    Callers bump a version counter whenever the underlying model changes; as
+    long as the version is unchanged the cached bytes are reused for REST
+    responses and WS frames alike.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, key: str, version: int, model: Optional[BaseModel]) -> bytes:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        data = dumps(model)
+        self._entries[key] = (version, data)
+        return data
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+
+snapshot_cache = SnapshotCache()
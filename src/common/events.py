@@ -1,6 +1,8 @@
 from datetime import datetime
-from typing import Dict, List, Any
-import json
+from typing import Any, Dict, List, Optional
+
+from src.common.encoding import EncodedEvent, dumps, snapshot_cache
+
 
 class Event:
     @staticmethod
@@ -8,46 +10,68 @@ class Event:
         return datetime.utcnow().isoformat() + "Z"
 
     @staticmethod
-    def system_status(status: "SystemStatus") -> Dict[str, Any]:
-        return {
-            "type": "system.status",
-            "payload": status.model_dump(),
-            "ts": Event.now_iso()
-        }
+    def system_status(status: "SystemStatus", version: Optional[int] = None) -> EncodedEvent:
+        payload = (
+            snapshot_cache.encode("system.status", version, status)
+            if version is not None
+            else dumps(status)
+        )
+        return EncodedEvent("system.status", payload, Event.now_iso())
 
     @staticmethod
-    def incident_created(incident: "IncidentCard") -> Dict[str, Any]:
-        return {
-            "type": "incident.created",
-            "payload": incident.model_dump(),
-            "ts": Event.now_iso()
-        }
+    def incident_created(incident: "IncidentCard", version: Optional[int] = None) -> EncodedEvent:
+        payload = (
+            snapshot_cache.encode(f"incident:{incident.incident_id}", version, incident)
+            if version is not None
+            else dumps(incident)
+        )
+        return EncodedEvent("incident.created", payload, Event.now_iso(), incident.incident_id)
 
     @staticmethod
-    def plan_generated(incident_id: str, plan: "Plan") -> Dict[str, Any]:
-        return {
-            "type": "plan.generated",
-            "payload": {
-                "incident_id": incident_id,
-                "plan": plan.model_dump()
-            },
-            "ts": Event.now_iso()
-        }
+    def plan_generated(incident_id: str, plan: "Plan", partial: bool = False) -> EncodedEvent:
+        payload: Dict[str, Any] = {"incident_id": incident_id, "plan": plan}
+        if partial:
+            payload["partial"] = True
+        return EncodedEvent(
+            "plan.generated",
+            dumps(payload),
+            Event.now_iso(),
+            incident_id,
+        )
 
     @staticmethod
-    def tests_updated(test_run: "TestRun") -> Dict[str, Any]:
-        return {
-            "type": "tests.updated",
-            "payload": test_run.model_dump(),
-            "ts": Event.now_iso()
-        }
+    def tests_updated(test_run: "TestRun") -> EncodedEvent:
+        return EncodedEvent(
+            "tests.updated", dumps(test_run), Event.now_iso(), test_run.incident_id or None
+        )
 
     @staticmethod
-    def copilot_answer(answer: "CopilotAnswer") -> Dict[str, Any]:
-        return {
-            "type": "copilot.answer",
-            "payload": answer.model_dump(),
-            "ts": Event.now_iso()
+    def tests_item_updated(
+        test_run: "TestRun", items: List[Dict[str, Any]], run_status_changed: bool
+    ) -> EncodedEvent:
+        payload: Dict[str, Any] = {
+            "run_id": test_run.run_id,
+            "incident_id": test_run.incident_id,
+            "seq": test_run.seq,
+            "items": items,
         }
+        if run_status_changed:
+            payload["status"] = test_run.status
+        return EncodedEvent(
+            "tests.item_updated", dumps(payload), Event.now_iso(), test_run.incident_id or None
+        )
+
+    @staticmethod
+    def copilot_delta(request_id: str, incident_id: Optional[str], seq: int, delta: str) -> EncodedEvent:
+        return EncodedEvent(
+            "copilot.delta",
+            dumps({"request_id": request_id, "incident_id": incident_id, "seq": seq, "delta": delta}),
+            Event.now_iso(),
+            incident_id,
+        )
+
+    @staticmethod
+    def copilot_answer(answer: "CopilotAnswer") -> EncodedEvent:
+        return EncodedEvent("copilot.answer", dumps(answer), Event.now_iso(), answer.incident_id)
 
 from src.common.models import SystemStatus, IncidentCard, Plan, TestRun, CopilotAnswer
@@ -0,0 +1,162 @@
+import logging
+import weakref
+from typing import Dict, Optional
+
+import httpx
+
+from src.common.config import (
+    STATE_OWNER_SOCKET,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_HTTP2,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+
+class Upstream:
+    """Connection settings for one outbound dependency."""
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        http2: bool = False,
+        max_connections: Optional[int] = None,
+        uds: Optional[str] = None,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.http2 = http2
+        self.max_connections = max_connections or HTTP_MAX_CONNECTIONS
+        self.uds = uds
+
+
+# Per-call timeouts can still be overridden with ``timeout=`` on the request
+UPSTREAMS = {
+    "datadog": Upstream("datadog", timeout=10.0, http2=HTTP_HTTP2),
+    "minimax": Upstream("minimax", timeout=60.0, http2=HTTP_HTTP2),
+    "demo": Upstream("demo", timeout=10.0),
+    # Relays forward stateful API calls to the stateful worker's private socket
+    "owner": Upstream("owner", timeout=120.0, uds=STATE_OWNER_SOCKET),
+}
+
+
+class HttpClients:
+    """Process-wide pooled HTTP clients, one per upstream.
+
+    Clients are created on first use and keep their connections alive
+    between calls, so repeated requests skip the TCP/TLS handshake. The
+    shared clients serve the orchestrator's event loop; code running its
+    own loop (the agent pool's slots) gets a private client from
+    ``new_async``, which still shows up in ``stats``. ``start`` and
+    ``aclose`` are tied to the app's startup and shutdown.
+    """
+
+    def __init__(self, upstreams: Dict[str, Upstream] = UPSTREAMS):
+        self.upstreams = upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._private: "weakref.WeakKeyDictionary[httpx.AsyncClient, str]" = weakref.WeakKeyDictionary()
+        self.requests: Dict[str, int] = {}
+
+    def _settings(self, name: str) -> dict:
+        upstream = self.upstreams.get(name) or Upstream(name, timeout=10.0)
+        http2 = upstream.http2 and _H2_AVAILABLE
+        if upstream.http2 and not _H2_AVAILABLE:
+            logger.warning(f"HTTP/2 requested for {name} but the h2 package is not installed")
+
+        def count(request):
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+        limits = httpx.Limits(
+            max_connections=upstream.max_connections,
+            max_keepalive_connections=min(HTTP_MAX_KEEPALIVE, upstream.max_connections),
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        if upstream.uds:
+            return {
+                "timeout": upstream.timeout,
+                "transport": httpx.AsyncHTTPTransport(uds=upstream.uds, limits=limits),
+                "count": count,
+            }
+        return {
+            "timeout": upstream.timeout,
+            "http2": http2,
+            "limits": limits,
+            "count": count,
+        }
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    def new_async(self, name: str) -> httpx.AsyncClient:
+        """A private async client with the upstream's settings, for another event loop.
+
+        An async client's connections belong to the loop that opened them,
+        so code running its own loop (the agent pool) keeps its own client
+        and closes it itself.
+        """
+        client = self._create(name)
+        self._private[client] = name
+        return client
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        settings = self._settings(name)
+        count = settings.pop("count")
+
+        async def hook(request):
+            count(request)
+
+        return httpx.AsyncClient(**settings, event_hooks={"request": [hook]})
+
+    def start(self):
+        """Create the async clients up front so first requests do not pay for it."""
+        for name in self.upstreams:
+            self.get(name)
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+
+    @staticmethod
+    def _pool_stats(client) -> dict:
+        # httpx does not expose its pool; read httpcore's state defensively
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "open": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+            "waiting": sum(1 for r in getattr(pool, "_requests", []) if r.is_queued()),
+            "max": getattr(pool, "_max_connections", None),
+        }
+
+    def stats(self) -> dict:
+        pools = {name: self._pool_stats(client) for name, client in self._clients.items()}
+        private: Dict[str, int] = {}
+        for client, name in list(self._private.items()):
+            if client.is_closed:
+                continue
+            private[name] = private.get(name, 0) + 1
+            pools[f"{name}:private{private[name]}"] = self._pool_stats(client)
+        return {
+            "http2_available": _H2_AVAILABLE,
+            "requests": dict(self.requests),
+            "pools": pools,
+        }
+
+
+http_clients = HttpClients()
@@ -95,6 +95,11 @@ class TestRun(BaseModel):
     started_at: str
     status: TestRunStatusEnum
     tests: List[TestItem] = []
+    seq: int = 0
+
+class TestRunPage(BaseModel):
+    runs: List[TestRun] = []
+    next_cursor: Optional[str] = None
 
 class Citation(BaseModel):
     label: str
@@ -106,12 +111,15 @@ class CopilotAnswer(BaseModel):
     answer: str
     citations: List[Citation] = []
     created_at: str
+    request_id: Optional[str] = None
 
 class WsMessageType(str, Enum):
     SYSTEM_STATUS = "system.status"
     INCIDENT_CREATED = "incident.created"
     PLAN_GENERATED = "plan.generated"
     TESTS_UPDATED = "tests.updated"
+    TESTS_ITEM_UPDATED = "tests.item_updated"
+    COPILOT_DELTA = "copilot.delta"
     COPILOT_ANSWER = "copilot.answer"
 
 class WsMessage(BaseModel):
@@ -131,3 +139,6 @@ class RunTestsRequest(BaseModel):
 class CopilotAskRequest(BaseModel):
     incident_id: Optional[str]
     question: str
+
+class CopilotStreamStarted(BaseModel):
+    request_id: str
@@ -1,49 +1,497 @@
 import asyncio
-from typing import List, Set
+from datetime import datetime
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from fastapi import WebSocket
 import json
 import logging
+import uuid
+
+from src.common.config import (
+    WS_SEND_QUEUE_SIZE,
+    WS_OVERFLOW_POLICY,
+    WS_REPLAY_BUFFER_SIZE,
+    WS_BROADCAST_URL,
+    WS_BROADCAST_CHANNEL,
+)
+from src.common.broadcast import BroadcastBackend, create_backend
+from src.common.encoding import EncodedEvent, dumps
+from src.common.models import WsMessageType
 
 logger = logging.getLogger(__name__)
 
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE, OVERFLOW_DISCONNECT)
+
+ALL_TOPICS = "*"
+EVENT_TYPES = frozenset(t.value for t in WsMessageType)
+
+# Bus-only control event: a relay asks the stateful worker to republish its state
+PEER_JOINED = "peer.joined"
+
+
+# Full-state frames: a newer one for the same incident supersedes a pending one.
+# Everything else (seq'd patches, copilot deltas) must arrive in full or not at all.
+SNAPSHOT_TYPES = frozenset((
+    WsMessageType.SYSTEM_STATUS.value,
+    WsMessageType.INCIDENT_CREATED.value,
+    WsMessageType.PLAN_GENERATED.value,
+    WsMessageType.TESTS_UPDATED.value,
+))
+
+# Sent to a client that lost frames to overflow; it should reconnect with resume_from
+LAGGED = "ws.lagged"
+
+CoalesceKey = Optional[Tuple[str, Optional[str]]]
+
+
+def coalesce_key(event_type: str, incident_id: Optional[str]) -> CoalesceKey:
+    return (event_type, incident_id) if event_type in SNAPSHOT_TYPES else None
+
+
+class _Connection:
+    """A single client socket with its own bounded outbound queue and writer task.
+
+    Frames are queued as ``(key, text)`` pairs. ``key`` is the frame's
+    ``coalesce_key``: under the ``coalesce`` policy a full-state frame
+    replaces the pending one with the same key, and anything else falls
+    back to dropping the oldest frame. Whenever a frame is lost rather than
+    superseded, the writer sends ``ws.lagged`` next so the client can
+    resume from its last seq.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int, policy: str):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.policy = policy
+        self.queue: Deque[Tuple[CoalesceKey, str]] = deque()
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.coalesced = 0
+        self.lagged = 0
+        self.writer_task: Optional[asyncio.Task] = None
+        # None means "everything"; excluded_incidents narrows the wildcard
+        self.event_types: Optional[Set[str]] = None
+        self.incidents: Optional[Set[str]] = None
+        self.excluded_incidents: Set[str] = set()
+
+    def wants(self, event_type: str, incident_id: Optional[str]) -> bool:
+        if self.event_types is not None and event_type not in self.event_types:
+            return False
+        if incident_id is None:
+            return True
+        if self.incidents is None:
+            return incident_id not in self.excluded_incidents
+        return incident_id in self.incidents
+
+    def enqueue(self, key: CoalesceKey, text: str) -> bool:
+        """Queue a frame without blocking. Returns False if the connection must be dropped."""
+        if self.closed:
+            return False
+
+        if len(self.queue) >= self.max_queue:
+            if self.policy == OVERFLOW_DISCONNECT:
+                return False
+            if not (self.policy == OVERFLOW_COALESCE and key is not None and self._supersede(key)):
+                self.queue.popleft()
+                self.dropped += 1
+                self.lagged += 1
+
+        self.queue.append((key, text))
+        self.ready.set()
+        return True
+
+    def _supersede(self, key: CoalesceKey) -> bool:
+        for i in range(len(self.queue) - 1, -1, -1):
+            if self.queue[i][0] == key:
+                del self.queue[i]
+                self.coalesced += 1
+                return True
+        return False
+
+    def _lagged_frame(self) -> str:
+        frame = json.dumps({
+            "type": LAGGED,
+            "payload": {"dropped": self.lagged},
+            "ts": datetime.utcnow().isoformat() + "Z",
+        })
+        self.lagged = 0
+        return frame
+
+    async def run_writer(self, on_dead):
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self.ready.clear()
+                    await self.ready.wait()
+                    continue
+                if self.lagged:
+                    await self.websocket.send_text(self._lagged_frame())
+                    continue
+                _, text = self.queue.popleft()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to send to connection: {e}")
+            on_dead(self)
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self.ready.set()
+
+
+class _PeerState:
+    """The latest full-state frames a relay has seen on the bus.
+
+    Relays hold no incident state of their own, so this is what they send a
+    client on connect: the last ``system.status``, each incident's last
+    ``incident.created`` and its run as a ``tests.updated`` plus any
+    ``tests.item_updated`` patches that followed it.
+    """
+
+    __slots__ = ("status", "incidents", "runs", "max_incidents")
+
+    def __init__(self, max_incidents: int = 256):
+        self.status: Optional[EncodedEvent] = None
+        self.incidents: "OrderedDict[str, EncodedEvent]" = OrderedDict()
+        self.runs: Dict[str, List[EncodedEvent]] = {}
+        self.max_incidents = max_incidents
+
+    def apply(self, event: EncodedEvent):
+        incident_id = event.incident_id
+        if event.type == WsMessageType.SYSTEM_STATUS.value:
+            self.status = event
+        elif incident_id is None:
+            return
+        elif event.type == WsMessageType.INCIDENT_CREATED.value:
+            self.incidents[incident_id] = event
+            self.incidents.move_to_end(incident_id)
+            while len(self.incidents) > self.max_incidents:
+                stale, _ = self.incidents.popitem(last=False)
+                self.runs.pop(stale, None)
+        elif event.type == WsMessageType.TESTS_UPDATED.value:
+            self.runs[incident_id] = [event]
+        elif event.type == WsMessageType.TESTS_ITEM_UPDATED.value and incident_id in self.runs:
+            self.runs[incident_id].append(event)
+
+    def events(self) -> List[EncodedEvent]:
+        events = [self.status] if self.status else []
+        for incident_id, event in self.incidents.items():
+            events.append(event)
+            events.extend(self.runs.get(incident_id, ()))
+        return events
+
+
 class WSManager:
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
-        self._lock = asyncio.Lock()
+    """Fans events out to every connected dashboard.
+
+    ``broadcast`` reuses the pre-encoded frame of an ``EncodedEvent`` (plain
+    dicts are serialized once) and appends it to each connection's bounded
+    queue; a dedicated writer task per connection does the actual socket I/O,
+    so one slow client can never stall the others or the caller.
+
+    Every broadcast frame carries a monotonically increasing ``seq`` and is
+    kept in a bounded replay buffer, so a reconnecting client can ask for
+    just the frames it missed. ``epoch`` changes on every process start; a
+    resume against a different epoch cannot be served from the buffer.
+
+    Clients may narrow what they receive by event type and incident id.
+    Connections are indexed by both topics, so a broadcast only visits the
+    connections that can possibly want it.
+
+    A ``BroadcastBackend`` shares events with other orchestrator processes:
+    each process fans out to its own sockets and forwards to its peers.
+    Sequence numbers and the replay buffer are per process. A relay (a
+    process that does not own incident state) remembers the latest state
+    frames from the bus for its connect snapshots, and asks the stateful
+    worker to republish its state when it joins.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = WS_SEND_QUEUE_SIZE,
+        overflow_policy: str = WS_OVERFLOW_POLICY,
+        replay_size: int = WS_REPLAY_BUFFER_SIZE,
+        backend: Optional[BroadcastBackend] = None,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            logger.warning(
+                f"Unknown WS overflow policy {overflow_policy!r}, using {OVERFLOW_DROP_OLDEST}"
+            )
+            overflow_policy = OVERFLOW_DROP_OLDEST
+        self.max_queue = max(1, max_queue)
+        self.overflow_policy = overflow_policy
+        self._connections: Dict[WebSocket, _Connection] = {}
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self._replay: Deque[Tuple[int, str, Optional[str], str]] = deque(maxlen=max(1, replay_size))
+        self._by_type: Dict[str, Set[_Connection]] = {ALL_TOPICS: set()}
+        self._by_incident: Dict[str, Set[_Connection]] = {ALL_TOPICS: set()}
+        self.backend = backend or create_backend(WS_BROADCAST_URL, WS_BROADCAST_CHANNEL)
+        self.relay = False
+        self.on_peer_joined: Optional[Callable[[], None]] = None
+        self._peer_state = _PeerState()
+
+    async def start(self, relay: bool = False):
+        self.relay = relay
+        await self.backend.start(self._receive, self._request_state if relay else None)
+
+    def _request_state(self):
+        # Also after a reconnect, since frames may have been missed meanwhile
+        self.backend.publish(EncodedEvent(PEER_JOINED, b"null", datetime.utcnow().isoformat() + "Z"))
+
+    async def stop(self):
+        await self.backend.stop()
+
+    @property
+    def active_connections(self):
+        return set(self._connections)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        async with self._lock:
-            self.active_connections.add(websocket)
-        logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
+        conn = _Connection(websocket, self.max_queue, self.overflow_policy)
+        conn.writer_task = asyncio.create_task(conn.run_writer(self._drop))
+        self._connections[websocket] = conn
+        self._index(conn)
+        logger.info(f"WebSocket connected. Total connections: {len(self._connections)}")
 
     async def disconnect(self, websocket: WebSocket):
-        async with self._lock:
-            self.active_connections.discard(websocket)
-        logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
+        conn = self._connections.pop(websocket, None)
+        if conn:
+            self._unindex(conn)
+            conn.close()
+            if conn.writer_task and conn.writer_task is not asyncio.current_task():
+                conn.writer_task.cancel()
+        logger.info(f"WebSocket disconnected. Total connections: {len(self._connections)}")
+
+    def _drop(self, conn: _Connection):
+        if self._connections.get(conn.websocket) is conn:
+            del self._connections[conn.websocket]
+        self._unindex(conn)
+        conn.close()
+        if conn.writer_task and conn.writer_task is not asyncio.current_task():
+            conn.writer_task.cancel()
+        asyncio.create_task(self._close_socket(conn.websocket))
+
+    async def _close_socket(self, websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _frame(message: Union[EncodedEvent, dict], seq: Optional[int] = None) -> Tuple[CoalesceKey, str]:
+        if isinstance(message, EncodedEvent):
+            key = coalesce_key(message.type, message.incident_id)
+            return key, message.text if seq is None else message.frame(seq)
+        return None, json.dumps(message)
+
+    # -- topic index -------------------------------------------------------
+
+    @staticmethod
+    def _add(index: Dict[str, Set[_Connection]], keys: Optional[Iterable[str]], conn: _Connection):
+        for key in (ALL_TOPICS,) if keys is None else keys:
+            index.setdefault(key, set()).add(conn)
+
+    @staticmethod
+    def _remove(index: Dict[str, Set[_Connection]], keys: Optional[Iterable[str]], conn: _Connection):
+        for key in (ALL_TOPICS,) if keys is None else keys:
+            members = index.get(key)
+            if members is not None:
+                members.discard(conn)
+                if not members and key != ALL_TOPICS:
+                    del index[key]
+
+    def _index(self, conn: _Connection):
+        self._add(self._by_type, conn.event_types, conn)
+        self._add(self._by_incident, conn.incidents, conn)
+
+    def _unindex(self, conn: _Connection):
+        self._remove(self._by_type, conn.event_types, conn)
+        self._remove(self._by_incident, conn.incidents, conn)
+
+    def _recipients(self, event_type: str, incident_id: Optional[str]) -> Iterator[_Connection]:
+        pools = (self._by_type.get(event_type, ()), self._by_type[ALL_TOPICS])
+        if incident_id is not None:
+            by_incident = (self._by_incident.get(incident_id, ()), self._by_incident[ALL_TOPICS])
+            if sum(map(len, by_incident)) < sum(map(len, pools)):
+                pools = by_incident
+        for pool in pools:
+            for conn in list(pool):
+                if conn.wants(event_type, incident_id):
+                    yield conn
+
+    def subscribe(
+        self,
+        websocket: WebSocket,
+        event_types: Optional[Iterable[str]] = None,
+        incidents: Optional[Iterable[str]] = None,
+    ) -> Optional[dict]:
+        """Add topics to a connection's filter. A connection that was receiving
+        everything for a topic dimension now receives only what it listed."""
+        conn = self._connections.get(websocket)
+        if conn is None:
+            return None
+        self._unindex(conn)
+        if event_types is not None:
+            known = {t for t in event_types if t in EVENT_TYPES}
+            conn.event_types = (conn.event_types or set()) | known
+        if incidents is not None:
+            conn.incidents = (conn.incidents or set()) | set(incidents)
+            conn.excluded_incidents.clear()
+        self._index(conn)
+        return self.subscriptions(conn)
+
+    def unsubscribe(
+        self,
+        websocket: WebSocket,
+        event_types: Optional[Iterable[str]] = None,
+        incidents: Optional[Iterable[str]] = None,
+    ) -> Optional[dict]:
+        conn = self._connections.get(websocket)
+        if conn is None:
+            return None
+        self._unindex(conn)
+        if event_types is not None:
+            remaining = set(EVENT_TYPES) if conn.event_types is None else conn.event_types
+            conn.event_types = remaining - set(event_types)
+        if incidents is not None:
+            if conn.incidents is None:
+                conn.excluded_incidents.update(incidents)
+            else:
+                conn.incidents -= set(incidents)
+        self._index(conn)
+        return self.subscriptions(conn)
 
-    async def broadcast(self, message: dict):
-        if not self.active_connections:
+    @staticmethod
+    def subscriptions(conn: _Connection) -> dict:
+        return {
+            "type": "ws.subscribed",
+            "payload": {
+                "events": sorted(conn.event_types) if conn.event_types is not None else [ALL_TOPICS],
+                "incidents": sorted(conn.incidents) if conn.incidents is not None else [ALL_TOPICS],
+                "excluded_incidents": sorted(conn.excluded_incidents),
+            },
+            "ts": datetime.utcnow().isoformat() + "Z",
+        }
+
+    # -- sending -------------------------------------------------------------
+
+    async def broadcast(self, message: Union[EncodedEvent, dict]):
+        if not isinstance(message, EncodedEvent):
+            message = EncodedEvent(
+                message.get("type", ""),
+                dumps(message.get("payload")),
+                message.get("ts") or datetime.utcnow().isoformat() + "Z",
+            )
+        self._fan_out(message)
+        self.backend.publish(message)
+
+    def publish_to_peers(self, events: Iterable[EncodedEvent]):
+        """Send frames to the other processes only, e.g. a state snapshot for a new relay."""
+        for event in events:
+            self.backend.publish(event)
+
+    def peer_snapshot(self) -> List[EncodedEvent]:
+        """A relay's connect snapshot, built from the state frames seen on the bus."""
+        return self._peer_state.events()
+
+    def _receive(self, event: EncodedEvent):
+        if event.type == PEER_JOINED:
+            if not self.relay and self.on_peer_joined is not None:
+                self.on_peer_joined()
+            return
+        if self.relay:
+            self._peer_state.apply(event)
+        self._fan_out(event)
+
+    def _fan_out(self, event: EncodedEvent):
+        self.seq += 1
+        key, message_json = self._frame(event, self.seq)
+        incident_id = event.incident_id
+        self._replay.append((self.seq, event.type, incident_id, message_json))
+
+        if not self._connections:
+            return
+
+        for conn in self._recipients(event.type, incident_id):
+            if not conn.enqueue(key, message_json):
+                logger.warning("WebSocket send queue overflowed, disconnecting slow client")
+                self._drop(conn)
+
+    async def send_personal(self, websocket: WebSocket, message: Union[EncodedEvent, dict]):
+        key, message_json = self._frame(message)
+        conn = self._connections.get(websocket)
+        if conn:
+            conn.enqueue(key, message_json)
             return
-        
-        message_json = json.dumps(message)
-        disconnected = set()
-        
-        async with self._lock:
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(message_json)
-                except Exception as e:
-                    logger.warning(f"Failed to send to connection: {e}")
-                    disconnected.add(connection)
-        
-        for conn in disconnected:
-            self.active_connections.discard(conn)
-
-    async def send_personal(self, websocket: WebSocket, message: dict):
         try:
-            await websocket.send_json(message)
+            await websocket.send_text(message_json)
         except Exception as e:
             logger.warning(f"Failed to send personal message: {e}")
 
+    def hello(self) -> dict:
+        return {
+            "type": "ws.hello",
+            "payload": {"epoch": self.epoch, "seq": self.seq},
+            "ts": datetime.utcnow().isoformat() + "Z",
+        }
+
+    def replay(self, websocket: WebSocket, resume_from: int, epoch: Optional[str] = None) -> bool:
+        """Queue every buffered frame after ``resume_from`` for ``websocket``.
+
+        Returns False when the gap cannot be served from the buffer (unknown
+        epoch, or the oldest missed frame was already evicted); the caller
+        should then send a full snapshot instead. Must be called right after
+        ``connect`` without awaiting in between so no live frame slips past.
+        """
+        conn = self._connections.get(websocket)
+        if conn is None:
+            return False
+        if epoch is not None and epoch != self.epoch:
+            return False
+        if resume_from > self.seq:
+            return False
+        if resume_from < self.seq:
+            oldest = self._replay[0][0] if self._replay else self.seq + 1
+            if resume_from + 1 < oldest:
+                return False
+
+        missed = [
+            (coalesce_key(event_type, incident_id), text)
+            for seq, event_type, incident_id, text in self._replay
+            if seq > resume_from and conn.wants(event_type, incident_id)
+        ]
+        if len(missed) > conn.max_queue:
+            # Replaying would overflow the send queue and reopen the gap
+            return False
+        for key, text in missed:
+            conn.enqueue(key, text)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._connections),
+            "queued": sum(len(c.queue) for c in self._connections.values()),
+            "dropped": sum(c.dropped for c in self._connections.values()),
+            "coalesced": sum(c.coalesced for c in self._connections.values()),
+            "overflow_policy": self.overflow_policy,
+            "max_queue": self.max_queue,
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "relay": self.relay,
+            "replay_buffered": len(self._replay),
+            "bus": self.backend.stats(),
+            "topics": {
+                "events": {k: len(v) for k, v in self._by_type.items()},
+                "incidents": {k: len(v) for k, v in self._by_incident.items()},
+            },
+        }
+
+
 ws_manager = WSManager()
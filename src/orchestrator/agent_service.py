@@ -1,23 +1,50 @@
 import asyncio
+import time
 import uuid
-from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
 import logging
 
-from src.common.models import StatusEnum, TestRunStatusEnum, TestStatusEnum
+from src.common.events import Event
 from src.orchestrator.state import state
+from src.orchestrator.outbox import outbox
 from src.orchestrator.integrations.strands_agent import strands_agent_client
 from src.orchestrator.integrations.testsprite_client import testsprite_adapter
-from src.orchestrator.integrations.datadog_detection import datadog_client
+from src.orchestrator.detection import DetectionScheduler
+from src.orchestrator.webhooks import webhook_ingestor
+from src.orchestrator.correlation import correlator, fingerprint
+from src.orchestrator.copilot_cache import copilot_cache, CopilotStream
+from src.orchestrator.plan_cache import plan_cache
+from src.orchestrator.plan_generator import plan_generator
+from src.orchestrator.llm_scheduler import llm_scheduler, LLMOverloaded, PLAN, COPILOT, SPECULATIVE
+from src.orchestrator.integrations.datadog_metrics import metrics
+from src.common.config import DD_SERVICE, MINIMAX_API_KEY, PLAN_SPECULATION_TTL_S
 
 logger = logging.getLogger(__name__)
 
+
+class _Speculation:
+    """A plan being prepared for a service that is trending towards an incident."""
+
+    __slots__ = ("key", "task", "started_at")
+
+    def __init__(self, key: str, task: asyncio.Task):
+        self.key = key
+        self.task = task
+        self.started_at = time.monotonic()
+
+
 class AgentService:
     def __init__(self):
         self.running = False
         self.incident_detection_task = None
         self.plan_generation_task = None
         self.test_execution_task = None
+        self.detection = DetectionScheduler()
+        self.copilot_tasks: set = set()
+        self.plan_tasks: set = set()
+        self.speculations: Dict[str, _Speculation] = {}
+        self.speculation_counts = {"started": 0, "used_ready": 0, "used_running": 0, "discarded": 0, "failed": 0}
+        self.speculation_lead_ms = 0.0
 
     async def start(self):
         if self.running:
@@ -26,7 +53,15 @@ class AgentService:
         self.running = True
         logger.info("Agent service started")
         
-        self.incident_detection_task = asyncio.create_task(self._incident_detection_loop())
+        self.incident_detection_task = asyncio.create_task(
+            self.detection.run(self._on_incident_detected, self._on_trend)
+        )
+        webhook_ingestor.start(self._on_incident_detected)
+
+        # Incidents restored from the journal may have lost their plan generation
+        for incident in state.list_incidents():
+            if not incident.plan.items:
+                self._start_plan_generation(incident.incident_id)
 
     async def stop(self):
         self.running = False
@@ -37,88 +72,257 @@ class AgentService:
                 await self.incident_detection_task
             except asyncio.CancelledError:
                 pass
+        await webhook_ingestor.stop()
+        for task in list(self.copilot_tasks) + list(self.plan_tasks):
+            task.cancel()
+        for service in list(self.speculations):
+            self._discard_speculation(service, "shutting down")
         
         logger.info("Agent service stopped")
 
-    async def _incident_detection_loop(self):
-        while self.running:
-            try:
-                if state.system_status.status == StatusEnum.HEALTHY:
-                    # Check 1: Local state (from demo app bug toggle)
-                    local_error_rate = state.system_status.error_rate_5m
-                    
-                    # Check 2: Datadog metrics (may return empty if no APM data)
-                    # We implement a suppression window: if bug was recently fixed, ignore Datadog for 60s
-                    # to allow for metric ingestion latency.
-                    dd_incident = None
-                    time_since_toggle = (datetime.utcnow() - state.last_bug_toggle_time).total_seconds()
-                    
-                    if state.bug_enabled or time_since_toggle > 60:
-                        dd_incident = await datadog_client.detect_incident()
-                    else:
-                        logger.info(f"Suppressing Datadog detection (toggle was {time_since_toggle:.1f}s ago)")
-                    
-                    # Trigger incident if either local state or Datadog shows issues
-                    if local_error_rate > 0.05 or (dd_incident and dd_incident["incident_detected"]):
-                        error_rate = local_error_rate if local_error_rate > 0.05 else dd_incident.get("error_rate", 100.0)
-                        p95_latency = state.system_status.p95_latency_ms_5m if local_error_rate > 0.05 else dd_incident.get("p95_latency", 5000.0)
-                        
-                        logger.info(f"Incident detected: {error_rate:.2f}% error rate (source: {'local' if local_error_rate > 0.05 else 'datadog'})")
-                        
-                        await state.create_incident(
-                            title=f"Checkout Service Failure - {error_rate:.1f}% error rate",
-                            error_rate=error_rate,
-                            p95_latency=p95_latency
-                        )
-                        
-                        self.plan_generation_task = asyncio.create_task(self._generate_plan())
-                
-                await asyncio.sleep(5)
-                
-            except Exception as e:
-                logger.error(f"Error in incident detection loop: {e}")
-                await asyncio.sleep(5)
+    async def _on_incident_detected(
+        self, service, error_rate, p95_latency, top_error, source, monitor_id="MON-12345", title=None
+    ):
+        if title:
+            title = str(title)
+        elif service == DD_SERVICE:
+            title = f"Checkout Service Failure - {error_rate:.1f}% error rate"
+        else:
+            title = f"{service} Failure - {error_rate:.1f}% error rate"
+
+        await self._open_incident(
+            title=title,
+            error_rate=error_rate,
+            p95_latency=p95_latency,
+            service=service,
+            top_error=top_error,
+            monitor_id=monitor_id,
+        )
+
+    async def _open_incident(
+        self,
+        title: str,
+        error_rate: float,
+        p95_latency: float,
+        service: str = DD_SERVICE,
+        top_error: Optional[str] = None,
+        monitor_id: str = "MON-12345",
+    ):
+        """Create an incident and plan for it, unless the alert folds into an open one."""
+        fp = fingerprint(service, top_error, monitor_id, error_rate, p95_latency)
+        incident_id = correlator.match(fp, service)
+        if incident_id:
+            incident = await state.fold_alert(incident_id, error_rate, p95_latency)
+            if incident:
+                correlator.folded += 1
+                logger.info(f"Alert on {service} folded into {incident_id} (fingerprint {fp})")
+                return incident
+
+        incident = await state.create_incident(
+            title=title,
+            error_rate=error_rate,
+            p95_latency=p95_latency,
+            service=service,
+            top_error=top_error,
+            monitor_id=monitor_id,
+        )
+        correlator.remember(fp, incident.incident_id)
 
-    async def _generate_plan(self):
+        self.plan_generation_task = self._start_plan_generation(incident.incident_id)
+        return incident
+
+    def _start_plan_generation(self, incident_id: str) -> asyncio.Task:
+        # Tracked so shutdown cancels generations for every live incident
+        task = asyncio.create_task(self._generate_plan(incident_id))
+        self.plan_tasks.add(task)
+        task.add_done_callback(self.plan_tasks.discard)
+        return task
+
+    async def _generate_plan(self, incident_id: str):
         try:
-            logger.info("Generating recovery validation plan...")
+            incident = state.get_incident(incident_id)
+            if not incident:
+                logger.warning(f"Incident {incident_id} no longer exists, skipping plan generation")
+                return
+
+            logger.info(f"Generating recovery validation plan for {incident_id}...")
             
-            context = {
-                "error_rate": state.system_status.error_rate_5m,
-                "p95_latency": state.system_status.p95_latency_ms_5m,
-                "service": "demo-checkout",
-                "top_error": "Checkout endpoint returning 500"
-            }
+            summary = incident.datadog_summary
+            context = self._plan_context(
+                summary.service, summary.signal.error_rate_5m, summary.signal.p95_latency_ms_5m,
+                summary.signal.top_error, incident_id,
+            )
             
-            plan_items = await strands_agent_client.generate_plan(context)
+            started = time.monotonic()
+            partial_updates = []
+
+            def on_items(items: list):
+                if not state.get_incident(incident_id):
+                    return
+                if not partial_updates:
+                    first_ms = (time.monotonic() - started) * 1000
+                    metrics.distribution("fixloop.plan.first_item_ms", first_ms)
+                    logger.info(f"First plan item for {incident_id} after {first_ms:.0f}ms")
+                partial_updates.append(
+                    asyncio.create_task(state.update_plan(items, incident_id, partial=True))
+                )
+
+            speculation = self._claim_speculation(summary.service)
+            plan_items, upgrade = None, None
+            if speculation is not None:
+                plan_items, upgrade = await self._use_speculation(incident_id, speculation, context)
+            if plan_items is None:
+                plan_items, upgrade = await plan_generator.generate(context, on_items)
+            # The complete plan must land after every partial one
+            await asyncio.gather(*partial_updates, return_exceptions=True)
             
-            if state.current_incident:
-                await state.update_plan(plan_items)
+            if state.get_incident(incident_id):
+                await state.update_plan(plan_items, incident_id)
                 logger.info(f"Plan generated with {len(plan_items)} test items")
             else:
-                logger.warning("No incident found to attach plan to")
+                logger.warning(f"Incident {incident_id} was cleared before its plan was ready")
+                if upgrade is not None:
+                    upgrade.cancel()
+                return
+
+            if upgrade is not None:
+                # The fallback plan went out at the deadline; replace it when the real one is ready
+                try:
+                    plan_items = await upgrade
+                except Exception as e:
+                    logger.warning(f"No plan upgrade for {incident_id}: {e}")
+                    return
+                if state.get_incident(incident_id):
+                    await state.update_plan(plan_items, incident_id)
+                    logger.info(f"Upgraded plan for {incident_id} to {len(plan_items)} generated items")
                 
         except Exception as e:
             logger.error(f"Error generating plan: {e}")
 
+    @staticmethod
+    def _plan_context(
+        service: str, error_rate: float, p95_latency: float, top_error: Optional[str], incident_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        context = {
+            "error_rate": error_rate,
+            "p95_latency": p95_latency,
+            "service": service,
+            "top_error": top_error or "Checkout endpoint returning 500",
+        }
+        if incident_id:
+            context["incident_id"] = incident_id
+        return context
+
+    # ------------------------------------------------------------------
+    # Speculative plans
+    # ------------------------------------------------------------------
+
+    async def _on_trend(self, service: str, trending: bool, error_rate, p95_latency, top_error):
+        if trending:
+            self._speculate(service, error_rate, p95_latency, top_error)
+        else:
+            self._discard_speculation(service, "signal recovered")
+
+    def _speculate(self, service: str, error_rate: float, p95_latency: float, top_error: Optional[str]):
+        """Start generating a plan, at the lowest LLM priority, before the incident exists."""
+        if not MINIMAX_API_KEY or service in self.speculations or state.get_incident_for_service(service):
+            return
+        try:
+            llm_scheduler.check(SPECULATIVE)
+        except LLMOverloaded:
+            return
+
+        key = f"speculative:{service}"
+        # Not cached under this context: the pre-incident signal lands in a different
+        # band than the incident will. The plan is filed under the incident's key once claimed.
+        task = plan_generator.speculate(self._plan_context(service, error_rate, p95_latency, top_error), key)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.speculations[service] = _Speculation(key, task)
+        self.speculation_counts["started"] += 1
+        logger.info(f"Speculatively generating a plan for {service}")
+
+    def _discard_speculation(self, service: str, reason: str):
+        speculation = self.speculations.pop(service, None)
+        if speculation is not None:
+            speculation.task.cancel()
+            self.speculation_counts["discarded"] += 1
+            logger.info(f"Discarded speculative plan for {service}: {reason}")
+
+    def _claim_speculation(self, service: str) -> Optional[_Speculation]:
+        speculation = self.speculations.get(service)
+        if speculation is None:
+            return None
+        if time.monotonic() - speculation.started_at > PLAN_SPECULATION_TTL_S:
+            self._discard_speculation(service, "too old")
+            return None
+        return self.speculations.pop(service)
+
+    async def _use_speculation(self, incident_id: str, speculation: _Speculation, context: Dict[str, Any]):
+        """The speculative plan as (plan, upgrade), or (None, None) if it failed.
+
+        The plan goes through the cache under the incident's own context, so
+        a cached plan for it still wins and a speculative one is stored
+        where later look-alike incidents will find it.
+        """
+        task = speculation.task
+        lead_ms = (time.monotonic() - speculation.started_at) * 1000
+        ready = task.done()
+        if ready and (task.cancelled() or task.exception() is not None):
+            self.speculation_counts["failed"] += 1
+            return None, None
+        if not ready:
+            # A queued speculative job would wait behind copilot questions; it is a real incident's plan now
+            llm_scheduler.promote(speculation.key, PLAN)
+            logger.info(f"Waiting on speculative plan for {incident_id}, started {lead_ms:.0f}ms ago")
+
+        consumed = False
+
+        async def from_speculation(ctx, on_items):
+            nonlocal consumed
+            consumed = True
+            return await task
+
+        cached = asyncio.create_task(plan_cache.get_or_generate(context, from_speculation))
+        plan_items, upgrade = await plan_generator.adopt(cached)
+        if not consumed:
+            task.cancel()
+        elif upgrade is None and (cached.cancelled() or cached.exception() is not None):
+            # Generate from scratch rather than settle for the fallback plan
+            self.speculation_counts["failed"] += 1
+            return None, None
+        if consumed:
+            self.speculation_counts["used_ready" if ready else "used_running"] += 1
+            self.speculation_lead_ms += lead_ms
+            logger.info(f"Using speculative plan for {incident_id}, started {lead_ms:.0f}ms before it was needed")
+        return plan_items, upgrade
+
+    def speculation_stats(self) -> dict:
+        used = self.speculation_counts["used_ready"] + self.speculation_counts["used_running"]
+        return {
+            "active": len(self.speculations),
+            **self.speculation_counts,
+            "avg_lead_ms": round(self.speculation_lead_ms / used, 1) if used else 0.0,
+        }
+
     async def run_validation_tests(self, incident_id: str) -> Optional[str]:
         try:
-            # Use the current active incident (don't require exact ID match)
-            if not state.current_incident:
+            # Fall back to the focused incident (don't require exact ID match)
+            incident = state.get_incident(incident_id) or state.current_incident
+            if not incident:
                 logger.error("No active incident")
                 return None
             
-            if not state.current_incident.plan.items:
+            if not incident.plan.items:
                 logger.error("No plan items available for testing")
                 return None
             
-            logger.info(f"Starting validation tests for {state.current_incident.incident_id}...")
+            logger.info(f"Starting validation tests for {incident.incident_id}...")
             
-            plan_items = [item.model_dump() if hasattr(item, 'model_dump') else item for item in state.current_incident.plan.items]
-            test_run = await testsprite_adapter.run_tests(plan_items, state.current_incident.incident_id)
+            plan_items = [item.model_dump() if hasattr(item, 'model_dump') else item for item in incident.plan.items]
+            test_run = await testsprite_adapter.run_tests(plan_items, incident.incident_id)
             
             # Store the test run in state so the route and frontend can access it
-            state.current_test_run = test_run
+            state.attach_test_run(test_run)
             
             return test_run.run_id
             
@@ -126,18 +330,77 @@ class AgentService:
             logger.error(f"Error running validation tests: {e}")
             return None
 
+    def ask_copilot_stream(self, incident_id: Optional[str], question: str) -> str:
+        """Start a streamed copilot answer; chunks and the final answer arrive over /ws.
+
+        Raises ``LLMOverloaded`` up front if the copilot queue is full.
+        """
+        llm_scheduler.check(COPILOT)
+        request_id = f"COP-{uuid.uuid4().hex[:8].upper()}"
+        task = asyncio.create_task(self._stream_copilot(request_id, incident_id, question))
+        self.copilot_tasks.add(task)
+        task.add_done_callback(self.copilot_tasks.discard)
+        return request_id
+
+    async def _stream_copilot(self, request_id: str, incident_id: Optional[str], question: str):
+        cached = copilot_cache.get(incident_id, question)
+        if cached is not None:
+            cached.request_id = request_id
+            outbox.broadcast(Event.copilot_delta(request_id, incident_id, 1, cached.answer))
+            outbox.broadcast(Event.copilot_answer(cached))
+            return
+
+        stream, leader = copilot_cache.join_stream(incident_id, question, request_id)
+        if not leader:
+            # The leader sends this request the rest of the deltas and the answer
+            if stream.parts:
+                self._send_copilot_delta(stream, request_id, incident_id, "".join(stream.parts))
+            return
+
+        started = asyncio.get_event_loop().time()
+        version = state.context_version(incident_id)
+        incident, test_run = state.get_context(incident_id)
+        try:
+            async for delta in strands_agent_client.stream_answer(
+                question,
+                context=incident,
+                test_run=test_run,
+                incident_id=incident_id,
+            ):
+                if not stream.parts:
+                    elapsed_ms = (asyncio.get_event_loop().time() - started) * 1000
+                    logger.info(f"Copilot {request_id} first token after {elapsed_ms:.0f}ms")
+                stream.parts.append(delta)
+                for listener in list(stream.listeners):
+                    self._send_copilot_delta(stream, listener, incident_id, delta)
+            answer = strands_agent_client.build_answer(incident_id, question, "".join(stream.parts))
+            if state.context_version(incident_id) == version:
+                copilot_cache.put(incident_id, question, answer)
+        except Exception as e:
+            logger.error(f"Error streaming copilot answer {request_id}: {e}")
+            answer = strands_agent_client.default_answer(question, incident_id)
+        finally:
+            # No await from here on, so nobody can join between this and the answers below
+            copilot_cache.end_stream(stream)
+        for listener, (asked, _) in stream.listeners.items():
+            outbox.broadcast(Event.copilot_answer(
+                answer.model_copy(update={"request_id": listener, "question": asked})
+            ))
+
+    @staticmethod
+    def _send_copilot_delta(stream: CopilotStream, request_id: str, incident_id: Optional[str], delta: str):
+        outbox.broadcast(Event.copilot_delta(request_id, incident_id, stream.next_seq(request_id), delta))
+
     async def simulate_incident(self, mode: str) -> bool:
         try:
             if mode == "INCIDENT_ON":
                 logger.info("Simulating incident...")
                 
-                await state.create_incident(
+                await self._open_incident(
                     title="Checkout Service Failure - Simulated",
                     error_rate=100.0,
                     p95_latency=5000.0
                 )
-                
-                self.plan_generation_task = asyncio.create_task(self._generate_plan())
                 return True
                 
             elif mode == "INCIDENT_OFF":
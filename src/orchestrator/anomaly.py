@@ -0,0 +1,242 @@
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from src.common.config import (
+    DETECTION_THRESHOLD,
+    ANOMALY_WINDOW,
+    ANOMALY_EWMA_ALPHA,
+    ANOMALY_Z_THRESHOLD,
+    ANOMALY_SHORT_POINTS,
+    ANOMALY_LONG_POINTS,
+    ANOMALY_BURN_SHORT,
+    ANOMALY_BURN_LONG,
+    ANOMALY_LATENCY_FLOOR_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+ERROR = "error"
+LATENCY = "latency"
+METRICS = (ERROR, LATENCY)
+
+# Below this many points a baseline is too thin for a z-score
+_MIN_BASELINE = 10
+
+
+class SeriesBuffer:
+    """Fixed-size ring buffers for one metric, one row per service.
+
+    Rows share a single 2-D array so every statistic is computed for all
+    services (or any subset of rows) with whole-array NumPy operations.
+    """
+
+    def __init__(self, window: int, rows: int = 16):
+        self.window = window
+        self.values = np.full((rows, window), np.nan)
+        self.heads = np.zeros(rows, dtype=np.int64)
+        self.last_ts = np.full(rows, -np.inf)
+
+    def _grow(self, rows: int):
+        extra = rows - len(self.heads)
+        self.values = np.vstack([self.values, np.full((extra, self.window), np.nan)])
+        self.heads = np.concatenate([self.heads, np.zeros(extra, dtype=np.int64)])
+        self.last_ts = np.concatenate([self.last_ts, np.full(extra, -np.inf)])
+
+    def ensure(self, rows: int):
+        if rows > len(self.heads):
+            self._grow(max(rows, 2 * len(self.heads)))
+
+    def append(self, row: int, pointlist: Sequence[Sequence[float]]):
+        """Append ``[timestamp, value]`` points newer than what the row already holds."""
+        points = np.asarray(
+            [(p[0], p[1]) for p in pointlist if len(p) >= 2 and p[1] is not None],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        points = points[points[:, 0] > self.last_ts[row]]
+        if not len(points):
+            return
+        points = points[-self.window:]
+        n = len(points)
+        slots = (self.heads[row] + np.arange(n)) % self.window
+        self.values[row, slots] = points[:, 1]
+        self.heads[row] = (self.heads[row] + n) % self.window
+        self.last_ts[row] = points[-1, 0]
+
+    def ordered(self, rows: np.ndarray) -> np.ndarray:
+        """Rows in chronological order, oldest column first (NaN where empty)."""
+        index = (self.heads[rows, None] + np.arange(self.window)) % self.window
+        return self.values[rows[:, None], index]
+
+
+def ewma(series: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponentially weighted mean of each row's points, skipping NaNs."""
+    out = np.full(series.shape[0], np.nan)
+    for column in series.T:
+        present = ~np.isnan(column)
+        start = present & np.isnan(out)
+        out[start] = column[start]
+        update = present & ~start
+        out[update] = alpha * column[update] + (1 - alpha) * out[update]
+    return out
+
+
+def _tail_mean(series: np.ndarray, points: int) -> np.ndarray:
+    tail = series[:, -points:]
+    count = np.sum(~np.isnan(tail), axis=1)
+    total = np.nansum(tail, axis=1)
+    return np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+
+
+def zscore(series: np.ndarray, current: np.ndarray, exclude: int) -> np.ndarray:
+    """How far ``current`` sits from each row's baseline (the window minus its last points)."""
+    baseline = series[:, :-exclude] if exclude else series
+    count = np.sum(~np.isnan(baseline), axis=1)
+    z = np.zeros(series.shape[0])
+    enough = count >= _MIN_BASELINE
+    if not enough.any():
+        return z
+    mean = np.nanmean(baseline[enough], axis=1)
+    std = np.nanstd(baseline[enough], axis=1)
+    # A flat baseline would make any change infinite; floor the spread
+    std = np.maximum(std, np.maximum(np.abs(mean) * 0.05, 1e-6))
+    z[enough] = (current[enough] - mean) / std
+    return np.nan_to_num(z)
+
+
+class AnomalyEngine:
+    """Rolling-window anomaly signals for error rate and latency, per service.
+
+    For every service in a batch it computes, in one pass over the shared
+    buffers:
+
+    - the EWMA of error rate and latency;
+    - the z-score of that EWMA against the rest of the window;
+    - error-budget burn rates over a short and a long window, with the
+      detection threshold as the budget (burn 1.0 = exactly at threshold).
+
+    A service is anomalous when both burn rates are over their limits
+    (sustained, not a single bad point), or when a smoothed signal is both
+    far outside its baseline and above its absolute floor.
+    """
+
+    def __init__(
+        self,
+        window: int = ANOMALY_WINDOW,
+        alpha: float = ANOMALY_EWMA_ALPHA,
+        z_threshold: float = ANOMALY_Z_THRESHOLD,
+        short_points: int = ANOMALY_SHORT_POINTS,
+        long_points: int = ANOMALY_LONG_POINTS,
+        burn_short: float = ANOMALY_BURN_SHORT,
+        burn_long: float = ANOMALY_BURN_LONG,
+        error_budget: float = DETECTION_THRESHOLD,
+        latency_floor_ms: float = ANOMALY_LATENCY_FLOOR_MS,
+    ):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.short_points = min(short_points, window)
+        self.long_points = min(long_points, window)
+        self.burn_short = burn_short
+        self.burn_long = burn_long
+        self.error_budget = error_budget
+        self.latency_floor_ms = latency_floor_ms
+        # Older points weigh less than 1e-4 in the EWMA, so skip them
+        self.ewma_span = min(window, int(np.ceil(np.log(1e-4) / np.log(1 - alpha))) + 1) if alpha < 1 else 1
+        self.rows: Dict[str, int] = {}
+        self.buffers = {metric: SeriesBuffer(window) for metric in METRICS}
+        self.evaluations = 0
+
+    def _row(self, service: str) -> int:
+        row = self.rows.get(service)
+        if row is None:
+            row = self.rows[service] = len(self.rows)
+            for buffer in self.buffers.values():
+                buffer.ensure(row + 1)
+        return row
+
+    def ingest(self, service: str, metric: str, pointlist: Sequence[Sequence[float]]):
+        if pointlist:
+            self.buffers[metric].append(self._row(service), pointlist)
+
+    def last_ts(self, service: str) -> Optional[float]:
+        row = self.rows.get(service)
+        if row is None:
+            return None
+        ts = self.buffers[ERROR].last_ts[row]
+        return None if np.isneginf(ts) else float(ts)
+
+    def evaluate(self, services: List[str]) -> Dict[str, dict]:
+        known = [s for s in services if s in self.rows]
+        if not known:
+            return {}
+        rows = np.array([self.rows[s] for s in known])
+        self.evaluations += 1
+
+        errors = self.buffers[ERROR].ordered(rows)
+        latency = self.buffers[LATENCY].ordered(rows)
+        has_data = np.any(~np.isnan(errors), axis=1)
+
+        span = self.ewma_span
+        error_ewma = np.nan_to_num(ewma(errors[:, -span:], self.alpha))
+        latency_ewma = np.nan_to_num(ewma(latency[:, -span:], self.alpha))
+        error_z = zscore(errors, error_ewma, self.short_points)
+        latency_z = zscore(latency, latency_ewma, self.short_points)
+        burn_short = _tail_mean(errors, self.short_points) / self.error_budget
+        burn_long = _tail_mean(errors, self.long_points) / self.error_budget
+
+        sustained_burn = (burn_short >= self.burn_short) & (burn_long >= self.burn_long)
+        error_spike = (error_z >= self.z_threshold) & (error_ewma > self.error_budget)
+        latency_spike = (latency_z >= self.z_threshold) & (latency_ewma > self.latency_floor_ms)
+        anomalous = has_data & (sustained_burn | error_spike | latency_spike)
+
+        latest_latency = np.nan_to_num(_last_present(latency))
+        results = {}
+        for i, service in enumerate(known):
+            if not has_data[i]:
+                continue
+            results[service] = {
+                "anomalous": bool(anomalous[i]),
+                "reason": (
+                    "error burn rate" if sustained_burn[i]
+                    else "error rate spike" if error_spike[i]
+                    else "latency spike" if latency_spike[i]
+                    else None
+                ),
+                "error_rate": float(error_ewma[i]),
+                "p95_latency": float(latest_latency[i]),
+                "error_z": float(error_z[i]),
+                "latency_z": float(latency_z[i]),
+                "burn_short": float(burn_short[i]),
+                "burn_long": float(burn_long[i]),
+            }
+        return results
+
+    def reset(self, service: str):
+        """Drop a service's points once an incident is opened for it.
+
+        ``last_ts`` is kept, so the points that triggered the incident are
+        not ingested again and cannot re-trigger once it is cleared.
+        """
+        row = self.rows.get(service)
+        if row is None:
+            return
+        for buffer in self.buffers.values():
+            buffer.values[row] = np.nan
+            buffer.heads[row] = 0
+
+    def stats(self) -> dict:
+        return {
+            "series": len(self.rows),
+            "window": self.buffers[ERROR].window,
+            "evaluations": self.evaluations,
+            "buffer_bytes": sum(b.values.nbytes for b in self.buffers.values()),
+        }
+
+
+def _last_present(series: np.ndarray) -> np.ndarray:
+    """Each row's most recent non-NaN value (NaN if the row is empty)."""
+    present = ~np.isnan(series)
+    last = series.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    values = series[np.arange(series.shape[0]), last]
+    return np.where(present.any(axis=1), values, np.nan)
@@ -0,0 +1,169 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from src.common.models import CopilotAnswer
+from src.common.config import COPILOT_CACHE_MAX_ENTRIES, COPILOT_CACHE_TTL_S
+from src.orchestrator.state import state
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str, str]
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case, spacing and trailing punctuation do not change what is being asked."""
+    return _SPACES.sub(" ", question.lower()).strip().rstrip("?!. ")
+
+
+class CopilotStream:
+    """A streamed answer being generated, shared by every identical ask that arrives meanwhile.
+
+    ``listeners`` maps each asker's request_id to its own question text and
+    the seq of the last delta it was sent.
+    """
+
+    __slots__ = ("key", "parts", "listeners")
+
+    def __init__(self, key: Key):
+        self.key = key
+        self.parts: List[str] = []
+        self.listeners: Dict[str, List] = {}
+
+    def attach(self, request_id: str, question: str):
+        self.listeners[request_id] = [question, 0]
+
+    def next_seq(self, request_id: str) -> int:
+        listener = self.listeners[request_id]
+        listener[1] += 1
+        return listener[1]
+
+
+class CopilotCache:
+    """Copilot answers reused while the state they were based on is unchanged.
+
+    Answers are keyed by incident, normalized question and
+    ``state.context_version(incident_id)``, so any status, incident or test-run
+    change makes the next ask go to the model again. ``ttl_s`` bounds how
+    long an answer is trusted anyway, since the agent also probes the live
+    service. Concurrent identical asks share one in-flight generation
+    instead of each taking an executor worker; streamed asks share one
+    ``CopilotStream``.
+    """
+
+    def __init__(self, max_entries: int = COPILOT_CACHE_MAX_ENTRIES, ttl_s: float = COPILOT_CACHE_TTL_S):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Key, Tuple[float, CopilotAnswer]]" = OrderedDict()
+        self._inflight: Dict[Key, asyncio.Task] = {}
+        self._streams: Dict[Key, CopilotStream] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(incident_id: Optional[str], question: str) -> Key:
+        return (incident_id or "", normalize_question(question), state.context_version(incident_id))
+
+    def get(self, incident_id: Optional[str], question: str) -> Optional[CopilotAnswer]:
+        key = self.key(incident_id, question)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, answer = entry
+        if time.monotonic() - stored_at > self.ttl_s:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return answer.model_copy(update={"question": question})
+
+    def put(self, incident_id: Optional[str], question: str, answer: CopilotAnswer):
+        self._store(self.key(incident_id, question), answer)
+
+    def _store(self, key: Key, answer: CopilotAnswer):
+        self._entries[key] = (time.monotonic(), answer.model_copy(update={"request_id": None}))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_answer(
+        self,
+        incident_id: Optional[str],
+        question: str,
+        generate: Callable[[], Awaitable[CopilotAnswer]],
+    ) -> CopilotAnswer:
+        """A cached answer, the one already being generated, or a new one.
+
+        Exceptions from ``generate`` reach every caller waiting on it.
+        """
+        cached = self.get(incident_id, question)
+        if cached is not None:
+            return cached
+
+        key = self.key(incident_id, question)
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            # A task of its own, so a caller that goes away does not cancel it for the rest
+            task = asyncio.create_task(self._generate(key, generate))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joining in-flight copilot answer for {key[1]!r}")
+        answer = await asyncio.shield(task)
+        return answer.model_copy(update={"question": question})
+
+    async def _generate(self, key: Key, generate: Callable[[], Awaitable[CopilotAnswer]]) -> CopilotAnswer:
+        try:
+            answer = await generate()
+            # Stored under the version it was asked against; a state change
+            # during generation just means the next ask misses
+            self._store(key, answer)
+            return answer
+        finally:
+            self._inflight.pop(key, None)
+
+    def join_stream(
+        self, incident_id: Optional[str], question: str, request_id: str
+    ) -> Tuple[CopilotStream, bool]:
+        """The stream answering this question, and whether the caller must produce it.
+
+        The caller that gets True generates the answer, sends every listener
+        its deltas and final answer, and calls ``end_stream``.
+        """
+        key = self.key(incident_id, question)
+        stream = self._streams.get(key)
+        leader = stream is None
+        if leader:
+            self.misses += 1
+            stream = self._streams[key] = CopilotStream(key)
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joining in-flight copilot stream for {key[1]!r}")
+        stream.attach(request_id, question)
+        return stream, leader
+
+    def end_stream(self, stream: CopilotStream):
+        """Stop new asks from joining; call before sending the final answers."""
+        if self._streams.get(stream.key) is stream:
+            del self._streams[stream.key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "streams_in_flight": len(self._streams),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+copilot_cache = CopilotCache()
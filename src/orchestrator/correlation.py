@@ -0,0 +1,117 @@
+import hashlib
+import math
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import logging
+
+from src.common.config import CORRELATION_WINDOW_S, CORRELATION_BUCKET_S
+from src.common.models import StatusEnum
+from src.orchestrator.state import state
+
+logger = logging.getLogger(__name__)
+
+_VARIABLE = re.compile(r"\b(?:[0-9a-f]{8}-[0-9a-f-]{27}|0x[0-9a-f]+|[0-9a-f]{12,})\b|(?<![a-z])\d+(?:\.\d+)?")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_error(text: Optional[str]) -> str:
+    """Error text with ids, hashes and numbers masked, so repeats compare equal."""
+    if not text:
+        return ""
+    return _SPACES.sub(" ", _VARIABLE.sub("#", text.lower())).strip()
+
+
+def _magnitude(value: float) -> int:
+    return int(math.floor(math.log10(value))) if value and value > 0 else -99
+
+
+def signal_shape(error_rate: float, p95_latency: float) -> str:
+    """Order of magnitude of each signal: 7% and 9% match, 0.5% and 50% do not."""
+    return f"e{_magnitude(error_rate)}:l{_magnitude(p95_latency)}"
+
+
+def fingerprint(
+    service: str,
+    top_error: Optional[str],
+    monitor_id: Optional[str],
+    error_rate: float,
+    p95_latency: float,
+) -> str:
+    key = "|".join((
+        service,
+        normalize_error(top_error),
+        monitor_id or "",
+        signal_shape(error_rate, p95_latency),
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+class IncidentCorrelator:
+    """Decides whether a new alert belongs to an incident that is already open.
+
+    Fingerprints of opened incidents are kept in a time-bucketed index
+    (``bucket_s`` wide) covering the last ``window_s`` seconds. An alert
+    folds into an existing incident when:
+
+    - the same fingerprint opened an incident within the window, or
+    - its service already has an unresolved incident detected within the
+      window (a correlated alert, e.g. latency after errors).
+
+    Only incidents that still exist and are not RECOVERED can absorb
+    alerts; a repeat after recovery is a regression and opens a new one.
+    """
+
+    def __init__(self, window_s: float = CORRELATION_WINDOW_S, bucket_s: float = CORRELATION_BUCKET_S):
+        self.window_s = window_s
+        self.bucket_s = max(1.0, bucket_s)
+        self._buckets: Dict[int, Dict[str, str]] = {}
+        self.folded = 0
+        self.opened = 0
+
+    def _bucket(self, now: float) -> int:
+        return int(now // self.bucket_s)
+
+    def _prune(self, now: float):
+        oldest = self._bucket(now - self.window_s)
+        for bucket in [b for b in self._buckets if b < oldest]:
+            del self._buckets[bucket]
+
+    @staticmethod
+    def _is_open(incident_id: str) -> bool:
+        record = state.get_record(incident_id)
+        return record is not None and record.status != StatusEnum.RECOVERED
+
+    def match(self, fp: str, service: str, now: Optional[float] = None) -> Optional[str]:
+        now = time.time() if now is None else now
+        self._prune(now)
+
+        newest = self._bucket(now)
+        for bucket in range(newest, self._bucket(now - self.window_s) - 1, -1):
+            incident_id = self._buckets.get(bucket, {}).get(fp)
+            if incident_id and self._is_open(incident_id):
+                return incident_id
+
+        incident = state.get_incident_for_service(service)
+        if incident is not None and self._is_open(incident.incident_id):
+            detected_at = datetime.fromisoformat(incident.detected_at.rstrip("Z"))
+            if now - detected_at.replace(tzinfo=timezone.utc).timestamp() <= self.window_s:
+                return incident.incident_id
+        return None
+
+    def remember(self, fp: str, incident_id: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._buckets.setdefault(self._bucket(now), {})[fp] = incident_id
+        self.opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "fingerprints": sum(len(b) for b in self._buckets.values()),
+            "opened": self.opened,
+            "folded": self.folded,
+        }
+
+
+correlator = IncidentCorrelator()
@@ -0,0 +1,287 @@
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+
+from src.common.config import (
+    DD_SERVICE,
+    DD_SERVICES,
+    DETECTION_THRESHOLD,
+    DETECTION_MIN_INTERVAL,
+    DETECTION_BASE_INTERVAL,
+    DETECTION_MAX_INTERVAL,
+    DETECTION_CONCURRENCY,
+    DETECTION_BATCH_SIZE,
+    PLAN_SPECULATE_AT,
+    PLAN_SPECULATE_CANCEL_AT,
+)
+from src.orchestrator.state import state
+from src.orchestrator.anomaly import AnomalyEngine, ERROR, LATENCY
+from src.orchestrator.integrations.datadog_detection import datadog_client
+
+logger = logging.getLogger(__name__)
+
+# (service, error_rate, p95_latency, top_error, source, monitor_id=...)
+OnIncident = Callable[..., Awaitable[None]]
+# (service, trending, error_rate, p95_latency, top_error)
+OnTrend = Callable[..., Awaitable[None]]
+
+
+class ServiceWatch:
+    """Polling state for one watched service."""
+
+    __slots__ = ("service", "interval", "next_due", "last_value", "in_flight", "polls", "trending")
+
+    def __init__(self, service: str, interval: float):
+        self.service = service
+        self.interval = interval
+        self.next_due = 0.0
+        self.last_value: Optional[float] = None
+        self.in_flight = False
+        self.polls = 0
+        self.trending = False
+
+
+class DetectionScheduler:
+    """Watches a registry of services for error-rate incidents.
+
+    Each service has its own polling interval. A service whose error rate
+    is rising or already past half the threshold is polled more often
+    (down to ``min_interval``); a quiet service backs off towards
+    ``max_interval``. Due services are grouped into one Datadog query per
+    batch, batches run with bounded concurrency, and every next poll time
+    is jittered so services do not synchronize into bursts. Failed or
+    rate-limited queries push the affected services back.
+
+    Each poll fetches only the points newer than what the anomaly engine
+    already holds, and the engine decides whether a service is anomalous.
+    Services with an open incident are not polled. The demo service also
+    takes the local bug-toggle signal into account, as before.
+
+    A service whose error rate climbs past ``speculate_at`` of the
+    threshold without being anomalous yet is reported to ``on_trend`` as
+    trending, and again as no longer trending once it falls below
+    ``cancel_at`` of the threshold, so a plan can be prepared ahead of
+    the incident.
+    """
+
+    def __init__(
+        self,
+        services: List[str] = DD_SERVICES,
+        threshold: float = DETECTION_THRESHOLD,
+        min_interval: float = DETECTION_MIN_INTERVAL,
+        base_interval: float = DETECTION_BASE_INTERVAL,
+        max_interval: float = DETECTION_MAX_INTERVAL,
+        concurrency: int = DETECTION_CONCURRENCY,
+        batch_size: int = DETECTION_BATCH_SIZE,
+        speculate_at: float = PLAN_SPECULATE_AT,
+        cancel_at: float = PLAN_SPECULATE_CANCEL_AT,
+    ):
+        self.threshold = threshold
+        self.speculate_at = speculate_at
+        self.cancel_at = cancel_at
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.batch_size = max(1, batch_size)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.watches: Dict[str, ServiceWatch] = {}
+        self._tasks: set = set()
+        self.engine = AnomalyEngine(error_budget=threshold)
+        self._on_trend: Optional[OnTrend] = None
+        self.queries = 0
+        self.failed_queries = 0
+        for service in services:
+            self.register(service)
+
+    def register(self, service: str):
+        if service not in self.watches:
+            watch = ServiceWatch(service, self.base_interval)
+            # Spread the first polls over one interval
+            watch.next_due = time.monotonic() + random.uniform(0, self.base_interval)
+            self.watches[service] = watch
+
+    def unregister(self, service: str):
+        self.watches.pop(service, None)
+
+    def _schedule(self, watch: ServiceWatch, interval: float):
+        watch.interval = min(self.max_interval, max(self.min_interval, interval))
+        watch.next_due = time.monotonic() + watch.interval * random.uniform(0.85, 1.15)
+
+    def _adapt(self, watch: ServiceWatch, value: float):
+        rising = watch.last_value is not None and value > watch.last_value
+        if value >= self.threshold / 2 or rising:
+            self._schedule(watch, watch.interval / 2)
+        elif value == 0 and not watch.last_value:
+            self._schedule(watch, watch.interval * 1.5)
+        else:
+            self._schedule(watch, self.base_interval)
+        watch.last_value = value
+
+    # ------------------------------------------------------------------
+    # Loop
+    # ------------------------------------------------------------------
+
+    async def run(self, on_incident: OnIncident, on_trend: Optional[OnTrend] = None):
+        self._on_incident = on_incident
+        self._on_trend = on_trend
+        try:
+            while True:
+                try:
+                    self._check_local()
+                    due = self._due()
+                    for i in range(0, len(due), self.batch_size):
+                        batch = due[i:i + self.batch_size]
+                        for watch in batch:
+                            watch.in_flight = True
+                        self._spawn(self._poll(batch))
+                except Exception as e:
+                    logger.error(f"Error in incident detection loop: {e}")
+                await asyncio.sleep(self._sleep_for())
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _due(self) -> List[ServiceWatch]:
+        now = time.monotonic()
+        due = []
+        for watch in self.watches.values():
+            if watch.in_flight or watch.next_due > now:
+                continue
+            if state.get_incident_for_service(watch.service):
+                # Already handling an incident for this service
+                self._schedule(watch, self.base_interval)
+                continue
+            if watch.service == DD_SERVICE and self._suppressed():
+                self._schedule(watch, self.base_interval)
+                continue
+            due.append(watch)
+        return due
+
+    def _sleep_for(self) -> float:
+        if not self.watches:
+            return self.base_interval
+        next_due = min(w.next_due for w in self.watches.values())
+        return min(self.min_interval, max(0.1, next_due - time.monotonic()))
+
+    def _check_local(self):
+        """Demo bug toggle: the local error rate is known without asking Datadog."""
+        watch = self.watches.get(DD_SERVICE)
+        if watch is None or watch.in_flight or state.get_incident_for_service(DD_SERVICE):
+            return
+        local_error_rate = state.system_status.error_rate_5m
+        if state.focus_incident_id is None and local_error_rate > self.threshold:
+            watch.in_flight = True
+            self._spawn(self._report(
+                watch, local_error_rate, state.system_status.p95_latency_ms_5m, None, "local"
+            ))
+
+    async def _poll(self, batch: List[ServiceWatch]):
+        try:
+            services = [w.service for w in batch]
+            seen = [self.engine.last_ts(s) for s in services]
+            # Only fetch new points; a service seen for the first time needs the full lookback
+            since = None if None in seen else min(seen)
+
+            async with self._semaphore:
+                self.queries += 1
+                results = await datadog_client.get_services_metrics(services, since)
+
+            if results is None:
+                self.failed_queries += 1
+                for watch in batch:
+                    self._schedule(watch, watch.interval * 2)
+                return
+
+            for service, metrics in results.items():
+                self.engine.ingest(service, ERROR, metrics.get("error_points"))
+                self.engine.ingest(service, LATENCY, metrics.get("latency_points"))
+            signals = self.engine.evaluate(services)
+
+            for watch in batch:
+                watch.polls += 1
+                metrics = results.get(watch.service) or {}
+                signal = signals.get(watch.service)
+                if signal is None:
+                    # No pointlist (e.g. mock data): fall back to the last-point threshold
+                    error_rate = metrics.get("error_rate_5m", 0.0)
+                    p95_latency = metrics.get("p95_latency_ms_5m", 0.0)
+                    anomalous = error_rate > self.threshold
+                else:
+                    error_rate = signal["error_rate"]
+                    p95_latency = signal["p95_latency"]
+                    anomalous = signal["anomalous"]
+                previous = watch.last_value
+                self._adapt(watch, error_rate)
+                if not anomalous:
+                    self._trend(watch, previous, error_rate, p95_latency, metrics.get("top_error"))
+                if anomalous:
+                    await self._report(
+                        watch,
+                        max(error_rate, metrics.get("error_rate_5m", 0.0)),
+                        p95_latency,
+                        metrics.get("top_error"),
+                        f"datadog: {signal['reason']}" if signal else "datadog",
+                    )
+        finally:
+            for watch in batch:
+                watch.in_flight = False
+
+    def _trend(self, watch: ServiceWatch, previous, error_rate, p95_latency, top_error):
+        if self._on_trend is None or self.speculate_at <= 0:
+            return
+        level = error_rate / self.threshold if self.threshold else 0.0
+        rising = previous is not None and error_rate > previous
+        if not watch.trending and rising and level >= self.speculate_at:
+            watch.trending = True
+            logger.info(f"{watch.service} is trending towards an incident ({error_rate:.2f}% error rate)")
+        elif watch.trending and level < self.cancel_at:
+            watch.trending = False
+        else:
+            return
+        self._spawn(self._on_trend(watch.service, watch.trending, error_rate, p95_latency, top_error))
+
+    @staticmethod
+    def _suppressed() -> bool:
+        # If the bug was recently fixed, ignore Datadog for 60s to allow for
+        # metric ingestion latency.
+        time_since_toggle = (datetime.utcnow() - state.last_bug_toggle_time).total_seconds()
+        if state.bug_enabled or time_since_toggle > 60:
+            return False
+        logger.info(f"Suppressing Datadog detection (toggle was {time_since_toggle:.1f}s ago)")
+        return True
+
+    async def _report(self, watch: ServiceWatch, error_rate, p95_latency, top_error, source):
+        try:
+            if state.get_incident_for_service(watch.service):
+                return
+            logger.info(f"Incident detected on {watch.service}: {error_rate:.2f}% error rate (source: {source})")
+            await self._on_incident(watch.service, error_rate, p95_latency, top_error, source)
+            # The incident takes over whatever was prepared while trending
+            watch.trending = False
+            self.engine.reset(watch.service)
+            self._schedule(watch, self.base_interval)
+        except Exception as e:
+            logger.error(f"Error reporting incident for {watch.service}: {e}")
+        finally:
+            watch.in_flight = False
+
+    def stats(self) -> dict:
+        intervals = [w.interval for w in self.watches.values()]
+        return {
+            "services": len(self.watches),
+            "in_flight": sum(1 for w in self.watches.values() if w.in_flight),
+            "queries": self.queries,
+            "failed_queries": self.failed_queries,
+            "trending": sum(1 for w in self.watches.values() if w.trending),
+            "min_interval": min(intervals) if intervals else None,
+            "max_interval": max(intervals) if intervals else None,
+            "anomaly": self.engine.stats(),
+        }
@@ -1,10 +1,12 @@
-import httpx
-import asyncio
 import time
 from typing import Dict, Any, Optional, List
 import logging
 
-from src.common.config import DD_API_KEY, DD_APP_KEY, DD_SITE, DD_SERVICE, DD_ENV
+from src.common.config import (
+    DD_API_KEY, DD_APP_KEY, DD_SITE, DD_SERVICE, DD_ENV, ANOMALY_LOOKBACK_S, ANOMALY_ROLLUP_S,
+)
+from src.common.http import http_clients
+from src.orchestrator.integrations.datadog_metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +22,7 @@ class DatadogClient:
         self.service = DD_SERVICE
         self.env = DD_ENV
         self.base_url = f"https://api.{self.site}"
+        self.rate_limited_until = 0.0
 
     async def submit_metric(self, metric_name: str, value: float, tags: List[str] = None) -> bool:
         """Submit a custom metric to Datadog via the v2 Series API."""
@@ -44,92 +47,139 @@ class DatadogClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/v2/series",
-                    headers={
-                        "DD-API-KEY": self.api_key,
-                        "Content-Type": "application/json",
-                    },
-                    json=payload,
-                )
-
-                if response.status_code in (200, 202):
-                    logger.info(f"Submitted metric {metric_name}={value} to Datadog")
-                    return True
-                else:
-                    logger.error(f"Failed to submit metric: {response.status_code} - {response.text[:200]}")
-                    return False
+            client = http_clients.get("datadog")
+            response = await client.post(
+                f"{self.base_url}/api/v2/series",
+                headers={
+                    "DD-API-KEY": self.api_key,
+                    "Content-Type": "application/json",
+                },
+                json=payload,
+            )
+
+            if response.status_code in (200, 202):
+                logger.info(f"Submitted metric {metric_name}={value} to Datadog")
+                return True
+            else:
+                logger.error(f"Failed to submit metric: {response.status_code} - {response.text[:200]}")
+                return False
 
         except Exception as e:
             logger.error(f"Error submitting metric to Datadog: {e}")
             return False
 
-    async def submit_demo_metrics(self, error_rate: float, p95_latency: float):
-        """Submit both error rate and latency metrics for the demo checkout service."""
+    def submit_demo_metrics(self, error_rate: float, p95_latency: float):
+        """Record error rate and latency for the demo checkout service.
+
+        The values are buffered by the metric aggregator and sent with its
+        next batched flush; nothing is awaited here.
+        """
         tags = [f"service:{self.service}", f"env:{self.env}"]
-        await asyncio.gather(
-            self.submit_metric(CUSTOM_ERROR_RATE_METRIC, error_rate, tags),
-            self.submit_metric(CUSTOM_LATENCY_METRIC, p95_latency, tags),
-        )
+        metrics.gauge(CUSTOM_ERROR_RATE_METRIC, error_rate, tags)
+        metrics.gauge(CUSTOM_LATENCY_METRIC, p95_latency, tags)
 
     async def get_service_metrics(self, service: str = None) -> Dict[str, Any]:
         service = service or self.service
-        
+        results = await self.get_services_metrics([service])
+        if results is None:
+            return self._mock_metrics(service)
+        return results[service]
+
+    async def get_services_metrics(
+        self, services: List[str], since: Optional[float] = None
+    ) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Error rate and p95 latency for several services from one grouped query.
+
+        Each result carries the latest values plus the full ``error_points``
+        and ``latency_points`` pointlists since ``since`` (default: the last
+        ANOMALY_LOOKBACK_S seconds). Returns a result for every requested
+        service, or None when the query failed or was rate limited, so
+        callers can back off.
+        """
         if not self.api_key or self.api_key == "your_datadog_api_key":
             logger.warning("No Datadog API key configured, using mock data")
-            return self._mock_metrics(service)
-        
+            return {service: self._mock_metrics(service) for service in services}
+
+        if time.monotonic() < self.rate_limited_until:
+            return None
+
         now = int(time.time())
-        five_min_ago = now - 300
-        
+        start = int(since) if since else now - ANOMALY_LOOKBACK_S
+        scope = f"env:{self.env} AND ({' OR '.join(f'service:{service}' for service in services)})"
+        rollup = f".rollup(avg, {ANOMALY_ROLLUP_S})"
+
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                # Query our custom error rate metric from Datadog
-                response = await client.get(
-                    f"{self.base_url}/api/v1/query",
-                    headers={
-                        "DD-API-KEY": self.api_key,
-                        "DD-APPLICATION-KEY": self.app_key
-                    },
-                    params={
-                        "query": f"avg:{CUSTOM_ERROR_RATE_METRIC}{{service:{service},env:{self.env}}}",
-                        "from": str(five_min_ago),
-                        "to": str(now)
-                    }
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Datadog API error: {response.status_code} - {response.text[:200]}")
-                    return self._mock_metrics(service)
-                
-                data = response.json()
-                
-                # Parse Datadog timeseries response
-                error_rate = 0.0
-                series = data.get("series", [])
-                if series and series[0].get("pointlist"):
-                    points = series[0]["pointlist"]
-                    # Get the most recent non-null value
-                    for point in reversed(points):
-                        if len(point) >= 2 and point[1] is not None:
-                            error_rate = point[1]
-                            break
-                
-                logger.info(f"Datadog returned error_rate={error_rate} for {service} (series count: {len(series)})")
-                
-                return {
+            client = http_clients.get("datadog")
+            # Both custom metrics in one request, one series per metric and service
+            response = await client.get(
+                f"{self.base_url}/api/v1/query",
+                headers={
+                    "DD-API-KEY": self.api_key,
+                    "DD-APPLICATION-KEY": self.app_key
+                },
+                params={
+                    "query": (
+                        f"avg:{CUSTOM_ERROR_RATE_METRIC}{{{scope}}} by {{service}}{rollup}, "
+                        f"avg:{CUSTOM_LATENCY_METRIC}{{{scope}}} by {{service}}{rollup}"
+                    ),
+                    "from": str(start),
+                    "to": str(now)
+                }
+            )
+
+            if response.status_code == 429:
+                reset = float(response.headers.get("X-RateLimit-Reset", "60"))
+                self.rate_limited_until = time.monotonic() + reset
+                logger.warning(f"Datadog query API rate limited for {reset:.0f}s")
+                return None
+
+            if response.status_code != 200:
+                logger.error(f"Datadog API error: {response.status_code} - {response.text[:200]}")
+                return None
+
+            data = response.json()
+
+            results = {
+                service: {"error_points": [], "latency_points": []} for service in services
+            }
+            series = data.get("series", [])
+            for s in series:
+                result = results.get(self._series_service(s))
+                if result is None:
+                    continue
+                # Datadog timestamps are in milliseconds
+                points = [
+                    [p[0] / 1000, p[1]] for p in (s.get("pointlist") or [])
+                    if len(p) >= 2 and p[1] is not None
+                ]
+                key = "latency_points" if s.get("metric") == CUSTOM_LATENCY_METRIC else "error_points"
+                result[key] = points
+
+            logger.info(f"Datadog returned metrics for {len(services)} service(s) (series count: {len(series)})")
+
+            for service, result in results.items():
+                error_rate = result["error_points"][-1][1] if result["error_points"] else 0.0
+                result.update({
                     "error_rate_5m": error_rate,
-                    "p95_latency_ms_5m": 0.0,
+                    "p95_latency_ms_5m": result["latency_points"][-1][1] if result["latency_points"] else 0.0,
                     "top_error": "Checkout endpoint returning 500" if error_rate > 0.05 else None,
                     "service": service,
                     "env": self.env
-                }
-                
+                })
+            return results
+
         except Exception as e:
             logger.error(f"Error calling Datadog API: {e}")
-            return self._mock_metrics(service)
-    
+            return None
+
+    @staticmethod
+    def _series_service(series: Dict[str, Any]) -> Optional[str]:
+        tags = series.get("tag_set") or series.get("scope", "").split(",")
+        for tag in tags:
+            if tag.startswith("service:"):
+                return tag[len("service:"):]
+        return None
+
     def _mock_metrics(self, service: str) -> Dict[str, Any]:
         return {
             "error_rate_5m": 0.0,
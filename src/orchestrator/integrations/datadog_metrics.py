@@ -0,0 +1,270 @@
+import asyncio
+import gzip
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import logging
+
+from src.common.config import (
+    DD_API_KEY,
+    DD_SITE,
+    DD_METRICS_FLUSH_INTERVAL,
+    DD_METRICS_MAX_CONTEXTS,
+    DD_METRICS_MAX_PENDING_BYTES,
+)
+from src.common.encoding import dumps
+from src.common.http import http_clients
+
+logger = logging.getLogger(__name__)
+
+# Datadog v2 series intake types
+_COUNT = 1
+_GAUGE = 3
+
+# Keep compressed request bodies well under the intake's 500 KB limit
+_MAX_SERIES_PER_PAYLOAD = 1000
+_MAX_SAMPLES = 1024
+_RETRIES = 3
+
+Context = Tuple[str, str, Tuple[str, ...]]
+
+
+class _Distribution:
+    """Running summary of one distribution context within a flush interval."""
+
+    __slots__ = ("count", "total", "low", "high", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.low = float("inf")
+        self.high = float("-inf")
+        self.samples: List[float] = []
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+        if len(self.samples) < _MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            # Reservoir sampling keeps the percentile estimate unbiased
+            i = random.randrange(self.count)
+            if i < _MAX_SAMPLES:
+                self.samples[i] = value
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricAggregator:
+    """Buffers metrics in process and ships them to Datadog in batches.
+
+    Recording a metric only updates an in-memory context keyed by
+    (name, kind, tags):
+
+    - gauges keep the last value of the interval;
+    - counts are summed;
+    - distributions are summarized as ``.avg``, ``.min``, ``.max``,
+      ``.p50``, ``.p95`` gauges plus a ``.count`` count, like DogStatsD
+      histograms.
+
+    Every flush interval the contexts become one gzip-compressed
+    ``/api/v2/series`` request. Failed requests are retried with backoff
+    and then kept for the next flush, up to a memory cap.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = DD_METRICS_FLUSH_INTERVAL,
+        max_contexts: int = DD_METRICS_MAX_CONTEXTS,
+        max_pending_bytes: int = DD_METRICS_MAX_PENDING_BYTES,
+    ):
+        self.api_key = DD_API_KEY
+        self.url = f"https://api.{DD_SITE}/api/v2/series"
+        self.flush_interval = flush_interval
+        self.max_contexts = max_contexts
+        self.max_pending_bytes = max_pending_bytes
+        self._gauges: Dict[Context, float] = {}
+        self._counts: Dict[Context, float] = {}
+        self._distributions: Dict[Context, _Distribution] = {}
+        self._pending: Deque[bytes] = deque()
+        self._pending_bytes = 0
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.dropped_points = 0
+        self.dropped_payloads = 0
+        self.flushed_series = 0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key) and self.api_key != "your_datadog_api_key"
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def _contexts(self) -> int:
+        return len(self._gauges) + len(self._counts) + len(self._distributions)
+
+    def _admit(self, table: dict, context: Context) -> bool:
+        if context in table or self._contexts() < self.max_contexts:
+            self.recorded += 1
+            return True
+        self.dropped_points += 1
+        return False
+
+    def gauge(self, name: str, value: float, tags: Optional[List[str]] = None):
+        context = (name, "g", tuple(sorted(tags or ())))
+        if self._admit(self._gauges, context):
+            self._gauges[context] = value
+
+    def count(self, name: str, value: float = 1, tags: Optional[List[str]] = None):
+        context = (name, "c", tuple(sorted(tags or ())))
+        if self._admit(self._counts, context):
+            self._counts[context] = self._counts.get(context, 0) + value
+
+    def distribution(self, name: str, value: float, tags: Optional[List[str]] = None):
+        context = (name, "d", tuple(sorted(tags or ())))
+        if self._admit(self._distributions, context):
+            summary = self._distributions.get(context)
+            if summary is None:
+                summary = self._distributions[context] = _Distribution()
+            summary.add(value)
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def _drain_series(self, now: int) -> List[dict]:
+        interval = int(self.flush_interval)
+
+        def series(name, kind, tags, value):
+            item = {
+                "metric": name,
+                "type": kind,
+                "points": [{"timestamp": now, "value": value}],
+                "tags": list(tags),
+            }
+            if kind == _COUNT:
+                item["interval"] = interval
+            return item
+
+        out = [series(name, _GAUGE, tags, value) for (name, _, tags), value in self._gauges.items()]
+        out += [series(name, _COUNT, tags, value) for (name, _, tags), value in self._counts.items()]
+        for (name, _, tags), d in self._distributions.items():
+            out += [
+                series(f"{name}.avg", _GAUGE, tags, d.total / d.count),
+                series(f"{name}.min", _GAUGE, tags, d.low),
+                series(f"{name}.max", _GAUGE, tags, d.high),
+                series(f"{name}.p50", _GAUGE, tags, d.percentile(0.50)),
+                series(f"{name}.p95", _GAUGE, tags, d.percentile(0.95)),
+                series(f"{name}.count", _COUNT, tags, d.count),
+            ]
+        self._gauges = {}
+        self._counts = {}
+        self._distributions = {}
+        return out
+
+    def _queue_payload(self, body: bytes):
+        self._pending.append(body)
+        self._pending_bytes += len(body)
+        while self._pending_bytes > self.max_pending_bytes and len(self._pending) > 1:
+            dropped = self._pending.popleft()
+            self._pending_bytes -= len(dropped)
+            self.dropped_payloads += 1
+
+    async def flush(self):
+        series = self._drain_series(int(time.time()))
+        if not self.enabled:
+            return
+        for i in range(0, len(series), _MAX_SERIES_PER_PAYLOAD):
+            chunk = series[i:i + _MAX_SERIES_PER_PAYLOAD]
+            self._queue_payload(gzip.compress(dumps({"series": chunk})))
+            self.flushed_series += len(chunk)
+
+        while self._pending:
+            body = self._pending[0]
+            if not await self._send(body):
+                # Keep it (and everything behind it) for the next flush
+                return
+            self._pending.popleft()
+            self._pending_bytes -= len(body)
+
+    async def _send(self, body: bytes) -> bool:
+        delay = 0.5
+        for attempt in range(_RETRIES):
+            self.requests += 1
+            try:
+                response = await http_clients.get("datadog").post(
+                    self.url,
+                    headers={
+                        "DD-API-KEY": self.api_key,
+                        "Content-Type": "application/json",
+                        "Content-Encoding": "gzip",
+                    },
+                    content=body,
+                )
+                if response.status_code in (200, 202):
+                    return True
+                if response.status_code < 500 and response.status_code != 429:
+                    # Not retryable: the payload itself was rejected
+                    logger.error(f"Datadog rejected metrics: {response.status_code} - {response.text[:200]}")
+                    self.dropped_payloads += 1
+                    return True
+                logger.warning(f"Datadog metrics intake returned {response.status_code}, retrying")
+            except Exception as e:
+                logger.warning(f"Error submitting metrics to Datadog: {e}")
+            self.failures += 1
+            if attempt < _RETRIES - 1:
+                await asyncio.sleep(delay)
+                delay *= 2
+        return False
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Metric flush failed: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            # Final flush; do not hold shutdown hostage to an unreachable intake
+            await asyncio.wait_for(self.flush(), timeout=5.0)
+        except asyncio.TimeoutError:
+            logger.warning("Final metric flush timed out")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "contexts": self._contexts(),
+            "recorded": self.recorded,
+            "flushed_series": self.flushed_series,
+            "requests": self.requests,
+            "failures": self.failures,
+            "pending_payloads": len(self._pending),
+            "pending_bytes": self._pending_bytes,
+            "dropped_points": self.dropped_points,
+            "dropped_payloads": self.dropped_payloads,
+        }
+
+
+metrics = MetricAggregator()
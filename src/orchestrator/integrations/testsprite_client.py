@@ -8,13 +8,15 @@ import logging
 from src.common.models import TestRun, TestRunStatusEnum, TestItem, TestStatusEnum
 from src.orchestrator.state import state
 from src.common.config import DEMO_APP_URL
+from src.common.http import http_clients
 
 logger = logging.getLogger(__name__)
 
 
 class TestSpriteAdapter:
     def __init__(self):
-        self.active_runs = {}
+        # Runs still executing; finished runs are looked up in the run history
+        self.active_runs: Dict[str, TestRun] = {}
 
     async def run_tests(
         self, plan_items: List[Dict[str, Any]], incident_id: str
@@ -92,7 +94,7 @@ class TestSpriteAdapter:
         )
         await state.update_test_run(test_run)
 
-        del self.active_runs[run_id]
+        self.active_runs.pop(run_id, None)
 
     async def _run_single_test(
         self, item: Dict[str, Any], bug_enabled: bool
@@ -104,54 +106,54 @@ class TestSpriteAdapter:
         body_json = target.get("body_json")
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                if method == "GET":
-                    response = await client.get(url, headers=headers)
-                elif method == "POST":
-                    response = await client.post(url, headers=headers, json=body_json)
-                elif method == "PUT":
-                    response = await client.put(url, headers=headers, json=body_json)
-                elif method == "DELETE":
-                    response = await client.delete(url, headers=headers)
-                else:
-                    response = await client.get(url, headers=headers)
-
-                status_code = response.status_code
-
-                if "checkout" in url.lower():
-                    if bug_enabled and method == "POST":
-                        if status_code == 500:
-                            return {
-                                "status": TestStatusEnum.PASS,
-                                "details": f"Bug is enabled, checkout returns 500 as expected (HTTP {status_code})",
-                            }
-                        else:
-                            return {
-                                "status": TestStatusEnum.FAIL,
-                                "details": f"Expected 500 when bug is enabled, got {status_code}",
-                            }
-                    elif not bug_enabled:
-                        if status_code == 200:
-                            return {
-                                "status": TestStatusEnum.PASS,
-                                "details": f"Checkout successful (HTTP {status_code})",
-                            }
-                        else:
-                            return {
-                                "status": TestStatusEnum.FAIL,
-                                "details": f"Expected 200 when bug is disabled, got {status_code}",
-                            }
-
-                if status_code < 400:
-                    return {
-                        "status": TestStatusEnum.PASS,
-                        "details": f"HTTP {status_code} - {response.text[:100] if response.text else 'OK'}",
-                    }
-                else:
-                    return {
-                        "status": TestStatusEnum.FAIL,
-                        "details": f"HTTP {status_code} - {response.text[:100] if response.text else 'Error'}",
-                    }
+            client = http_clients.get("demo")
+            if method == "GET":
+                response = await client.get(url, headers=headers)
+            elif method == "POST":
+                response = await client.post(url, headers=headers, json=body_json)
+            elif method == "PUT":
+                response = await client.put(url, headers=headers, json=body_json)
+            elif method == "DELETE":
+                response = await client.delete(url, headers=headers)
+            else:
+                response = await client.get(url, headers=headers)
+
+            status_code = response.status_code
+
+            if "checkout" in url.lower():
+                if bug_enabled and method == "POST":
+                    if status_code == 500:
+                        return {
+                            "status": TestStatusEnum.PASS,
+                            "details": f"Bug is enabled, checkout returns 500 as expected (HTTP {status_code})",
+                        }
+                    else:
+                        return {
+                            "status": TestStatusEnum.FAIL,
+                            "details": f"Expected 500 when bug is enabled, got {status_code}",
+                        }
+                elif not bug_enabled:
+                    if status_code == 200:
+                        return {
+                            "status": TestStatusEnum.PASS,
+                            "details": f"Checkout successful (HTTP {status_code})",
+                        }
+                    else:
+                        return {
+                            "status": TestStatusEnum.FAIL,
+                            "details": f"Expected 200 when bug is disabled, got {status_code}",
+                        }
+
+            if status_code < 400:
+                return {
+                    "status": TestStatusEnum.PASS,
+                    "details": f"HTTP {status_code} - {response.text[:100] if response.text else 'OK'}",
+                }
+            else:
+                return {
+                    "status": TestStatusEnum.FAIL,
+                    "details": f"HTTP {status_code} - {response.text[:100] if response.text else 'Error'}",
+                }
 
         except httpx.TimeoutException:
             return {"status": TestStatusEnum.FAIL, "details": "Request timed out"}
@@ -0,0 +1,218 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from src.common.config import JOURNAL_PATH, JOURNAL_SNAPSHOT_EVERY
+
+logger = logging.getLogger(__name__)
+
+# (kind, key, data); kind "snapshot" carries a full compacted state dump
+Entry = Tuple[str, str, Optional[bytes]]
+
+_STOP = object()
+
+# How long the writer waits for the event loop to finish encoding a reserved snapshot
+_SNAPSHOT_WAIT_S = 30.0
+
+
+class Journal:
+    """Append-only log of state transitions backed by SQLite in WAL mode.
+
+    ``append`` only puts the entry on a queue. A writer thread takes
+    everything queued, drops superseded entries for the same key, and
+    commits the rest in one transaction (one fsync per batch). A snapshot
+    entry stores the full state and deletes every entry it covers, so
+    recovery reads one snapshot plus a short tail.
+
+    ``begin_snapshot`` reserves the snapshot's place in the log before its
+    data exists, so the state can be encoded in steps off the hot path;
+    the writer waits for it when it reaches that place.
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH, snapshot_every: int = JOURNAL_SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_every = max(1, snapshot_every)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self.since_snapshot = 0
+        self.appended = 0
+        self.committed = 0
+        self.batches = 0
+        self.snapshots = 0
+        self.last_commit_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT NOT NULL, data BLOB)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots (id INTEGER PRIMARY KEY CHECK (id = 1), upto INTEGER, data BLOB)"
+        )
+        conn.commit()
+        return conn
+
+    def load(self) -> Tuple[Optional[bytes], List[Entry]]:
+        """Return the latest snapshot and the entries written after it."""
+        if not self.enabled:
+            return None, []
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT upto, data FROM snapshots WHERE id = 1").fetchone()
+            upto, snapshot = (row[0], row[1]) if row else (0, None)
+            tail = conn.execute(
+                "SELECT kind, key, data FROM entries WHERE id > ? ORDER BY id", (upto,)
+            ).fetchall()
+        finally:
+            conn.close()
+        self.since_snapshot = len(tail)
+        logger.info(f"Journal loaded: snapshot={'yes' if snapshot else 'no'}, tail={len(tail)} entries")
+        return snapshot, tail
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._writer, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, kind: str, key: str, data: Optional[bytes] = None):
+        if not self.enabled:
+            return
+        self._queue.put((kind, key, data))
+        self.appended += 1
+        self.since_snapshot += 1
+
+    def snapshot(self, data: bytes):
+        if not self.enabled:
+            return
+        self._queue.put(("snapshot", "", data))
+        self.since_snapshot = 0
+
+    def begin_snapshot(self) -> "Future[Optional[bytes]]":
+        """Reserve a snapshot at the current position; resolve the future with its data.
+
+        The data must reflect at least every entry appended before this call.
+        Entries appended while it is being built follow the snapshot and are
+        replayed on top of it, so they may already be reflected too. A
+        result of None abandons the snapshot.
+        """
+        pending: "Future[Optional[bytes]]" = Future()
+        if not self.enabled:
+            pending.set_result(None)
+            return pending
+        self._queue.put(("snapshot", "", pending))
+        self.since_snapshot = 0
+        return pending
+
+    @property
+    def snapshot_due(self) -> bool:
+        return self.enabled and self.since_snapshot >= self.snapshot_every
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def _writer(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                    batch = [e for e in batch if e is not _STOP]
+                batch = [e for e in map(self._resolve, batch) if e is not None]
+                if batch:
+                    self._commit(conn, batch)
+        except Exception as e:
+            logger.error(f"Journal writer stopped: {e}")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _resolve(entry: Entry) -> Optional[Entry]:
+        kind, key, data = entry
+        if not isinstance(data, Future):
+            return entry
+        try:
+            data = data.result(timeout=_SNAPSHOT_WAIT_S)
+        except FutureTimeout:
+            logger.warning("Journal snapshot was not encoded in time; skipping it")
+            data = None
+        return (kind, key, data) if data is not None else None
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[Entry]):
+        started = time.perf_counter()
+
+        # Only the latest snapshot in a batch matters, and it covers everything before it
+        last_snapshot = max((i for i, e in enumerate(batch) if e[0] == "snapshot"), default=-1)
+        snapshot = batch[last_snapshot][2] if last_snapshot >= 0 else None
+        before = batch[:last_snapshot] if last_snapshot >= 0 else []
+        after = batch[last_snapshot + 1:]
+
+        # Later entries for the same (kind, key) supersede earlier ones in the batch.
+        # The survivor keeps the first entry's position: replay must still see an
+        # incident before the run that belongs to it.
+        position: Dict[Tuple[str, str], int] = {}
+        rows: List[Entry] = []
+        for kind, key, data in after:
+            i = position.get((kind, key))
+            if i is None:
+                position[(kind, key)] = len(rows)
+                rows.append((kind, key, data))
+            else:
+                rows[i] = (kind, key, data)
+
+        with conn:
+            if snapshot is not None:
+                cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries")
+                upto = cursor.fetchone()[0]
+                conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (id, upto, data) VALUES (1, ?, ?)",
+                    (upto, snapshot),
+                )
+                conn.execute("DELETE FROM entries WHERE id <= ?", (upto,))
+                self.snapshots += 1
+            conn.executemany("INSERT INTO entries (kind, key, data) VALUES (?, ?, ?)", rows)
+
+        self.committed += len(rows) + len(before)
+        self.batches += 1
+        self.last_commit_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "appended": self.appended,
+            "committed": self.committed,
+            "batches": self.batches,
+            "snapshots": self.snapshots,
+            "since_snapshot": self.since_snapshot,
+            "last_commit_ms": round(self.last_commit_ms, 3),
+        }
+
+
+journal = Journal()
@@ -0,0 +1,323 @@
+import asyncio
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+from src.common.config import (
+    LLM_CONCURRENCY,
+    LLM_MAX_QUEUE_PLAN,
+    LLM_MAX_QUEUE_COPILOT,
+    LLM_MAX_QUEUE_SPECULATIVE,
+)
+from src.orchestrator.integrations.datadog_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priority classes; lower runs first
+PLAN = 0
+COPILOT = 1
+SPECULATIVE = 2
+CLASS_NAMES = {PLAN: "plan", COPILOT: "copilot", SPECULATIVE: "speculative"}
+
+
+class LLMOverloaded(Exception):
+    """The scheduler refused a job: its queue is full (429) or it is not running (503)."""
+
+    def __init__(self, message: str, status_code: int = 429, retry_after: int = 1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMCancelled(Exception):
+    """The incident a job was for went away before its result was needed."""
+
+
+class _Job:
+    """One unit of work; ``future`` is internal, callers each hold a future in ``waiters``."""
+
+    __slots__ = ("fn", "priority", "incident_id", "key", "future", "waiters", "enqueued_at", "started_at")
+
+    def __init__(self, fn, priority, incident_id, key, future):
+        self.fn = fn
+        self.priority = priority
+        self.incident_id = incident_id
+        self.key = key
+        self.future = future
+        self.waiters: Set[asyncio.Future] = set()
+        self.enqueued_at = time.monotonic()
+        self.started_at = 0.0
+
+
+class _ClassStats:
+    __slots__ = (
+        "submitted", "deduped", "rejected", "cancelled", "promoted", "started", "completed", "failed",
+        "wait_ms", "max_wait_ms", "run_ms", "max_run_ms",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+
+class LLMScheduler:
+    """Runs blocking LLM agent calls on a bounded thread pool, by priority.
+
+    Jobs wait in a priority queue (plan generation before copilot
+    questions, speculative plans last, FIFO within a class) and at most
+    ``concurrency`` run at once. With more than one worker, speculative
+    jobs never take the last free one, so a real incident's plan can
+    always start. Each class has its own queue limit; a full queue rejects new
+    jobs with ``LLMOverloaded`` instead of letting latency grow without
+    bound. A job submitted with a ``key`` that is already queued or
+    running shares that job's result. Every caller gets its own future:
+    cancelling it detaches only that caller, and the job itself is
+    cancelled once no caller is left waiting.
+
+    ``cancel_incident`` fails every job for a cleared incident with
+    ``LLMCancelled``. Queued jobs never start; a running job cannot be
+    interrupted inside its thread, so its result is discarded when it
+    finishes.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = LLM_CONCURRENCY,
+        max_queue: Optional[Dict[int, int]] = None,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue or {
+            PLAN: LLM_MAX_QUEUE_PLAN,
+            COPILOT: LLM_MAX_QUEUE_COPILOT,
+            SPECULATIVE: LLM_MAX_QUEUE_SPECULATIVE,
+        }
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._heap: List[Tuple[int, int, _Job]] = []
+        self._order = itertools.count()
+        self._running: Set[_Job] = set()
+        self._by_key: Dict[str, _Job] = {}
+        self._stats = {priority: _ClassStats() for priority in CLASS_NAMES}
+        self.accepting = True
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    def _depth(self, priority: int) -> int:
+        return sum(1 for _, _, job in self._heap if job.priority == priority and not job.future.done())
+
+    def _retry_after(self, priority: int) -> int:
+        stats = self._stats[priority]
+        finished = stats.completed + stats.failed
+        avg_run_s = stats.run_ms / finished / 1000 if finished else 1.0
+        return max(1, int(avg_run_s * (self._depth(priority) + 1) / self.concurrency))
+
+    def check(self, priority: int):
+        """Raise ``LLMOverloaded`` if a job of this class would be rejected now."""
+        name = CLASS_NAMES[priority]
+        if not self.accepting:
+            raise LLMOverloaded("LLM scheduler is shutting down", status_code=503)
+        if self._depth(priority) >= self.max_queue[priority]:
+            raise LLMOverloaded(
+                f"LLM {name} queue is full ({self.max_queue[priority]} waiting)",
+                retry_after=self._retry_after(priority),
+            )
+
+    def submit(
+        self,
+        fn: Callable[[], Any],
+        priority: int,
+        incident_id: Optional[str] = None,
+        key: Optional[str] = None,
+    ) -> asyncio.Future:
+        """Queue ``fn`` to run in a worker thread; await the returned future for its result."""
+        stats = self._stats[priority]
+        existing = self._by_key.get(key) if key else None
+        if existing is not None and not existing.future.done():
+            stats.deduped += 1
+            return self._wait(existing)
+
+        try:
+            self.check(priority)
+        except LLMOverloaded:
+            stats.rejected += 1
+            metrics.count("fixloop.llm.rejected", 1, [f"class:{CLASS_NAMES[priority]}"])
+            raise
+
+        job = _Job(fn, priority, incident_id, key, asyncio.get_event_loop().create_future())
+        job.future.add_done_callback(partial(self._settle, job))
+        heapq.heappush(self._heap, (priority, next(self._order), job))
+        if key:
+            self._by_key[key] = job
+        stats.submitted += 1
+        waiter = self._wait(job)
+        self._dispatch()
+        return waiter
+
+    def _wait(self, job: _Job) -> asyncio.Future:
+        waiter = job.future.get_loop().create_future()
+        job.waiters.add(waiter)
+        waiter.add_done_callback(partial(self._detach, job))
+        return waiter
+
+    def _detach(self, job: _Job, waiter: asyncio.Future):
+        job.waiters.discard(waiter)
+        if waiter.cancelled() and not job.waiters and not job.future.done():
+            # The last caller gave up; a queued job is skipped, a running one's result dropped
+            job.future.cancel()
+            self._forget(job)
+            self._dispatch()
+
+    @staticmethod
+    def _settle(job: _Job, future: asyncio.Future):
+        cancelled = future.cancelled()
+        error = None if cancelled else future.exception()
+        for waiter in list(job.waiters):
+            if waiter.done():
+                continue
+            if cancelled:
+                waiter.cancel()
+            elif error is not None:
+                waiter.set_exception(error)
+                if isinstance(error, LLMCancelled):
+                    # Nobody may be awaiting it any more
+                    waiter.exception()
+            else:
+                waiter.set_result(future.result())
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def _dispatch(self):
+        while self._heap and len(self._running) < self.concurrency:
+            priority, _, job = self._heap[0]
+            if job.future.done():
+                # Cancelled by its caller or by cancel_incident while queued
+                heapq.heappop(self._heap)
+                self._forget(job)
+                continue
+            if priority == SPECULATIVE and len(self._running) >= max(1, self.concurrency - 1):
+                # Only speculative jobs are left; keep a worker free for real ones
+                break
+            heapq.heappop(self._heap)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="llm")
+
+            job.started_at = time.monotonic()
+            wait_ms = (job.started_at - job.enqueued_at) * 1000
+            stats = self._stats[job.priority]
+            stats.started += 1
+            stats.wait_ms += wait_ms
+            stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+            metrics.distribution("fixloop.llm.queue_wait_ms", wait_ms, [f"class:{CLASS_NAMES[job.priority]}"])
+
+            self._running.add(job)
+            run = asyncio.get_event_loop().run_in_executor(self._executor, job.fn)
+            run.add_done_callback(partial(self._finish, job))
+
+    def _finish(self, job: _Job, run: asyncio.Future):
+        self._running.discard(job)
+        self._forget(job)
+        run_ms = (time.monotonic() - job.started_at) * 1000
+        stats = self._stats[job.priority]
+        stats.run_ms += run_ms
+        stats.max_run_ms = max(stats.max_run_ms, run_ms)
+        metrics.distribution("fixloop.llm.run_ms", run_ms, [f"class:{CLASS_NAMES[job.priority]}"])
+
+        error = run.exception() if not run.cancelled() else asyncio.CancelledError()
+        if error is None:
+            stats.completed += 1
+        else:
+            stats.failed += 1
+        if not job.future.done():
+            if error is None:
+                job.future.set_result(run.result())
+            elif isinstance(error, asyncio.CancelledError):
+                job.future.cancel()
+            else:
+                job.future.set_exception(error)
+        self._dispatch()
+
+    def promote(self, key: str, priority: int) -> bool:
+        """Move the queued job under ``key`` to a more urgent class; False if it is not waiting."""
+        job = self._by_key.get(key)
+        if job is None or job.future.done() or job.started_at or priority >= job.priority:
+            return False
+        self._stats[job.priority].promoted += 1
+        job.priority = priority
+        self._heap = [(queued.priority, order, queued) for _, order, queued in self._heap]
+        heapq.heapify(self._heap)
+        self._dispatch()
+        return True
+
+    def _forget(self, job: _Job):
+        if job.key and self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+
+    # ------------------------------------------------------------------
+    # Cancellation and lifecycle
+    # ------------------------------------------------------------------
+
+    def cancel_incident(self, incident_id: str) -> int:
+        """Fail every queued or running job for ``incident_id``; returns how many."""
+        cancelled = 0
+        jobs = [job for _, _, job in self._heap] + list(self._running)
+        for job in jobs:
+            if job.incident_id == incident_id and not job.future.done():
+                job.future.set_exception(LLMCancelled(f"Incident {incident_id} was cleared"))
+                self._forget(job)
+                self._stats[job.priority].cancelled += 1
+                cancelled += 1
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} LLM job(s) for {incident_id}")
+        return cancelled
+
+    def start(self):
+        self.accepting = True
+
+    async def stop(self):
+        self.accepting = False
+        for _, _, job in self._heap:
+            if not job.future.done():
+                job.future.cancel()
+        self._heap.clear()
+        self._by_key.clear()
+        if self._executor is not None:
+            # Agent threads cannot be interrupted; do not wait for them
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        out: Dict[str, Any] = {
+            "concurrency": self.concurrency,
+            "running": len(self._running),
+            "accepting": self.accepting,
+        }
+        for priority, name in CLASS_NAMES.items():
+            s = self._stats[priority]
+            finished = s.completed + s.failed
+            out[name] = {
+                "queued": self._depth(priority),
+                "max_queue": self.max_queue[priority],
+                "running": sum(1 for job in self._running if job.priority == priority),
+                "submitted": s.submitted,
+                "deduped": s.deduped,
+                "rejected": s.rejected,
+                "cancelled": s.cancelled,
+                "promoted": s.promoted,
+                "completed": s.completed,
+                "failed": s.failed,
+                "avg_wait_ms": round(s.wait_ms / s.started, 1) if s.started else 0.0,
+                "max_wait_ms": round(s.max_wait_ms, 1),
+                "avg_run_ms": round(s.run_ms / finished, 1) if finished else 0.0,
+                "max_run_ms": round(s.max_run_ms, 1),
+            }
+        return out
+
+
+llm_scheduler = LLMScheduler()
@@ -1,12 +1,24 @@
+import asyncio
 import os
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.orchestrator.routes import router as api_router
 from src.orchestrator.ws_routes import router as ws_router
 from src.orchestrator.agent_service import agent_service
-from src.common.config import ORCH_PORT
+from src.orchestrator.outbox import outbox
+from src.orchestrator.journal import journal
+from src.orchestrator.run_history import run_history
+from src.orchestrator.plan_cache import plan_cache
+from src.orchestrator.llm_scheduler import llm_scheduler
+from src.orchestrator.integrations.strands_agent import agent_pool
+from src.orchestrator.state import state
+from src.orchestrator.ownership import state_owner
+from src.common.config import ORCH_PORT, WS_BROADCAST_URL
+from src.common.ws import ws_manager
+from src.common.http import http_clients
+from src.orchestrator.integrations.datadog_metrics import metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,15 +36,56 @@ app.add_middleware(
 app.include_router(api_router)
 app.include_router(ws_router)
 
+# Relays hold no incident state, so the stateful worker answers these for them
+_STATEFUL_PREFIXES = ("/api/", "/internal/datadog/")
+
+@app.middleware("http")
+async def forward_stateful_on_relay(request: Request, call_next):
+    if not state_owner.owner and request.url.path.startswith(_STATEFUL_PREFIXES):
+        return await state_owner.forward(request)
+    return await call_next(request)
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting orchestrator API...")
+    if not await asyncio.to_thread(state_owner.acquire):
+        if not WS_BROADCAST_URL:
+            logger.warning("Relay started without WS_BROADCAST_URL; it will not receive any events")
+        await ws_manager.start(relay=True)
+        return
+    await asyncio.to_thread(run_history.start)
+    await asyncio.to_thread(plan_cache.start)
+    await state.restore(*await asyncio.to_thread(journal.load))
+    journal.start()
+    http_clients.start()
+    metrics.start()
+    ws_manager.on_peer_joined = lambda: ws_manager.publish_to_peers(state.snapshot_events())
+    await ws_manager.start()
+    outbox.start()
+    llm_scheduler.start()
+    agent_pool.start()
     await agent_service.start()
+    await state_owner.serve_private(app)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down orchestrator API...")
+    if not state_owner.owner:
+        await ws_manager.stop()
+        await http_clients.aclose()
+        return
+    await state_owner.stop_private()
     await agent_service.stop()
+    await llm_scheduler.stop()
+    await agent_pool.stop()
+    await plan_cache.stop()
+    await outbox.stop()
+    await metrics.stop()
+    await ws_manager.stop()
+    await http_clients.aclose()
+    journal.close()
+    run_history.close()
+    state_owner.release()
 
 @app.get("/")
 async def root():
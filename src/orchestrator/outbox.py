@@ -0,0 +1,116 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Set, Tuple
+import logging
+
+from src.common.ws import ws_manager
+
+logger = logging.getLogger(__name__)
+
+Effect = Callable[[], Awaitable[None]]
+
+
+class Outbox:
+    """Side effects of state transitions, run after the transition has committed.
+
+    State methods mutate memory, append what should happen as a result
+    (WS frames, metric submissions, ...) and return immediately. A single
+    dispatcher task drains the outbox:
+
+    - ordered effects (WS broadcasts) run one after another, in append order;
+    - unordered effects (outbound HTTP) are spawned as tasks, so a slow
+      upstream never delays the ordered lane.
+    """
+
+    def __init__(self, max_inflight: int = 32):
+        self._queue: Deque[Tuple[bool, Effect]] = deque()
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self._limit = max_inflight
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.dispatched = 0
+        self.failed = 0
+
+    def append(self, effect: Effect, ordered: bool = True):
+        self._queue.append((ordered, effect))
+        self._ensure_running()
+        self._ready.set()
+
+    def broadcast(self, event):
+        self.append(lambda: ws_manager.broadcast(event))
+
+    def _ensure_running(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop yet; start() will pick up whatever was queued
+            return
+        self.start()
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._ready = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self._limit)
+        if self._queue:
+            self._ready.set()
+        self._task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.drain()
+
+    async def drain(self):
+        """Run everything still queued, then wait for in-flight unordered effects."""
+        while self._queue:
+            ordered, effect = self._queue.popleft()
+            await self._run(effect)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def _dispatch_loop(self):
+        while True:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            ordered, effect = self._queue.popleft()
+            if ordered:
+                await self._run(effect)
+            else:
+                await self._semaphore.acquire()
+                task = asyncio.create_task(self._run(effect))
+                self._inflight.add(task)
+                task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._inflight.discard(task)
+        self._semaphore.release()
+
+    async def _run(self, effect: Effect):
+        try:
+            await effect()
+            self.dispatched += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Outbox effect failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._queue),
+            "inflight": len(self._inflight),
+            "dispatched": self.dispatched,
+            "failed": self.failed,
+        }
+
+
+outbox = Outbox()
@@ -0,0 +1,147 @@
+import asyncio
+import contextlib
+import os
+import logging
+from typing import Optional
+
+import httpx
+import uvicorn
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from src.common.config import STATE_LOCK_PATH, STATE_OWNER_SOCKET
+from src.common.http import http_clients
+
+logger = logging.getLogger(__name__)
+
+# Hop-by-hop, length and server headers are set again on each leg of a forwarded call
+_SKIP_HEADERS = frozenset((
+    "host", "connection", "keep-alive", "content-length", "transfer-encoding", "content-encoding", "date", "server",
+))
+
+
+class _PrivateServer(uvicorn.Server):
+    """A second listener inside the worker; the main server owns the signal handlers."""
+
+    def capture_signals(self):
+        return contextlib.nullcontext()
+
+
+class StateOwnership:
+    """Elects the one process that owns incident state.
+
+    Incident state, the journal, run history, the plan cache and detection
+    live in a single process. Running them in several would open duplicate
+    incidents and give each REST caller a different answer, so the first
+    process to take an exclusive lock on ``path`` becomes the stateful
+    worker and every other process sharing the lock becomes a relay that
+    only fans out WebSocket events received over the broadcast bus.
+
+    Relays may share a port with the stateful worker (``uvicorn --workers
+    N``), so they ``forward`` stateful calls to it over ``socket_path``, a
+    unix socket only the owner listens on (``serve_private``).
+
+    The lock is released by the OS when the owner exits; a relay does not
+    take over a running deployment, it has to be restarted. An empty path
+    disables the check (single-process deployments).
+    """
+
+    def __init__(self, path: str = STATE_LOCK_PATH, socket_path: str = STATE_OWNER_SOCKET):
+        self.path = path
+        self.socket_path = socket_path
+        self.owner = False
+        self._fd: Optional[int] = None
+        self._server: Optional[_PrivateServer] = None
+        self._server_task: Optional[asyncio.Task] = None
+        self.forwarded = 0
+        self.forward_errors = 0
+
+    def acquire(self) -> bool:
+        if self.owner:
+            return True
+        if not self.path or fcntl is None:
+            self.owner = True
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            logger.warning(f"State lock {self.path} is held by another process; running as a relay")
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        self.owner = True
+        return True
+
+    async def serve_private(self, app):
+        """Listen for calls forwarded by relays. Owner only; a no-op without a socket path."""
+        # Without a lock there are no relays to serve
+        if not self.path or not self.socket_path or not hasattr(asyncio.get_event_loop(), "create_unix_server"):
+            return
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        config = uvicorn.Config(app, uds=self.socket_path, lifespan="off", log_config=None, access_log=False)
+        self._server = _PrivateServer(config)
+        self._server_task = asyncio.create_task(self._server.serve())
+        logger.info(f"Accepting forwarded API calls on {self.socket_path}")
+
+    async def stop_private(self):
+        if self._server is None:
+            return
+        self._server.should_exit = True
+        await self._server_task
+        self._server = self._server_task = None
+
+    async def forward(self, request: Request) -> Response:
+        """Replay a relay's stateful call against the stateful worker and return its answer."""
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in _SKIP_HEADERS}
+        url = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        try:
+            upstream = await http_clients.get("owner").request(
+                request.method, f"http://owner{url}", content=await request.body(), headers=headers
+            )
+        except httpx.HTTPError as e:
+            self.forward_errors += 1
+            logger.warning(f"Could not forward {request.method} {request.url.path} to the stateful worker: {e}")
+            return JSONResponse(
+                status_code=502,
+                content={"detail": "The stateful orchestrator worker is not reachable"},
+                headers={"Retry-After": "1"},
+            )
+        self.forwarded += 1
+        return Response(
+            content=upstream.content,
+            status_code=upstream.status_code,
+            headers={k: v for k, v in upstream.headers.items() if k.lower() not in _SKIP_HEADERS},
+        )
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self.owner = False
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "role": "stateful" if self.owner else "relay",
+            "pid": os.getpid(),
+            "socket": self.socket_path,
+            "forwarded": self.forwarded,
+            "forward_errors": self.forward_errors,
+        }
+
+
+state_owner = StateOwnership()
@@ -0,0 +1,287 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+from pydantic import ValidationError
+
+from src.common.models import PlanItem
+from src.common.encoding import dumps
+from src.common.config import (
+    DD_SERVICE,
+    DEMO_APP_URL,
+    PLAN_CACHE_PATH,
+    PLAN_CACHE_MAX_ENTRIES,
+    PLAN_CACHE_TTL_S,
+    PLAN_CACHE_MAX_STALE_S,
+)
+from src.orchestrator.correlation import normalize_error, signal_shape
+
+logger = logging.getLogger(__name__)
+
+PlanItems = List[Dict[str, Any]]
+OnItems = Callable[[PlanItems], None]
+Generator = Callable[[Dict[str, Any], Optional[OnItems]], Awaitable[PlanItems]]
+
+_STOP = object()
+
+
+def plan_key(context: Dict[str, Any]) -> str:
+    """Cache key for an incident context: service, error signature and signal bands."""
+    key = "|".join((
+        DEMO_APP_URL,
+        context.get("service") or DD_SERVICE,
+        normalize_error(context.get("top_error")),
+        signal_shape(context.get("error_rate") or 0.0, context.get("p95_latency") or 0.0),
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def validate_plan(plan: Any) -> Optional[PlanItems]:
+    """The plan as plain dicts if every item is a valid PlanItem, else None."""
+    if not isinstance(plan, list) or not plan:
+        return None
+    try:
+        return [PlanItem.model_validate(item).model_dump(mode="json") for item in plan]
+    except (ValidationError, TypeError):
+        return None
+
+
+class _Entry:
+    __slots__ = ("plan", "stored_at")
+
+    def __init__(self, plan: PlanItems, stored_at: float):
+        self.plan = plan
+        self.stored_at = stored_at
+
+
+class PlanCache:
+    """Recovery plans from earlier incidents, reused for look-alike ones.
+
+    A fresh entry (younger than ``ttl_s``) is served as is. A stale one,
+    up to ``max_stale_s`` past its TTL, is served immediately while a
+    single background task regenerates it (stale-while-revalidate). Older
+    entries and misses are generated inline. Only plans that validate as
+    ``PlanItem`` lists are stored, so a failed generation never poisons
+    the cache; a generated plan that does not validate raises instead of
+    being served. Entries are kept in LRU order and written through to
+    SQLite by a writer thread, as with the journal, so they survive a
+    restart without blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str = PLAN_CACHE_PATH,
+        max_entries: int = PLAN_CACHE_MAX_ENTRIES,
+        ttl_s: float = PLAN_CACHE_TTL_S,
+        max_stale_s: float = PLAN_CACHE_MAX_STALE_S,
+    ):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.max_stale_s = max_stale_s
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.generate_ms = 0.0
+        self.hit_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, data BLOB NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    def _writer(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                    batch = [row for row in batch if row is not _STOP]
+                if not batch:
+                    continue
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO plans (key, stored_at, data) VALUES (?, ?, ?)",
+                            [(key, entry.stored_at, dumps(entry.plan)) for key, entry in batch],
+                        )
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not persist {len(batch)} cached plan(s): {e}")
+        except Exception as e:
+            logger.error(f"Plan cache writer stopped: {e}")
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+
+    def _store(self, key: str, plan: PlanItems):
+        entry = _Entry(plan, time.time())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self._thread is not None:
+            # Entries are never mutated after this, so the writer may encode them later
+            self._queue.put((key, entry))
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.stored_at > self.ttl_s + self.max_stale_s:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def _generate(
+        self, key: str, context: Dict[str, Any], generate: Generator, on_items: Optional[OnItems] = None
+    ) -> PlanItems:
+        started = time.perf_counter()
+        plan = await generate(context, on_items)
+        self.generate_ms += (time.perf_counter() - started) * 1000
+        valid = validate_plan(plan)
+        if valid is None:
+            self.failures += 1
+            raise ValueError(f"Generated plan for {key} did not validate")
+        self._store(key, valid)
+        return copy.deepcopy(valid)
+
+    async def _refresh(self, key: str, context: Dict[str, Any], generate: Generator):
+        try:
+            self.refreshes += 1
+            await self._generate(key, context, generate)
+            logger.info(f"Refreshed cached plan {key}")
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Background plan refresh for {key} failed: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get_or_generate(
+        self, context: Dict[str, Any], generate: Generator, on_items: Optional[OnItems] = None
+    ) -> PlanItems:
+        """The cached plan for ``context``, or a new one from ``generate``.
+
+        ``on_items`` is handed to an inline generation so it can report the
+        plan as it streams in; background refreshes never get it. Exceptions
+        from ``generate`` on a miss propagate to the caller.
+        """
+        started = time.perf_counter()
+        key = plan_key(context)
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            return await self._generate(key, context, generate, on_items)
+
+        if time.time() - entry.stored_at > self.ttl_s:
+            self.stale_hits += 1
+            if key not in self._refreshing:
+                # The refresh outlives this incident; do not tie it to its id
+                context = {k: v for k, v in context.items() if k != "incident_id"}
+                self._refreshing[key] = asyncio.create_task(self._refresh(key, context, generate))
+        else:
+            self.hits += 1
+        plan = copy.deepcopy(entry.plan)
+        self.hit_ms += (time.perf_counter() - started) * 1000
+        logger.info(f"Serving cached plan {key} ({len(plan)} items)")
+        return plan
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Load the most recent entries that are still servable from disk and start the writer.
+
+        Blocking, so call it from a worker thread.
+        """
+        if not self.path or self._thread is not None:
+            return
+        conn = self._connect()
+        try:
+            cutoff = time.time() - self.ttl_s - self.max_stale_s
+            with conn:
+                conn.execute("DELETE FROM plans WHERE stored_at < ?", (cutoff,))
+            rows = conn.execute(
+                "SELECT key, stored_at, data FROM plans ORDER BY stored_at DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+        finally:
+            conn.close()
+        for key, stored_at, data in reversed(rows):
+            plan = validate_plan(json.loads(data))
+            if plan is not None:
+                self._entries[key] = _Entry(plan, stored_at)
+        if self._entries:
+            logger.info(f"Loaded {len(self._entries)} cached plan(s)")
+        self._thread = threading.Thread(target=self._writer, name="plan-cache-writer", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        self._refreshing.clear()
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            await asyncio.to_thread(self._thread.join, 10)
+            self._thread = None
+
+    def stats(self) -> dict:
+        generated = self.misses + self.refreshes
+        avg_generate_ms = self.generate_ms / generated if generated else 0.0
+        served = self.hits + self.stale_hits
+        avg_hit_ms = self.hit_ms / served if served else 0.0
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshing": len(self._refreshing),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "avg_generate_ms": round(avg_generate_ms, 1),
+            "avg_hit_ms": round(avg_hit_ms, 3),
+            # Time to first plan saved by serving from cache instead of generating
+            "saved_ms": round(served * max(0.0, avg_generate_ms - avg_hit_ms), 1),
+        }
+
+
+plan_cache = PlanCache()
@@ -0,0 +1,221 @@
+import asyncio
+import functools
+import time
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from src.common.config import DEMO_APP_URL, MINIMAX_API_KEY, PLAN_DEADLINE_S, PLAN_HEDGE_DELAY_S
+from src.orchestrator.plan_cache import plan_cache, validate_plan, OnItems, PlanItems
+from src.orchestrator.integrations.minimax_client import minimax_client
+from src.orchestrator.integrations.strands_agent import strands_agent_client
+from src.orchestrator.integrations.datadog_metrics import metrics
+from src.orchestrator.llm_scheduler import PLAN, SPECULATIVE
+
+logger = logging.getLogger(__name__)
+
+DIRECT = "direct"
+AGENT = "agent"
+
+
+def fallback_plan() -> PlanItems:
+    """The static demo plan, served when no generated plan is available in time."""
+    return [
+        {
+            "test_id": "TEST-001",
+            "name": "Health Check",
+            "type": "API",
+            "priority": 1,
+            "what_it_checks": "Service health endpoint returns OK",
+            "target": {"method": "GET", "url": f"{DEMO_APP_URL}/health", "headers": {}, "body_json": None},
+            "pass_criteria": "Returns 200 OK with status: ok",
+        },
+        {
+            "test_id": "TEST-002",
+            "name": "Catalog Endpoint",
+            "type": "API",
+            "priority": 2,
+            "what_it_checks": "Product catalog endpoint works",
+            "target": {"method": "GET", "url": f"{DEMO_APP_URL}/catalog", "headers": {}, "body_json": None},
+            "pass_criteria": "Returns 200 OK with products array",
+        },
+        {
+            "test_id": "TEST-003",
+            "name": "Checkout Success",
+            "type": "API",
+            "priority": 3,
+            "what_it_checks": "Checkout endpoint succeeds when bug is disabled",
+            "target": {"method": "POST", "url": f"{DEMO_APP_URL}/checkout", "headers": {}, "body_json": {"items": [{"id": "1", "price": 19.99}]}},
+            "pass_criteria": "Returns 200 OK with order_id",
+        },
+        {
+            "test_id": "TEST-004",
+            "name": "Empty Cart Handling",
+            "type": "API",
+            "priority": 4,
+            "what_it_checks": "Checkout handles empty cart gracefully",
+            "target": {"method": "POST", "url": f"{DEMO_APP_URL}/checkout", "headers": {}, "body_json": {"items": []}},
+            "pass_criteria": "Returns 200 OK even with empty items",
+        },
+        {
+            "test_id": "TEST-005",
+            "name": "Checkout Failure Mode",
+            "type": "API",
+            "priority": 5,
+            "what_it_checks": "Checkout returns 500 when bug is enabled",
+            "target": {"method": "POST", "url": f"{DEMO_APP_URL}/checkout", "headers": {}, "body_json": {"items": [{"id": "1", "price": 19.99}]}},
+            "pass_criteria": "Returns 500 when bug is enabled, 200 when bug is disabled",
+        },
+    ]
+
+
+class HedgedPlanGenerator:
+    """Plan generation with a hard deadline, hedged across both plan paths.
+
+    The direct MiniMax completion starts first. If it has not produced a
+    valid plan after ``hedge_delay_s`` (or fails sooner), the Strands
+    agent path starts too, and the first schema-valid plan from either
+    wins; the other is cancelled. Only the path that streams items first
+    reports them through ``on_items``, unless it fails.
+
+    If nothing has won by ``deadline_s`` (<= 0 waits indefinitely),
+    ``generate`` returns the static fallback plan together with the still
+    running generation, so the caller can swap in the real plan when it
+    arrives. Cached plans are served through ``plan_cache`` as before;
+    only real plans are cached.
+    """
+
+    def __init__(self, deadline_s: float = PLAN_DEADLINE_S, hedge_delay_s: float = PLAN_HEDGE_DELAY_S):
+        self.deadline_s = deadline_s
+        self.hedge_delay_s = max(0.0, hedge_delay_s)
+        self.wins = {DIRECT: 0, AGENT: 0}
+        self.path_failures = {DIRECT: 0, AGENT: 0}
+        self.hedged = 0
+        self.deadline_fallbacks = 0
+        self.failures = 0
+
+    async def generate(
+        self, context: Dict[str, Any], on_items: Optional[OnItems] = None
+    ) -> Tuple[PlanItems, Optional["asyncio.Task[PlanItems]"]]:
+        """The plan to publish now, and the generation to await for an upgrade, if any.
+
+        Never raises for a failed generation; the fallback plan is returned instead.
+        """
+        if not MINIMAX_API_KEY:
+            logger.warning("No MINIMAX_API_KEY — using fallback plan")
+            return fallback_plan(), None
+
+        live = True
+
+        def report(items: PlanItems):
+            if live and on_items is not None:
+                on_items(items)
+
+        task = asyncio.create_task(plan_cache.get_or_generate(context, self._race, report))
+        plan, upgrade = await self.adopt(task)
+        # Partial items after the deadline would overwrite the fallback plan
+        live = False
+        return plan, upgrade
+
+    async def adopt(
+        self, task: "asyncio.Task[PlanItems]"
+    ) -> Tuple[PlanItems, Optional["asyncio.Task[PlanItems]"]]:
+        """Apply the deadline and fallback rules to a generation that is already running."""
+        started = time.monotonic()
+        try:
+            done, _ = await asyncio.wait({task}, timeout=self.deadline_s if self.deadline_s > 0 else None)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if task in done:
+            metrics.distribution("fixloop.plan.generate_ms", (time.monotonic() - started) * 1000)
+            try:
+                return task.result(), None
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Plan generation failed: {e}")
+                return fallback_plan(), None
+
+        self.deadline_fallbacks += 1
+        logger.warning(f"No plan after {self.deadline_s:g}s; serving the fallback plan until one arrives")
+        return fallback_plan(), task
+
+    def speculate(self, context: Dict[str, Any], key: str) -> "asyncio.Task[PlanItems]":
+        """Generate a plan no incident needs yet; uncached, on the agent path only, at SPECULATIVE priority.
+
+        The direct path does not go through the LLM scheduler, so it would
+        compete with live incidents. ``key`` names the scheduler job, so it
+        can be promoted once an incident claims the plan.
+        """
+        return asyncio.create_task(self._race(context, None, SPECULATIVE, key))
+
+    async def _race(
+        self,
+        context: Dict[str, Any],
+        on_items: Optional[OnItems],
+        priority: int = PLAN,
+        key: Optional[str] = None,
+    ) -> PlanItems:
+        pending: Dict[asyncio.Task, str] = {}
+        owner = None
+
+        def reporter(name: str) -> OnItems:
+            def report(items: PlanItems):
+                nonlocal owner
+                if owner is None:
+                    owner = name
+                if owner == name and on_items is not None:
+                    on_items(items)
+            return report
+
+        def launch(name: str, path):
+            pending[asyncio.create_task(path(context, reporter(name)))] = name
+
+        agent = functools.partial(strands_agent_client.run_plan, priority=priority, key=key)
+        if priority == SPECULATIVE:
+            # The direct path bypasses the LLM scheduler; speculative work must wait behind live work
+            hedged = True
+            launch(AGENT, agent)
+        else:
+            hedged = False
+            launch(DIRECT, minimax_client.stream_plan)
+        try:
+            while True:
+                timeout = None if hedged else self.hedge_delay_s
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = pending.pop(task)
+                    error = task.exception()
+                    plan = validate_plan(task.result()) if error is None else None
+                    if plan is not None:
+                        self.wins[name] += 1
+                        logger.info(f"{name} path won plan generation ({len(plan)} items)")
+                        return plan
+                    self.path_failures[name] += 1
+                    logger.warning(f"{name} plan path failed: {error or 'plan did not validate'}")
+                    if owner == name:
+                        owner = None
+                if not hedged:
+                    hedged = True
+                    self.hedged += 1
+                    launch(AGENT, agent)
+                elif not pending:
+                    raise RuntimeError("Both plan paths failed")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "deadline_s": self.deadline_s,
+            "hedge_delay_s": self.hedge_delay_s,
+            "direct_wins": self.wins[DIRECT],
+            "agent_wins": self.wins[AGENT],
+            "direct_failures": self.path_failures[DIRECT],
+            "agent_failures": self.path_failures[AGENT],
+            "hedged": self.hedged,
+            "deadline_fallbacks": self.deadline_fallbacks,
+            "failures": self.failures,
+        }
+
+
+plan_generator = HedgedPlanGenerator()
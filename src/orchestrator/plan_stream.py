@@ -0,0 +1,112 @@
+import json
+from typing import Any, Dict, List, Optional
+import logging
+
+from pydantic import ValidationError
+
+from src.common.models import PlanItem
+
+logger = logging.getLogger(__name__)
+
+
+class PlanStreamParser:
+    """Pulls plan items out of model output as it streams in.
+
+    Text is scanned once, character by character, for the first top-level
+    JSON array of objects. Each object is parsed and validated as a
+    ``PlanItem`` the moment its closing brace arrives, so a caller can show
+    it before the rest of the answer exists. Objects that do not validate
+    are skipped, and a truncated or malformed tail costs only the item it
+    breaks, not the items before it.
+
+    Brackets in prose before the plan (``[see logs]``) are not mistaken
+    for it: an array whose first element is not an object is abandoned
+    and scanning continues for the next one.
+    """
+
+    def __init__(self):
+        self.items: List[Dict[str, Any]] = []
+        self.skipped = 0
+        self._buffer: List[str] = []
+        self._in_array = False
+        self._closed = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def done(self) -> bool:
+        """True once the plan array has closed; later text is ignored."""
+        return self._closed
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume the next chunk; returns the items it completed."""
+        completed: List[Dict[str, Any]] = []
+        for ch in text:
+            if self._closed:
+                break
+            if not self._in_array:
+                if ch == "[":
+                    self._in_array = True
+                continue
+            if self._depth == 0:
+                self._between_items(ch)
+                continue
+
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    item = self._complete("".join(self._buffer))
+                    self._buffer.clear()
+                    if item is not None:
+                        self.items.append(item)
+                        completed.append(item)
+        return completed
+
+    def _between_items(self, ch: str):
+        if ch == "{":
+            self._depth = 1
+            self._buffer.append(ch)
+        elif ch == "]":
+            if self.items or self.skipped:
+                self._closed = True
+            else:
+                self._in_array = False
+        elif ch.isspace() or ch == ",":
+            pass
+        elif not (self.items or self.skipped):
+            # Not an array of objects; keep looking
+            self._in_array = False
+            if ch == "[":
+                self._in_array = True
+
+    def _complete(self, raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            return PlanItem.model_validate(json.loads(raw)).model_dump(mode="json")
+        except (ValueError, ValidationError, TypeError) as e:
+            self.skipped += 1
+            logger.warning(f"Skipping plan item that does not validate: {str(e).splitlines()[0][:200]}")
+            return None
+
+
+def parse_plan(text: str) -> List[Dict[str, Any]]:
+    """Every valid plan item in ``text``; raises ``ValueError`` if there are none."""
+    parser = PlanStreamParser()
+    parser.feed(text)
+    if not parser.items:
+        raise ValueError(f"No valid plan items found in model output: {text[:300]}")
+    if not parser.done or parser.skipped:
+        logger.warning(f"Salvaged {len(parser.items)} plan item(s) from malformed model output")
+    return parser.items
@@ -1,21 +1,34 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import List, Optional
 import logging
 
 from src.common.models import (
-    SystemStatus, IncidentCard, TestRun, CopilotAnswer, 
-    BugToggleRequest, SimulateRequest, RunTestsRequest, CopilotAskRequest
+    SystemStatus, IncidentCard, TestRun, TestRunPage, CopilotAnswer, 
+    BugToggleRequest, SimulateRequest, RunTestsRequest, CopilotAskRequest, CopilotStreamStarted
 )
 from src.orchestrator.state import state
+from src.orchestrator.run_history import run_history
+from src.orchestrator.plan_cache import plan_cache
+from src.orchestrator.plan_generator import plan_generator
+from src.orchestrator.copilot_cache import copilot_cache
+from src.orchestrator.llm_scheduler import llm_scheduler, LLMOverloaded
+from src.orchestrator.outbox import outbox
+from src.orchestrator.journal import journal
+from src.common.http import http_clients
+from src.orchestrator.integrations.datadog_metrics import metrics
+from src.orchestrator.webhooks import webhook_ingestor
+from src.orchestrator.correlation import correlator
+from src.common.ws import ws_manager
 from src.orchestrator.agent_service import agent_service
-from src.orchestrator.integrations.strands_agent import strands_agent_client
+from src.orchestrator.ownership import state_owner
+from src.orchestrator.integrations.strands_agent import strands_agent_client, agent_pool
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/api/status", response_model=SystemStatus)
 async def get_status():
-    return state.get_status()
+    return Response(content=state.get_status_json(), media_type="application/json")
 
 @router.post("/api/demo/bug", response_model=SystemStatus)
 async def toggle_bug(request: BugToggleRequest):
@@ -27,7 +40,18 @@ async def toggle_bug(request: BugToggleRequest):
 
 @router.get("/api/incidents/current", response_model=Optional[IncidentCard])
 async def get_current_incident():
-    return state.get_current_incident()
+    return Response(content=state.get_current_incident_json(), media_type="application/json")
+
+@router.get("/api/incidents", response_model=List[IncidentCard])
+async def list_incidents():
+    return state.list_incidents()
+
+@router.get("/api/incidents/{incident_id}", response_model=IncidentCard)
+async def get_incident(incident_id: str):
+    incident = state.get_incident(incident_id)
+    if incident is None:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return incident
 
 @router.post("/api/incidents/simulate", response_model=Optional[IncidentCard])
 async def simulate_incident(request: SimulateRequest):
@@ -53,30 +77,80 @@ async def run_tests(request: RunTestsRequest):
         logger.error(f"Error running tests: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.get("/api/tests/runs", response_model=TestRunPage)
+async def list_test_runs(
+    incident_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+):
+    runs, next_cursor = await run_history.query(incident_id, since, until, cursor, limit)
+    return TestRunPage(runs=runs, next_cursor=next_cursor)
+
 @router.get("/api/tests/runs/{run_id}", response_model=Optional[TestRun])
 async def get_test_run(run_id: str):
-    return state.get_test_run(run_id)
+    return await state.load_test_run(run_id)
+
+def _overloaded(e: LLMOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+    )
 
 @router.post("/api/copilot/ask", response_model=CopilotAnswer)
 async def ask_copilot(request: CopilotAskRequest):
     try:
+        incident, test_run = state.get_context(request.incident_id)
         return await strands_agent_client.generate_answer(
             incident_id=request.incident_id,
             question=request.question,
-            context=state.get_current_incident(),
-            test_run=state.get_test_run()
+            context=incident,
+            test_run=test_run,
         )
+    except LLMOverloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         logger.error(f"Error asking copilot: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@router.post("/internal/datadog/webhook")
+@router.post("/api/copilot/ask/stream", response_model=CopilotStreamStarted, status_code=202)
+async def ask_copilot_stream(request: CopilotAskRequest):
+    try:
+        request_id = agent_service.ask_copilot_stream(request.incident_id, request.question)
+    except LLMOverloaded as e:
+        raise _overloaded(e)
+    return CopilotStreamStarted(request_id=request_id)
+
+@router.post("/internal/datadog/webhook", status_code=202)
 async def datadog_webhook(request: Request):
     try:
         payload = await request.json()
-        logger.info(f"Received Datadog webhook: {payload}")
-        # In a real app, parse the payload and trigger an incident
-        return {"status": "ok"}
-    except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not webhook_ingestor.submit(payload):
+        # Datadog retries webhooks that get a 429
+        raise HTTPException(status_code=429, detail="Webhook queue full")
+    return {"status": "accepted"}
+
+@router.get("/internal/stats")
+async def internal_stats():
+    if not state_owner.owner:
+        return {"ownership": state_owner.stats(), "ws": ws_manager.stats()}
+    return {
+        "ownership": state_owner.stats(),
+        "ws": ws_manager.stats(),
+        "outbox": outbox.stats(),
+        "journal": journal.stats(),
+        "run_history": run_history.stats(),
+        "http": http_clients.stats(),
+        "datadog_metrics": metrics.stats(),
+        "detection": agent_service.detection.stats(),
+        "speculation": agent_service.speculation_stats(),
+        "webhooks": webhook_ingestor.stats(),
+        "correlation": correlator.stats(),
+        "plan_cache": plan_cache.stats(),
+        "plan_generator": plan_generator.stats(),
+        "copilot_cache": copilot_cache.stats(),
+        "llm": llm_scheduler.stats(),
+        "agent_pool": agent_pool.stats(),
+    }
@@ -0,0 +1,395 @@
+import asyncio
+import bisect
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+from src.common.models import TestRun, TestRunStatusEnum
+from src.common.encoding import dumps
+from src.common.config import (
+    RUN_HISTORY_PATH,
+    RUN_HISTORY_MEMORY_BYTES,
+    RUN_HISTORY_MAX_AGE_S,
+    RUN_HISTORY_RETENTION_DAYS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Runs are ordered newest first by (started_at, run_id); the same pair is the page cursor
+SortKey = Tuple[str, str]
+
+_FINISHED = (TestRunStatusEnum.COMPLETED, TestRunStatusEnum.FAILED)
+
+_STOP = object()
+
+
+class _Entry:
+    __slots__ = ("run", "size", "last_access")
+
+    def __init__(self, run: TestRun, size: int):
+        self.run = run
+        self.size = size
+        self.last_access = time.monotonic()
+
+
+def estimate_size(run: TestRun) -> int:
+    """Rough encoded size of a run, for when no encoding of it is at hand."""
+    return 256 + sum(160 + len(t.name) + len(t.details or "") for t in run.tests)
+
+
+class RunHistory:
+    """Every test run the orchestrator has seen, indexed by run, incident and start time.
+
+    Recent runs are kept in memory in LRU order. Finished runs are spilled
+    to SQLite once the memory budget is exceeded or they have not been read
+    for ``max_age_s``; queries merge both tiers. Runs that are still
+    executing are never evicted, since the adapter keeps mutating them.
+
+    Nothing here touches SQLite on the event loop: spills and deletes go to
+    a writer thread, as with the journal, and disk reads run in a worker
+    thread. A spilled run stays readable from ``_pending`` until its write
+    has committed.
+    """
+
+    def __init__(
+        self,
+        path: str = RUN_HISTORY_PATH,
+        memory_bytes: int = RUN_HISTORY_MEMORY_BYTES,
+        max_age_s: float = RUN_HISTORY_MAX_AGE_S,
+        retention_days: float = RUN_HISTORY_RETENTION_DAYS,
+    ):
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.max_age_s = max_age_s
+        self.retention_days = retention_days
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_incident: Dict[str, Set[str]] = {}
+        self._by_time: List[SortKey] = []
+        self._bytes = 0
+        self._pending: Dict[str, TestRun] = {}
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self.disk_runs = 0
+        self.hits = 0
+        self.disk_reads = 0
+        self.spilled = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, incident_id TEXT NOT NULL, "
+            "started_at TEXT NOT NULL, status TEXT NOT NULL, data BLOB NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS runs_by_time ON runs (started_at, run_id)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS runs_by_incident ON runs (incident_id, started_at, run_id)"
+        )
+        conn.commit()
+        return conn
+
+    def _spill(self, entries: List[_Entry]):
+        if self._thread is None:
+            self.dropped += len(entries)
+            return
+        runs = [e.run for e in entries]
+        for run in runs:
+            self._pending[run.run_id] = run
+        self._queue.put(("spill", runs))
+
+    def _writer(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                    batch = [op for op in batch if op is not _STOP]
+                try:
+                    self._commit(conn, batch)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not write test-run history: {e}")
+        except Exception as e:
+            logger.error(f"Run history writer stopped: {e}")
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: list):
+        spilled: List[TestRun] = []
+        with conn:
+            for op, arg in batch:
+                if op == "spill":
+                    # Finished runs are no longer mutated, so encoding them here is safe
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO runs (run_id, incident_id, started_at, status, data) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [(r.run_id, r.incident_id, r.started_at, r.status.value, dumps(r)) for r in arg],
+                    )
+                    spilled.extend(arg)
+                elif op == "delete":
+                    conn.execute("DELETE FROM runs WHERE run_id = ?", (arg,))
+        for run in spilled:
+            if self._pending.get(run.run_id) is run:
+                self._pending.pop(run.run_id, None)
+        self.spilled += len(spilled)
+        self.disk_runs = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def _prune_disk(self, conn: sqlite3.Connection):
+        if self.retention_days <= 0:
+            return
+        cutoff = time.strftime(
+            "%Y-%m-%dT%H:%M:%S", time.gmtime(time.time() - self.retention_days * 86400)
+        )
+        with conn:
+            removed = conn.execute("DELETE FROM runs WHERE started_at < ?", (cutoff,)).rowcount
+        if removed:
+            logger.info(f"Pruned {removed} test run(s) older than {self.retention_days} days")
+
+    def _read(self, sql: str, params: tuple) -> list:
+        # Worker threads only
+        if self._reader is None:
+            self._reader = self._connect()
+        return self._reader.execute(sql, params).fetchall()
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+
+    def record(self, run: TestRun, size: Optional[int] = None):
+        """Insert or refresh a run; called on every state transition of the run.
+
+        ``size`` is the length of an encoding the caller already has (the
+        journal payload); without one the size is estimated.
+        """
+        if size is None:
+            size = estimate_size(run)
+        entry = self._entries.get(run.run_id)
+        if entry is None:
+            entry = _Entry(run, size)
+            self._entries[run.run_id] = entry
+            self._by_incident.setdefault(run.incident_id, set()).add(run.run_id)
+            bisect.insort(self._by_time, (run.started_at, run.run_id))
+            if self._thread is not None:
+                # A spilled run that becomes active again lives in memory only
+                self._pending.pop(run.run_id, None)
+                self._queue.put(("delete", run.run_id))
+        else:
+            self._bytes -= entry.size
+            entry.run = run
+            entry.size = size
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(run.run_id)
+        self._bytes += size
+        self._evict()
+
+    def _forget(self, run_id: str) -> _Entry:
+        entry = self._entries.pop(run_id)
+        self._bytes -= entry.size
+        ids = self._by_incident.get(entry.run.incident_id)
+        if ids is not None:
+            ids.discard(run_id)
+            if not ids:
+                del self._by_incident[entry.run.incident_id]
+        key = (entry.run.started_at, run_id)
+        i = bisect.bisect_left(self._by_time, key)
+        if i < len(self._by_time) and self._by_time[i] == key:
+            del self._by_time[i]
+        return entry
+
+    def _evict(self):
+        now = time.monotonic()
+        victims = []
+        remaining = self._bytes
+        # Once over budget, free a little extra so spills happen in batches
+        limit = self.memory_bytes if remaining <= self.memory_bytes else int(self.memory_bytes * 0.9)
+        for entry in self._entries.values():
+            over_budget = remaining > limit
+            expired = now - entry.last_access > self.max_age_s
+            if not over_budget and not expired:
+                # LRU order: everything after this was accessed more recently
+                break
+            if entry.run.status in _FINISHED:
+                victims.append(entry)
+                remaining -= entry.size
+        if victims:
+            for entry in victims:
+                self._forget(entry.run.run_id)
+            self._spill(victims)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def get(self, run_id: str) -> Optional[TestRun]:
+        """A run held in memory (or waiting to be spilled); never reads the disk."""
+        entry = self._entries.get(run_id)
+        if entry is not None:
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(run_id)
+            self.hits += 1
+            return entry.run
+        return self._pending.get(run_id)
+
+    async def load(self, run_id: str) -> Optional[TestRun]:
+        """Like ``get``, falling back to the disk tier in a worker thread."""
+        run = self.get(run_id)
+        if run is not None or self._thread is None:
+            return run
+        rows = await asyncio.to_thread(self._read, "SELECT data FROM runs WHERE run_id = ?", (run_id,))
+        if not rows:
+            return None
+        self.disk_reads += 1
+        return TestRun.model_validate_json(rows[0][0])
+
+    async def query(
+        self,
+        incident_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> Tuple[List[TestRun], Optional[str]]:
+        """Newest-first page of runs, filtered by incident and start-time range.
+
+        ``cursor`` is the ``next_cursor`` of the previous page. Bounds are
+        compared as ISO-8601 strings, which sort chronologically.
+        """
+        upper: Optional[SortKey] = None
+        if cursor:
+            started_at, _, run_id = cursor.rpartition("|")
+            upper = (started_at, run_id)
+        if until and (upper is None or (until, "\uffff") < upper):
+            upper = (until, "\uffff")
+
+        rows: Dict[str, Tuple[SortKey, TestRun]] = {}
+        for key, run in self._query_memory(incident_id, since, upper, limit + 1):
+            rows[key[1]] = (key, run)
+        for key, run in self._query_pending(incident_id, since, upper):
+            rows.setdefault(key[1], (key, run))
+        if self._thread is not None:
+            for key, run in await asyncio.to_thread(self._query_disk, incident_id, since, upper, limit + 1):
+                rows.setdefault(key[1], (key, run))
+        ordered = sorted(rows.values(), key=lambda r: r[0], reverse=True)
+
+        page = ordered[:limit]
+        next_cursor = None
+        if len(ordered) > limit and page:
+            next_cursor = "|".join(page[-1][0])
+        return [run for _, run in page], next_cursor
+
+    def _query_memory(self, incident_id, since, upper, limit):
+        keys = self._by_time
+        end = len(keys) if upper is None else bisect.bisect_left(keys, upper)
+        ids = self._by_incident.get(incident_id, set()) if incident_id else None
+        found = []
+        for i in range(end - 1, -1, -1):
+            key = keys[i]
+            if since and key[0] < since:
+                break
+            if ids is not None and key[1] not in ids:
+                continue
+            found.append((key, self._entries[key[1]].run))
+            if len(found) >= limit:
+                break
+        return found
+
+    def _query_pending(self, incident_id, since, upper):
+        found = []
+        for run in list(self._pending.values()):
+            key = (run.started_at, run.run_id)
+            if incident_id and run.incident_id != incident_id:
+                continue
+            if (since and key[0] < since) or (upper is not None and key >= upper):
+                continue
+            found.append((key, run))
+        return found
+
+    def _query_disk(self, incident_id, since, upper, limit):
+        clauses, params = [], []
+        if incident_id:
+            clauses.append("incident_id = ?")
+            params.append(incident_id)
+        if since:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if upper is not None:
+            clauses.append("(started_at, run_id) < (?, ?)")
+            params.extend(upper)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._read(
+            f"SELECT started_at, run_id, data FROM runs {where} "
+            "ORDER BY started_at DESC, run_id DESC LIMIT ?",
+            (*params, limit),
+        )
+        self.disk_reads += len(rows)
+        return [((r[0], r[1]), TestRun.model_validate_json(r[2])) for r in rows]
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Prune old runs and start the writer; blocking, so call it from a worker thread."""
+        if not self.path or self._thread is not None:
+            return
+        conn = self._connect()
+        try:
+            self._prune_disk(conn)
+            self.disk_runs = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        finally:
+            conn.close()
+        self._thread = threading.Thread(target=self._writer, name="run-history-writer", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Spill every finished run so history survives a restart."""
+        finished = [e for e in self._entries.values() if e.run.status in _FINISHED]
+        for entry in finished:
+            self._forget(entry.run.run_id)
+        if finished:
+            self._spill(finished)
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def stats(self) -> dict:
+        return {
+            "memory_runs": len(self._entries),
+            "memory_bytes": self._bytes,
+            "memory_budget": self.memory_bytes,
+            "disk_runs": self.disk_runs,
+            "pending_writes": len(self._pending),
+            "hits": self.hits,
+            "disk_reads": self.disk_reads,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+        }
+
+
+run_history = RunHistory()
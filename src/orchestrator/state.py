@@ -1,8 +1,8 @@
-import httpx
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
 import asyncio
+import json
 import logging
 
 from src.common.models import (
@@ -19,17 +19,70 @@ from src.common.models import (
     TestItem,
     TestStatusEnum,
 )
-from src.common.ws import ws_manager
 from src.common.events import Event
-from src.common.config import DEMO_APP_URL, DD_SITE, DD_SERVICE, DD_ENV
+from src.common.encoding import dumps, snapshot_cache
+from src.common.http import http_clients
+from src.common.config import DEMO_APP_URL, DD_SITE, DD_SERVICE, DD_ENV, WS_TESTS_DELTA
 from src.orchestrator.integrations.datadog_detection import CUSTOM_ERROR_RATE_METRIC
+from src.orchestrator.outbox import outbox
+from src.orchestrator.journal import journal
+from src.orchestrator.run_history import run_history
+from src.orchestrator.llm_scheduler import llm_scheduler
 
 logger = logging.getLogger(__name__)
 
+# Records encoded per event-loop turn while building a journal snapshot
+_SNAPSHOT_CHUNK = 64
+
+
+class IncidentRecord:
+    """Everything the orchestrator tracks for one incident.
+
+    Each record has its own lock, so transitions on unrelated incidents
+    never wait on each other.
+    """
+
+    __slots__ = (
+        "incident", "service", "status", "test_run", "lock", "version",
+        "started_at", "ended_at",
+        "sent_run_id", "sent_run_status", "sent_items",
+    )
+
+    def __init__(self, incident: IncidentCard, service: str):
+        self.incident = incident
+        self.service = service
+        self.status = StatusEnum.INCIDENT_ACTIVE
+        self.test_run: Optional[TestRun] = None
+        self.lock = asyncio.Lock()
+        self.version = 0
+        self.started_at = datetime.utcnow()
+        self.ended_at: Optional[datetime] = None
+        # Last state of the run as sent over WS, used to compute patches
+        self.sent_run_id: Optional[str] = None
+        self.sent_run_status: Optional[TestRunStatusEnum] = None
+        self.sent_items: Dict[str, Tuple[TestStatusEnum, Optional[str], str]] = {}
+
+    @property
+    def incident_id(self) -> str:
+        return self.incident.incident_id
+
+    @property
+    def cache_key(self) -> str:
+        return f"incident:{self.incident_id}"
+
+    def touch(self):
+        self.version += 1
+
 
 class IncidentState:
+    """Multi-incident store with O(1) lookup by incident, run and service.
+
+    ``system_status`` summarizes the *focused* incident (the most recently
+    opened one), which is what the dashboard shows; ``current_incident`` and
+    ``current_test_run`` refer to it as well.
+    """
+
     _instance = None
-    _lock = asyncio.Lock()
 
     def __new__(cls):
         if cls._instance is None:
@@ -49,177 +102,540 @@ class IncidentState:
             active_incident_id=None,
             updated_at=datetime.utcnow().isoformat() + "Z",
         )
-        self.current_incident: Optional[IncidentCard] = None
-        self.current_test_run: Optional[TestRun] = None
+        self.incidents: Dict[str, IncidentRecord] = {}
+        self._by_service: Dict[str, str] = {}
+        self._by_run: Dict[str, str] = {}
+        self.focus_incident_id: Optional[str] = None
         self.bug_enabled = False
-        self.incident_start: Optional[datetime] = None
-        self.incident_end: Optional[datetime] = None
         self.last_bug_toggle_time: datetime = datetime.utcnow()
+        self._bug_lock = asyncio.Lock()
+        # Bumped on every change so encoded snapshots can be reused until stale
+        self.status_version = 0
+        self._restoring = False
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    # -- lookups -------------------------------------------------------------
+
+    def get_record(self, incident_id: Optional[str] = None) -> Optional[IncidentRecord]:
+        return self.incidents.get(incident_id or self.focus_incident_id or "")
+
+    def get_incident(self, incident_id: str) -> Optional[IncidentCard]:
+        record = self.incidents.get(incident_id)
+        return record.incident if record else None
+
+    def get_context(self, incident_id: Optional[str] = None) -> Tuple[Optional[IncidentCard], Optional[TestRun]]:
+        """An incident and its test run; the focused incident if ``incident_id`` is None."""
+        record = self.get_record(incident_id)
+        return (record.incident, record.test_run) if record else (None, None)
+
+    def get_incident_for_service(self, service: str) -> Optional[IncidentCard]:
+        record = self.incidents.get(self._by_service.get(service, ""))
+        return record.incident if record else None
+
+    def list_incidents(self) -> List[IncidentCard]:
+        return [r.incident for r in self.incidents.values()]
+
+    @property
+    def current_incident(self) -> Optional[IncidentCard]:
+        record = self.get_record()
+        return record.incident if record else None
+
+    @property
+    def current_test_run(self) -> Optional[TestRun]:
+        record = self.get_record()
+        return record.test_run if record else None
+
+    # -- internals -----------------------------------------------------------
+
+    def _touch_status(self):
+        self.system_status.updated_at = datetime.utcnow().isoformat() + "Z"
+        self.status_version += 1
+        self._journal("status", "", self._status_json())
+
+    # -- journaling ----------------------------------------------------------
+
+    def _status_json(self) -> bytes:
+        return dumps({
+            "system_status": self.system_status,
+            "bug_enabled": self.bug_enabled,
+            "focus_incident_id": self.focus_incident_id,
+        })
+
+    @staticmethod
+    def _record_json(record: IncidentRecord) -> bytes:
+        return dumps({
+            "incident": record.incident,
+            "service": record.service,
+            "status": record.status,
+            "started_at": record.started_at.isoformat(),
+            "ended_at": record.ended_at.isoformat() if record.ended_at else None,
+        })
+
+    def _journal(self, kind: str, key: str, data: Optional[bytes] = None):
+        if not journal.enabled or self._restoring:
+            return
+        journal.append(kind, key, data)
+        if journal.snapshot_due and self._snapshot_task is None:
+            self._snapshot_task = asyncio.create_task(self._snapshot())
+
+    def _journal_record(self, record: IncidentRecord):
+        self._journal("incident", record.incident_id, self._record_json(record))
+
+    @staticmethod
+    def _join_dump(status: bytes, records: List[bytes], runs: List[bytes]) -> bytes:
+        return b"".join((
+            b'{"status":', status,
+            b',"incidents":[', b",".join(records),
+            b'],"runs":[', b",".join(runs),
+            b"]}",
+        ))
+
+    def _dump(self) -> bytes:
+        records = list(self.incidents.values())
+        return self._join_dump(
+            self._status_json(),
+            [self._record_json(r) for r in records],
+            [dumps(r.test_run) for r in records if r.test_run],
+        )
+
+    async def _snapshot(self):
+        """Journal a compacted snapshot, encoding a chunk of records per loop turn.
+
+        The snapshot's place in the journal is taken first. Each record is
+        encoded as it is when its turn comes, which is at least as new as
+        that place; later entries replay on top of it.
+        """
+        pending = journal.begin_snapshot()
+        data = None
+        try:
+            status = self._status_json()
+            records = list(self.incidents.values())
+            encoded: List[bytes] = []
+            runs: List[bytes] = []
+            for i, record in enumerate(records):
+                if i and i % _SNAPSHOT_CHUNK == 0:
+                    await asyncio.sleep(0)
+                encoded.append(self._record_json(record))
+                if record.test_run:
+                    runs.append(dumps(record.test_run))
+            data = self._join_dump(status, encoded, runs)
+        except Exception as e:
+            logger.error(f"Could not encode journal snapshot: {e}")
+        finally:
+            pending.set_result(data)
+            self._snapshot_task = None
+
+    async def restore(self, snapshot: Optional[bytes], tail: list):
+        """Rebuild the store from a journal snapshot plus the entries after it.
+
+        Runs that were in flight when the process stopped cannot resume, so
+        their unfinished tests are marked FAIL and the incident goes back to
+        INCIDENT_ACTIVE, ready for a new validation run.
+        """
+        self._restoring = True
+        try:
+            self._replay_journal(snapshot, tail)
+        finally:
+            self._restoring = False
+
+        if self.incidents or snapshot is not None or tail:
+            # Journal the repaired state so the next restart starts from it
+            self._sync_focus_status()
+            # Nothing else touches the state until startup finishes, so it can be encoded in a thread
+            journal.snapshot(await asyncio.to_thread(self._dump))
+            logger.info(f"Restored {len(self.incidents)} incident(s) from journal")
+
+    def _replay_journal(self, snapshot: Optional[bytes], tail: list):
+        if snapshot is not None:
+            data = json.loads(snapshot)
+            self._restore_status(data["status"])
+            for item in data["incidents"]:
+                self._restore_record(item)
+            for item in data["runs"]:
+                self._restore_run(item)
+        for kind, key, data in tail:
+            if kind == "status":
+                self._restore_status(json.loads(data))
+            elif kind == "incident":
+                self._restore_record(json.loads(data))
+            elif kind == "run":
+                self._restore_run(json.loads(data))
+            elif kind == "removed":
+                self._remove_record(key)
+
+        for record in self.incidents.values():
+            run = record.test_run
+            if run and run.status in (TestRunStatusEnum.QUEUED, TestRunStatusEnum.RUNNING):
+                now = datetime.utcnow().isoformat() + "Z"
+                for t in run.tests:
+                    if t.status in (TestStatusEnum.PENDING, TestStatusEnum.RUNNING):
+                        t.status = TestStatusEnum.FAIL
+                        t.details = "Interrupted by orchestrator restart"
+                        t.last_update_at = now
+                run.status = TestRunStatusEnum.FAILED
+            if record.status == StatusEnum.VALIDATING:
+                record.status = StatusEnum.INCIDENT_ACTIVE
+            if run:
+                run_history.record(run)
+        if self.focus_incident_id not in self.incidents:
+            self.focus_incident_id = next(reversed(self.incidents), None)
+
+    def _restore_status(self, data: dict):
+        self.system_status = SystemStatus.model_validate(data["system_status"])
+        self.bug_enabled = data.get("bug_enabled", False)
+        self.focus_incident_id = data.get("focus_incident_id")
+
+    def _restore_record(self, data: dict):
+        incident = IncidentCard.model_validate(data["incident"])
+        record = self.incidents.get(incident.incident_id)
+        if record is None:
+            record = IncidentRecord(incident, data["service"])
+            self.incidents[incident.incident_id] = record
+        else:
+            record.incident = incident
+        record.status = StatusEnum(data["status"])
+        record.started_at = datetime.fromisoformat(data["started_at"])
+        record.ended_at = datetime.fromisoformat(data["ended_at"]) if data.get("ended_at") else None
+        record.touch()
+        self._by_service[record.service] = incident.incident_id
+
+    def _restore_run(self, data: dict):
+        test_run = TestRun.model_validate(data)
+        record = self.incidents.get(test_run.incident_id)
+        if record:
+            record.test_run = test_run
+            self._by_run[test_run.run_id] = record.incident_id
+
+    def _status_event(self):
+        return Event.system_status(self.system_status, self.status_version)
+
+    def _incident_event(self, record: IncidentRecord):
+        return Event.incident_created(record.incident, record.version)
+
+    def _is_focus(self, record: IncidentRecord) -> bool:
+        return record.incident_id == self.focus_incident_id
+
+    def _remove_record(self, incident_id: str):
+        record = self.incidents.pop(incident_id, None)
+        if record is None:
+            return
+        if self._by_service.get(record.service) == incident_id:
+            del self._by_service[record.service]
+        if record.test_run and self._by_run.get(record.test_run.run_id) == incident_id:
+            del self._by_run[record.test_run.run_id]
+        snapshot_cache.invalidate(record.cache_key)
+        llm_scheduler.cancel_incident(incident_id)
+        self._journal("removed", incident_id)
+        if self.focus_incident_id == incident_id:
+            # Fall back to the most recently opened incident still tracked
+            self.focus_incident_id = next(reversed(self.incidents), None)
+
+    def _sync_focus_status(self):
+        """Point ``system_status`` at the focused incident, or HEALTHY if there is none."""
+        record = self.get_record()
+        if record is None:
+            self.system_status.status = StatusEnum.HEALTHY
+            self.system_status.active_incident_id = None
+        else:
+            signal = record.incident.datadog_summary.signal
+            self.system_status.status = record.status
+            self.system_status.active_incident_id = record.incident_id
+            self.system_status.error_rate_5m = signal.error_rate_5m
+            self.system_status.p95_latency_ms_5m = signal.p95_latency_ms_5m
+        self._touch_status()
+
+    def _attach_run(self, record: IncidentRecord, test_run: TestRun):
+        if record.test_run and record.test_run.run_id != test_run.run_id:
+            self._by_run.pop(record.test_run.run_id, None)
+        record.test_run = test_run
+        self._by_run[test_run.run_id] = record.incident_id
+        data = dumps(test_run)
+        run_history.record(test_run, len(data))
+        self._journal("run", record.incident_id, data)
+
+    def _remember_sent_run(self, record: IncidentRecord, test_run: TestRun):
+        record.sent_run_id = test_run.run_id
+        record.sent_run_status = test_run.status
+        record.sent_items = {
+            t.test_id: (t.status, t.details, t.last_update_at) for t in test_run.tests
+        }
+
+    def _tests_event(self, record: IncidentRecord, test_run: TestRun):
+        """Build a ``tests.item_updated`` patch for what changed since the last frame.
+
+        Falls back to a full ``tests.updated`` snapshot for a run we have not sent
+        yet, or when delta mode is off. Returns None when nothing changed.
+        """
+        if not WS_TESTS_DELTA or test_run.run_id != record.sent_run_id:
+            self._remember_sent_run(record, test_run)
+            return Event.tests_updated(test_run)
+
+        items = []
+        for t in test_run.tests:
+            current = (t.status, t.details, t.last_update_at)
+            previous = record.sent_items.get(t.test_id)
+            if previous == current:
+                continue
+            patch = {"test_id": t.test_id}
+            if previous is None:
+                patch.update(name=t.name, status=t.status, details=t.details, last_update_at=t.last_update_at)
+            else:
+                if previous[0] != t.status:
+                    patch["status"] = t.status
+                if previous[1] != t.details:
+                    patch["details"] = t.details
+                if previous[2] != t.last_update_at:
+                    patch["last_update_at"] = t.last_update_at
+            record.sent_items[t.test_id] = current
+            items.append(patch)
+
+        run_status_changed = test_run.status != record.sent_run_status
+        if not items and not run_status_changed:
+            return None
+
+        record.sent_run_status = test_run.status
+        test_run.seq += 1
+        return Event.tests_item_updated(test_run, items, run_status_changed)
+
+    # -- transitions ---------------------------------------------------------
 
     async def set_status(
         self, status: StatusEnum, error_rate: float = None, p95_latency: float = None
     ):
-        async with IncidentState._lock:
-            self.system_status.status = status
-            if error_rate is not None:
-                self.system_status.error_rate_5m = error_rate
-            if p95_latency is not None:
-                self.system_status.p95_latency_ms_5m = p95_latency
-            self.system_status.updated_at = datetime.utcnow().isoformat() + "Z"
+        self.system_status.status = status
+        if error_rate is not None:
+            self.system_status.error_rate_5m = error_rate
+        if p95_latency is not None:
+            self.system_status.p95_latency_ms_5m = p95_latency
+        self._touch_status()
+
+        outbox.broadcast(self._status_event())
+
+    async def _sync_demo_bug(self, enabled: bool) -> Tuple[float, float]:
+        """Drive the demo app's bug flag to ``enabled`` and return the resulting signal."""
+        try:
+            client = http_clients.get("demo")
+            current_state = await client.get(f"{DEMO_APP_URL}/admin/bug", timeout=5.0)
+            demo_bug_enabled = (
+                current_state.json().get("enabled", False)
+                if current_state.status_code == 200
+                else enabled
+            )
+
+            while demo_bug_enabled != enabled:
+                response = await client.post(f"{DEMO_APP_URL}/admin/bug", timeout=5.0)
+                if response.status_code == 200:
+                    demo_bug_enabled = response.json().get(
+                        "enabled", not demo_bug_enabled
+                    )
+                else:
+                    break
 
-            await ws_manager.broadcast(Event.system_status(self.system_status))
+            error_rate = 100.0 if demo_bug_enabled else 0.0
+            p95_latency = 5000.0 if demo_bug_enabled else 50.0
+        except Exception as e:
+            logger.warning(f"Could not reach demo app: {e}, using local state")
+            error_rate = 100.0 if enabled else 0.0
+            p95_latency = 5000.0 if enabled else 50.0
+        return error_rate, p95_latency
 
     async def toggle_bug(self, enabled: bool) -> SystemStatus:
         from src.orchestrator.integrations.datadog_detection import datadog_client
 
-        async with IncidentState._lock:
+        # The demo app round-trips only serialize concurrent toggles; no state
+        # is touched until they are done.
+        async with self._bug_lock:
+            error_rate, p95_latency = await self._sync_demo_bug(enabled)
+
             self.bug_enabled = enabled
             self.last_bug_toggle_time = datetime.utcnow()
-
-            try:
-                async with httpx.AsyncClient(timeout=5.0) as client:
-                    current_state = await client.get(f"{DEMO_APP_URL}/admin/bug")
-                    demo_bug_enabled = (
-                        current_state.json().get("enabled", False)
-                        if current_state.status_code == 200
-                        else enabled
-                    )
-
-                    while demo_bug_enabled != enabled:
-                        response = await client.post(f"{DEMO_APP_URL}/admin/bug")
-                        if response.status_code == 200:
-                            demo_bug_enabled = response.json().get(
-                                "enabled", not demo_bug_enabled
-                            )
-                        else:
-                            break
-
-                    error_rate = 100.0 if demo_bug_enabled else 0.0
-                    p95_latency = 5000.0 if demo_bug_enabled else 50.0
-            except Exception as e:
-                logger.warning(f"Could not reach demo app: {e}, using local state")
-                error_rate = 100.0 if enabled else 0.0
-                p95_latency = 5000.0 if enabled else 50.0
-
             self.system_status.error_rate_5m = error_rate
             self.system_status.p95_latency_ms_5m = p95_latency
-            self.system_status.updated_at = datetime.utcnow().isoformat() + "Z"
 
             # Submit metrics to Datadog so detection goes through Datadog
-            await datadog_client.submit_demo_metrics(error_rate, p95_latency)
-
-            # When disabling the bug, clear any active incident and reset to HEALTHY
-            if not enabled and self.current_incident:
-                self.current_incident = None
-                self.current_test_run = None
-                self.system_status.status = StatusEnum.HEALTHY
-                self.system_status.active_incident_id = None
-
-            await ws_manager.broadcast(Event.system_status(self.system_status))
+            datadog_client.submit_demo_metrics(error_rate, p95_latency)
+
+            # When disabling the bug, clear the demo service's incident and reset to HEALTHY
+            if not enabled:
+                demo_incident_id = self._by_service.get(DD_SERVICE)
+                if demo_incident_id:
+                    self._remove_record(demo_incident_id)
+                    if self.focus_incident_id is not None:
+                        self._sync_focus_status()
+                if self.focus_incident_id is None:
+                    self.system_status.status = StatusEnum.HEALTHY
+                    self.system_status.active_incident_id = None
+
+            self._touch_status()
+            outbox.broadcast(self._status_event())
             return self.system_status
 
     async def create_incident(
-        self, title: str = None, error_rate: float = 0.0, p95_latency: float = 0.0
+        self,
+        title: str = None,
+        error_rate: float = 0.0,
+        p95_latency: float = 0.0,
+        service: str = DD_SERVICE,
+        top_error: Optional[str] = None,
+        monitor_id: Optional[str] = "MON-12345",
     ) -> IncidentCard:
-        async with IncidentState._lock:
-            incident_id = f"INC-{uuid.uuid4().hex[:8].upper()}"
-            self.incident_start = datetime.utcnow()
-
-            signal = Signal(
-                error_rate_5m=error_rate,
-                p95_latency_ms_5m=p95_latency,
-                top_error="Checkout endpoint returning 500" if error_rate > 0 else None,
-            )
+        incident_id = f"INC-{uuid.uuid4().hex[:8].upper()}"
+        detected_at = datetime.utcnow()
 
-            datadog_summary = DatadogSummary(
-                monitor_id="MON-12345",
-                service="demo-checkout",
-                signal=signal,
-                evidence_links=[
-                    EvidenceLink(
-                        label="Datadog Metric Explorer",
-                        url=f"https://app.{DD_SITE}/metric/explorer?query=avg%3A{CUSTOM_ERROR_RATE_METRIC}%7Bservice%3A{DD_SERVICE}%2Cenv%3A{DD_ENV}%7D&live=true",
-                    )
-                ],
-            )
+        signal = Signal(
+            error_rate_5m=error_rate,
+            p95_latency_ms_5m=p95_latency,
+            top_error=top_error or ("Checkout endpoint returning 500" if error_rate > 0 else None),
+        )
 
-            plan = Plan(
-                plan_id=f"PLAN-{uuid.uuid4().hex[:8].upper()}",
-                generated_at=datetime.utcnow().isoformat() + "Z",
-                items=[],
-            )
+        datadog_summary = DatadogSummary(
+            monitor_id=monitor_id,
+            service=service,
+            signal=signal,
+            evidence_links=[
+                EvidenceLink(
+                    label="Datadog Metric Explorer",
+                    url=f"https://app.{DD_SITE}/metric/explorer?query=avg%3A{CUSTOM_ERROR_RATE_METRIC}%7Bservice%3A{service}%2Cenv%3A{DD_ENV}%7D&live=true",
+                )
+            ],
+        )
 
-            self.current_incident = IncidentCard(
-                incident_id=incident_id,
-                title=title or f"Checkout Service Failure - {incident_id}",
-                detected_at=self.incident_start.isoformat() + "Z",
-                datadog_summary=datadog_summary,
-                plan=plan,
-            )
+        plan = Plan(
+            plan_id=f"PLAN-{uuid.uuid4().hex[:8].upper()}",
+            generated_at=datetime.utcnow().isoformat() + "Z",
+            items=[],
+        )
 
-            self.system_status.status = StatusEnum.INCIDENT_ACTIVE
-            self.system_status.active_incident_id = incident_id
-            self.system_status.error_rate_5m = error_rate
-            self.system_status.p95_latency_ms_5m = p95_latency
-            self.system_status.updated_at = datetime.utcnow().isoformat() + "Z"
+        incident = IncidentCard(
+            incident_id=incident_id,
+            title=title or f"Checkout Service Failure - {incident_id}",
+            detected_at=detected_at.isoformat() + "Z",
+            datadog_summary=datadog_summary,
+            plan=plan,
+        )
 
-            await ws_manager.broadcast(Event.system_status(self.system_status))
-            await ws_manager.broadcast(Event.incident_created(self.current_incident))
+        # A new incident for a service supersedes the previous one for it
+        previous_id = self._by_service.get(service)
+        if previous_id:
+            self._remove_record(previous_id)
+
+        record = IncidentRecord(incident, service)
+        record.started_at = detected_at
+        self.incidents[incident_id] = record
+        self._by_service[service] = incident_id
+        self.focus_incident_id = incident_id
+        self._journal_record(record)
+
+        self.system_status.status = StatusEnum.INCIDENT_ACTIVE
+        self.system_status.active_incident_id = incident_id
+        self.system_status.error_rate_5m = error_rate
+        self.system_status.p95_latency_ms_5m = p95_latency
+        self._touch_status()
+
+        outbox.broadcast(self._status_event())
+        outbox.broadcast(self._incident_event(record))
+
+        return incident
+
+    async def fold_alert(
+        self, incident_id: str, error_rate: float, p95_latency: float
+    ) -> Optional[IncidentCard]:
+        """Fold a repeated or correlated alert into an open incident: refresh its signal only."""
+        record = self.incidents.get(incident_id)
+        if record is None:
+            return None
+        async with record.lock:
+            signal = record.incident.datadog_summary.signal
+            signal.error_rate_5m = error_rate
+            signal.p95_latency_ms_5m = p95_latency
+            record.touch()
+            self._journal_record(record)
+            if self._is_focus(record):
+                self.system_status.error_rate_5m = error_rate
+                self.system_status.p95_latency_ms_5m = p95_latency
+                self._touch_status()
+                outbox.broadcast(self._status_event())
+            outbox.broadcast(self._incident_event(record))
+            return record.incident
+
+    async def update_plan(
+        self, plan_items: list, incident_id: Optional[str] = None, partial: bool = False
+    ) -> Optional[IncidentCard]:
+        """Replace the incident's plan; ``partial`` marks the items parsed so far while streaming."""
+        record = self.get_record(incident_id)
+        if record is None:
+            return None
+        async with record.lock:
+            record.incident.plan.items = plan_items
+            record.incident.plan.generated_at = datetime.utcnow().isoformat() + "Z"
+            record.touch()
+            self._journal_record(record)
+
+            outbox.broadcast(
+                Event.plan_generated(record.incident_id, record.incident.plan, partial)
+            )
+            return record.incident
+
+    async def start_tests(self, tests: list, incident_id: Optional[str] = None) -> TestRun:
+        record = self.get_record(incident_id)
+        run_id = f"RUN-{uuid.uuid4().hex[:8].upper()}"
+
+        test_items = [
+            TestItem(
+                test_id=t.get("test_id", f"TEST-{i}"),
+                name=t.get("name", f"Test {i}"),
+                status=TestStatusEnum.PENDING,
+                last_update_at=datetime.utcnow().isoformat() + "Z",
+                details=None,
+            )
+            for i, t in enumerate(tests)
+        ]
+
+        test_run = TestRun(
+            run_id=run_id,
+            incident_id=record.incident_id if record else "",
+            started_at=datetime.utcnow().isoformat() + "Z",
+            status=TestRunStatusEnum.QUEUED,
+            tests=test_items,
+        )
+        if record is None:
+            outbox.broadcast(Event.tests_updated(test_run))
+            return test_run
 
-            return self.current_incident
+        async with record.lock:
+            record.started_at = datetime.utcnow()
+            self._attach_run(record, test_run)
 
-    async def update_plan(self, plan_items: list) -> IncidentCard:
-        async with IncidentState._lock:
-            if self.current_incident:
-                self.current_incident.plan.items = plan_items
-                self.current_incident.plan.generated_at = (
-                    datetime.utcnow().isoformat() + "Z"
-                )
+            record.status = StatusEnum.VALIDATING
+            self._journal_record(record)
+            if self._is_focus(record):
+                self.system_status.status = record.status
+                self._touch_status()
+                outbox.broadcast(self._status_event())
 
-                await ws_manager.broadcast(
-                    Event.plan_generated(
-                        self.current_incident.incident_id, self.current_incident.plan
-                    )
-                )
-            return self.current_incident
-
-    async def start_tests(self, tests: list) -> TestRun:
-        async with IncidentState._lock:
-            run_id = f"RUN-{uuid.uuid4().hex[:8].upper()}"
-            self.incident_start = datetime.utcnow()
-
-            test_items = [
-                TestItem(
-                    test_id=t.get("test_id", f"TEST-{i}"),
-                    name=t.get("name", f"Test {i}"),
-                    status=TestStatusEnum.PENDING,
-                    last_update_at=datetime.utcnow().isoformat() + "Z",
-                    details=None,
-                )
-                for i, t in enumerate(tests)
-            ]
-
-            self.current_test_run = TestRun(
-                run_id=run_id,
-                incident_id=self.current_incident.incident_id
-                if self.current_incident
-                else "",
-                started_at=datetime.utcnow().isoformat() + "Z",
-                status=TestRunStatusEnum.QUEUED,
-                tests=test_items,
-            )
+            self._remember_sent_run(record, test_run)
+            outbox.broadcast(Event.tests_updated(test_run))
 
-            self.system_status.status = StatusEnum.VALIDATING
-            self.system_status.updated_at = datetime.utcnow().isoformat() + "Z"
+            return test_run
 
-            await ws_manager.broadcast(Event.system_status(self.system_status))
-            await ws_manager.broadcast(Event.tests_updated(self.current_test_run))
-
-            return self.current_test_run
+    def attach_test_run(self, test_run: TestRun):
+        """Register a run created outside the state (e.g. by the test adapter)."""
+        record = self.incidents.get(test_run.incident_id)
+        if record:
+            self._attach_run(record, test_run)
 
     async def update_test_run(self, test_run: TestRun):
-        async with IncidentState._lock:
-            self.current_test_run = test_run
+        record = self.incidents.get(test_run.incident_id) or self.incidents.get(
+            self._by_run.get(test_run.run_id, "")
+        )
+        if record is None:
+            outbox.broadcast(Event.tests_updated(test_run))
+            return
+
+        async with record.lock:
+            # Bumps test_run.seq, which must be final before the run is journaled and recorded
+            event = self._tests_event(record, test_run)
+            self._attach_run(record, test_run)
 
             all_passed = all(t.status == TestStatusEnum.PASS for t in test_run.tests)
             all_completed = all(
@@ -228,41 +644,86 @@ class IncidentState:
             )
 
             if all_completed:
-                if all_passed:
-                    self.system_status.status = StatusEnum.RECOVERED
-                    self.incident_end = datetime.utcnow()
-                else:
-                    self.system_status.status = StatusEnum.INCIDENT_ACTIVE
-
-            self.system_status.updated_at = datetime.utcnow().isoformat() + "Z"
-
-            await ws_manager.broadcast(Event.system_status(self.system_status))
-            await ws_manager.broadcast(Event.tests_updated(test_run))
-
-    async def clear_incident(self):
-        async with IncidentState._lock:
-            self.current_incident = None
-            self.current_test_run = None
+                if all_passed and record.ended_at is None:
+                    record.ended_at = datetime.utcnow()
+                new_status = StatusEnum.RECOVERED if all_passed else StatusEnum.INCIDENT_ACTIVE
+                if new_status != record.status:
+                    record.status = new_status
+                    self._journal_record(record)
+                if self._is_focus(record) and record.status != self.system_status.status:
+                    self.system_status.status = record.status
+                    self._touch_status()
+                    outbox.broadcast(self._status_event())
+
+            if event is not None:
+                outbox.broadcast(event)
+
+    async def clear_incident(self, incident_id: Optional[str] = None):
+        """Clear one incident, or every incident when no id is given."""
+        if incident_id is None:
+            for existing_id in list(self.incidents):
+                self._remove_record(existing_id)
+        else:
+            self._remove_record(incident_id)
+
+        if self.focus_incident_id is None:
             self.system_status.status = StatusEnum.HEALTHY
             self.system_status.active_incident_id = None
             self.system_status.error_rate_5m = 0.0
             self.system_status.p95_latency_ms_5m = 0.0
-            self.system_status.updated_at = datetime.utcnow().isoformat() + "Z"
-
-            await ws_manager.broadcast(Event.system_status(self.system_status))
+            self._touch_status()
+        else:
+            self._sync_focus_status()
+
+        outbox.broadcast(self._status_event())
+
+    def snapshot_events(self) -> list:
+        """Full-state frames sent to a client on connect or after it reports a gap."""
+        events = [self._status_event()]
+        # The focused incident goes last so single-incident clients end up showing it
+        records = sorted(self.incidents.values(), key=self._is_focus)
+        for record in records:
+            events.append(self._incident_event(record))
+            if record.test_run:
+                events.append(Event.tests_updated(record.test_run))
+        return events
 
     def get_status(self) -> SystemStatus:
         return self.system_status
 
+    def get_status_json(self) -> bytes:
+        return snapshot_cache.encode("system.status", self.status_version, self.system_status)
+
     def get_current_incident(self) -> Optional[IncidentCard]:
         return self.current_incident
 
+    def get_current_incident_json(self) -> bytes:
+        record = self.get_record()
+        if record is None:
+            return b"null"
+        return snapshot_cache.encode(record.cache_key, record.version, record.incident)
+
     def get_test_run(self, run_id: str = None) -> Optional[TestRun]:
-        if run_id is None or (
-            self.current_test_run and self.current_test_run.run_id == run_id
-        ):
+        if run_id is None:
             return self.current_test_run
-        return None
+        record = self.incidents.get(self._by_run.get(run_id, ""))
+        if record and record.test_run:
+            return record.test_run
+        return run_history.get(run_id)
+
+    async def load_test_run(self, run_id: str) -> Optional[TestRun]:
+        """Like ``get_test_run``, but also finds runs spilled to the history's disk tier."""
+        return self.get_test_run(run_id) or await run_history.load(run_id)
+
+    def context_version(self, incident_id: Optional[str] = None) -> str:
+        """Changes whenever the status, the incident (focused by default) or its test run changes."""
+        record = self.get_record(incident_id)
+        run = record.test_run if record else None
+        return ":".join((
+            str(self.status_version),
+            f"{record.incident_id}@{record.version}" if record else "-",
+            f"{run.run_id}@{run.seq}:{run.status.value}" if run else "-",
+        ))
 
 
 state = IncidentState()
@@ -0,0 +1,232 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+from src.common.config import (
+    DD_SERVICE,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_BATCH_SIZE,
+    WEBHOOK_DEDUPE_TTL_S,
+)
+from src.orchestrator.detection import OnIncident
+from src.orchestrator.state import state
+
+logger = logging.getLogger(__name__)
+
+_RECOVERED = ("recovered", "ok", "resolved")
+
+
+def _first(payload: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        value = payload.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _tags(value: Any) -> Dict[str, str]:
+    """``key:value`` tags from a comma-separated scope string or a list of tags."""
+    if value is None:
+        return {}
+    items = value if isinstance(value, (list, tuple)) else str(value).split(",")
+    tags = {}
+    for item in items:
+        key, sep, tag_value = str(item).strip().partition(":")
+        if sep:
+            tags[key] = tag_value
+    return tags
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Alert:
+    """A monitor notification reduced to what incident creation needs."""
+
+    __slots__ = (
+        "fingerprint", "monitor_id", "service", "transition", "title", "top_error", "error_rate", "p95_latency",
+    )
+
+    def __init__(self, fingerprint, monitor_id, service, transition, title, top_error, error_rate, p95_latency):
+        self.fingerprint = fingerprint
+        self.monitor_id = monitor_id
+        self.service = service
+        self.transition = transition
+        self.title = title
+        self.top_error = top_error
+        self.error_rate = error_rate
+        self.p95_latency = p95_latency
+
+    @property
+    def recovered(self) -> bool:
+        return self.transition.lower() in _RECOVERED
+
+    @classmethod
+    def parse(cls, payload: Dict[str, Any]) -> "Alert":
+        """Read a Datadog webhook body.
+
+        Webhook bodies are user-defined templates, so both the template
+        variable names (``alert_id``, ``alert_transition``, ...) and plain
+        names (``monitor_id``, ``transition``, ...) are accepted.
+        """
+        monitor_id = str(_first(payload, "monitor_id", "alert_id", "id") or "")
+        tags = _tags(_first(payload, "scope", "alert_scope", "tags"))
+        service = str(_first(payload, "service") or tags.get("service") or DD_SERVICE)
+        transition = str(_first(payload, "transition", "alert_transition", "alert_type") or "Triggered")
+        if not monitor_id:
+            raise ValueError("Webhook payload has no monitor id")
+        return cls(
+            fingerprint=str(_first(payload, "aggreg_key", "fingerprint") or f"{monitor_id}:{service}"),
+            monitor_id=monitor_id,
+            service=service,
+            transition=transition,
+            title=_first(payload, "title", "alert_title", "event_title"),
+            top_error=_first(payload, "top_error", "error", "error_message"),
+            error_rate=_to_float(_first(payload, "error_rate", "value", "alert_value", "metric_value")),
+            p95_latency=_to_float(_first(payload, "p95_latency", "latency", "p95_latency_ms")),
+        )
+
+
+class WebhookIngestor:
+    """Turns pushed monitor alerts into incidents without waiting for a poll.
+
+    The route only parses JSON and enqueues it; a bounded queue absorbs
+    bursts and a full queue is reported back (HTTP 429) so Datadog
+    retries. One worker drains whatever is queued as a batch, keeps the
+    latest alert per fingerprint, drops alerts already seen within
+    ``dedupe_ttl`` or for a service that already has an incident, and opens
+    incidents for the rest. Polling keeps running as a fallback.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = WEBHOOK_QUEUE_SIZE,
+        batch_size: int = WEBHOOK_BATCH_SIZE,
+        dedupe_ttl: float = WEBHOOK_DEDUPE_TTL_S,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.dedupe_ttl = dedupe_ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._on_incident: Optional[OnIncident] = None
+        self._seen: Dict[str, float] = {}
+        self.received = 0
+        self.rejected = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.incidents = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_latency_ms = 0.0
+
+    def start(self, on_incident: OnIncident):
+        self._on_incident = on_incident
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def submit(self, payload: Any) -> bool:
+        """Queue one webhook body; False when the queue is full or not running."""
+        if self._queue is None or self._task is None:
+            self.rejected += 1
+            return False
+        try:
+            self._queue.put_nowait((time.perf_counter(), payload))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.received += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._process(batch)
+            except Exception as e:
+                logger.error(f"Error processing webhook batch: {e}")
+
+    def _parse_batch(self, batch: List[tuple]) -> Dict[str, tuple]:
+        latest: Dict[str, tuple] = {}
+        for received_at, payload in batch:
+            items = payload if isinstance(payload, list) else [payload]
+            for item in items:
+                try:
+                    alert = Alert.parse(item)
+                except (AttributeError, ValueError) as e:
+                    self.invalid += 1
+                    logger.warning(f"Ignoring webhook payload: {e}")
+                    continue
+                if alert.fingerprint in latest:
+                    self.duplicates += 1
+                latest[alert.fingerprint] = (received_at, alert)
+        return latest
+
+    async def _process(self, batch: List[tuple]):
+        self.batches += 1
+        now = time.monotonic()
+        self._seen = {k: t for k, t in self._seen.items() if now - t < self.dedupe_ttl}
+
+        for received_at, alert in self._parse_batch(batch).values():
+            if alert.recovered:
+                # Let the next trigger from this monitor open a new incident
+                self._seen.pop(alert.fingerprint, None)
+                continue
+            if alert.fingerprint in self._seen or state.get_incident_for_service(alert.service):
+                self.duplicates += 1
+                continue
+            self._seen[alert.fingerprint] = now
+
+            error_rate = alert.error_rate if alert.error_rate is not None else 100.0
+            logger.info(f"Webhook alert {alert.monitor_id} ({alert.transition}) on {alert.service}")
+            try:
+                await self._on_incident(
+                    alert.service,
+                    error_rate,
+                    alert.p95_latency or 0.0,
+                    alert.top_error,
+                    "webhook",
+                    monitor_id=alert.monitor_id,
+                    title=alert.title,
+                )
+            except Exception as e:
+                # The rest of the batch still gets processed; a redelivery may retry this one
+                self._seen.pop(alert.fingerprint, None)
+                self.failed += 1
+                logger.error(f"Error opening incident for webhook alert {alert.monitor_id}: {e}")
+                continue
+            self.incidents += 1
+            self.last_latency_ms = (time.perf_counter() - received_at) * 1000
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "received": self.received,
+            "rejected": self.rejected,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "incidents": self.incidents,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_latency_ms": round(self.last_latency_ms, 3),
+        }
+
+
+webhook_ingestor = WebhookIngestor()
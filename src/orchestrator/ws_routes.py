@@ -1,21 +1,98 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import List, Optional
 import json
 import logging
 
 from src.common.ws import ws_manager
+from src.common.events import Event
+from src.orchestrator.state import state
+from src.orchestrator.ownership import state_owner
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+
+def _parse_seq(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_topics(value) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        return None
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+async def _resume_or_snapshot(websocket: WebSocket, resume_from: Optional[int], epoch: Optional[str]):
+    if resume_from is not None and ws_manager.replay(websocket, resume_from, epoch):
+        return
+    events = state.snapshot_events() if state_owner.owner else ws_manager.peer_snapshot()
+    for event in events:
+        await ws_manager.send_personal(websocket, event)
+
+
+async def _handle_client_message(websocket: WebSocket, data: str):
+    try:
+        message = json.loads(data)
+    except ValueError:
+        logger.debug(f"Ignoring non-JSON WebSocket message: {data[:100]}")
+        return
+    if not isinstance(message, dict):
+        return
+
+    message_type = message.get("type")
+    if message_type == "tests.resync":
+        # Client saw a gap in tests.item_updated sequence numbers
+        if not state_owner.owner:
+            # A relay only has the frames it saw on the bus
+            for event in ws_manager.peer_snapshot():
+                await ws_manager.send_personal(websocket, event)
+            return
+        run_id = message.get("run_id")
+        test_run = await state.load_test_run(run_id) if run_id else state.get_test_run()
+        if test_run:
+            await ws_manager.send_personal(websocket, Event.tests_updated(test_run))
+    elif message_type in ("subscribe", "unsubscribe"):
+        update = ws_manager.subscribe if message_type == "subscribe" else ws_manager.unsubscribe
+        ack = update(
+            websocket,
+            event_types=_parse_topics(message.get("events")),
+            incidents=_parse_topics(message.get("incidents")),
+        )
+        if ack:
+            await ws_manager.send_personal(websocket, ack)
+    elif message_type == "resume":
+        await _resume_or_snapshot(
+            websocket, _parse_seq(message.get("resume_from")), message.get("epoch")
+        )
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await ws_manager.connect(websocket)
     try:
+        events = _parse_topics(websocket.query_params.get("events"))
+        incidents = _parse_topics(websocket.query_params.get("incidents"))
+        if events is not None or incidents is not None:
+            ws_manager.subscribe(websocket, event_types=events, incidents=incidents)
+        await ws_manager.send_personal(websocket, ws_manager.hello())
+        await _resume_or_snapshot(
+            websocket,
+            _parse_seq(websocket.query_params.get("resume_from")),
+            websocket.query_params.get("epoch"),
+        )
         while True:
             data = await websocket.receive_text()
             logger.debug(f"Received WebSocket message: {data}")
+            await _handle_client_message(websocket, data)
     except WebSocketDisconnect:
         await ws_manager.disconnect(websocket)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        await ws_manager.disconnect(websocket)
\ No newline at end of file
+        await ws_manager.disconnect(websocket)